@@ -4,5 +4,19 @@ from .pentad import (
     pentad2latlng,
     pentad2polygon,
     latlng2polygon,
-    generate_pentad_grid
+    generate_pentad_grid,
+    read_pentad_grid,
+    pentad_index,
+    load_pentad_index,
+    pentads_in_region,
+    pentad_region,
+    latlng2pentad_code,
+    pentad_code2str,
+    str2pentad_code,
+    pentad_code2latlng,
+    pentad_code2bounds,
+    assign_pentads,
+    pentad_raster,
+    effort_raster,
+    write_pentad_raster,
 )
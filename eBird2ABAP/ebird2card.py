@@ -2,12 +2,23 @@ import pandas as pd
 import numpy as np
 import importlib.resources as pkg_resources
 
-# import json
+import json
 import os
 import datetime
+import gzip
+import io
 
 import requests
 import tarfile
+import tempfile
+import shutil
+import contextlib
+import functools
+import email.utils
+import hashlib
+import time
+import threading
+import concurrent.futures
 
 # from tqdm.notebook import tqdm
 
@@ -15,64 +26,336 @@ import tarfile
 # import csv
 
 # Now import the necessary functions from pentad.py
-from .pentad import latlng2pentad, pentad2latlng
-
-
-def ebird2abap(EBD_file, JSON_file=None, exportCSV=False):
-    print("Reading EBD file...")
-    ebd = read_EBD(EBD_file)
-
-    print("Adding ADU number...")
-    ebd = add_ADU(ebd)
-
-    print("Computing checklists...")
-    chk = ebd2chk(ebd)
+from .pentad import (
+    latlng2pentad_code,
+    pentad_code2str,
+    str2pentad_code,
+    pentad_code2latlng,
+    pentad_code2bounds,
+    _QUADRANTS,
+    _unpack_pentad_code,
+)
+
+# Columns of the EBD file used by the pipeline
+EBD_COLUMNS = [
+    "SAMPLING EVENT IDENTIFIER",
+    "GROUP IDENTIFIER",
+    "SCIENTIFIC NAME",
+    "TAXON CONCEPT ID",
+    "CATEGORY",
+    "LATITUDE",
+    "LONGITUDE",
+    "OBSERVATION DATE",
+    "TIME OBSERVATIONS STARTED",
+    "PROTOCOL TYPE",
+    "DURATION MINUTES",
+    "EFFORT DISTANCE KM",
+    "ALL SPECIES REPORTED",
+    "OBSERVER ID",
+]
+
+# Checklist level columns (see ebd2chk)
+CHK_COLUMNS = [
+    "SAMPLING EVENT IDENTIFIER",
+    "LATITUDE",
+    "LONGITUDE",
+    "OBSERVATION DATE",
+    "OBSERVATION DATETIME",
+    "PROTOCOL TYPE",
+    "DURATION MINUTES",
+    "EFFORT DISTANCE KM",
+    "ALL SPECIES REPORTED",
+    "OBSERVER ID",
+]
+
+# Record level columns (see chk_card2ebd_f_u)
+RECORD_COLUMNS = [
+    "SAMPLING EVENT IDENTIFIER",
+    "SCIENTIFIC NAME",
+    "TAXON CONCEPT ID",
+    "ADU",
+    "OBSERVATION DATETIME",
+    "LATITUDE",
+    "LONGITUDE",
+    "EFFORT DISTANCE KM",
+]
+
+# Compact dtypes of the EBD columns (see compact_EBD)
+_EBD_COMPACT_DTYPES = {
+    "SCIENTIFIC NAME": "category",
+    "TAXON CONCEPT ID": "category",
+    "CATEGORY": "category",
+    "PROTOCOL TYPE": "category",
+    "LATITUDE": "float32",
+    "LONGITUDE": "float32",
+    "ALL SPECIES REPORTED": "bool",
+}
+
+# Prefix of the EBD identifiers stored as integers in compact mode
+_EBD_ID_PREFIX = {
+    "SAMPLING EVENT IDENTIFIER": "S",
+    "GROUP IDENTIFIER": "G",
+    "OBSERVER ID": "obsr",
+}
+
+# Number of rows of the probe chunk used to estimate the memory of a row
+_EBD_PROBE_ROWS = 10_000
+# Ratio between the memory of a chunk in flight and of the raw parsed chunk
+_EBD_PROCESSING_OVERHEAD = 4
+
+# Number of rows read at a time by read_EBD when filtering
+_EBD_FILTER_CHUNKSIZE = 1_000_000
+
+# Tables of the state saved by incremental runs of ebird2abap (see save_state)
+_STATE_TABLES = ["checklists", "card_valid", "card_chk", "cards"]
+
+# Compression of the JSON card files by extension (see write_cards_json)
+_JSON_COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+# Extensions of the JSON card files written one card per line
+_NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+# Extension of the card tables by format (see write_cards_tables)
+_TABLE_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Fields of the export cards and of their species records, in the order of the ABAP API (see ebd_f_u2card_exp)
+_CARD_FIELDS = [
+    "Protocol",
+    "ObserverEmail",
+    "CardNo",
+    "StartDate",
+    "EndDate",
+    "StartTime",
+    "Pentad",
+    "ObserverNo",
+    "TotalHours",
+    "Hour1",
+    "Hour2",
+    "Hour3",
+    "Hour4",
+    "Hour5",
+    "Hour6",
+    "Hour7",
+    "Hour8",
+    "Hour9",
+    "Hour10",
+    "TotalSpp",
+    "InclNight",
+    "AllHabitats",
+    "Checklists",
+    "TotalDistance",
+    "ObserverNoEbird",
+    "records",
+]
+_RECORD_FIELDS = [
+    "Sequence",
+    "Latitude",
+    "Longitude",
+    "Altitude",
+    "CardNo",
+    "Spp",
+    "SourceSpp",
+    "Accuracy",
+    "SightingTime",
+]
+
+
+def ebird2abap(
+    EBD_file,
+    JSON_file=None,
+    exportCSV=False,
+    exportTables=None,
+    chunksize=None,
+    max_memory=None,
+    state_dir=None,
+    shard_dir=None,
+    **kwargs,
+):
+    """
+    Run the full eBird to ABAP card conversion.
+
+    By default the EBD file is loaded in memory in one go. If `chunksize` or
+    `max_memory` is given, the file is streamed in chunks instead (see
+    `read_EBD_chunks`): each chunk is spilled to a temporary directory as a
+    compact partition and only the checklist-level tables are kept in memory,
+    so that peak memory scales with the chunk size rather than with the size
+    of the release.
+
+    If `state_dir` is given, the run is incremental: the checklists are
+    compared with the state saved by the previous run (see
+    `checklist_fingerprint`) and the cards are only recomputed for the
+    pentad/observer groups with new, edited or deleted checklists. Only the
+    new and changed cards are written to `JSON_file`, and the card numbers of
+    the deleted cards to `<JSON_file>_deleted.json`. The first run (or a run
+    with different `kwargs`) processes all the checklists. The state is only
+    saved once all the files are written: if the run fails, the next run
+    exports the same changes again.
+
+    Parameters:
+    -----------
+    EBD_file : str
+        Path to the EBD file (`.txt` or `.txt.gz`), to the `.tar` release or
+        to a parquet dataset written by `convert_EBD_to_parquet`.
+    JSON_file : str, optional
+        Output JSON file. Defaults to `<basename>_<timestamp>.json`. Written
+        one card per line for `.ndjson` or `.jsonl` files, and compressed for
+        `.gz` or `.zst` files (see `write_cards_json`).
+    exportCSV : bool, default=False
+        Also write the card and record tables as CSV.
+    exportTables : {"parquet", "arrow"}, optional
+        Also write the cards and their species records as typed Parquet or
+        Arrow IPC tables, to `<JSON_file>_cards` and `<JSON_file>_records`
+        without the JSON extension (see `write_cards_tables`).
+    chunksize : int, optional
+        Number of EBD rows per chunk in streaming mode.
+    max_memory : float, optional
+        Approximate memory ceiling (in MB) for one chunk in flight, including
+        the copies made while processing it. Used to derive `chunksize` when
+        it is not given. The checklist-level and card tables are not bounded
+        by this option.
+    state_dir : str, optional
+        Directory of the state used for incremental runs, created if needed.
+    shard_dir : str, optional
+        Write the cards to shards by year and degree square in this
+        directory, with a manifest, instead of a single JSON file (see
+        `write_cards_shards`). The shards have the extension of `JSON_file`
+        (e.g., `.ndjson.gz`), and the deleted cards of incremental runs are
+        written to `deleted.json` in the directory.
+    **kwargs
+        Passed to `read_EBD` or `read_EBD_chunks` (e.g., `compact=True`, or
+        `bbox`, `pentads`, `date_range` and `protocols` to only convert a
+        selection of the release, see `filter_EBD`).
+    """
+    if exportTables is not None and exportTables not in _TABLE_EXTENSIONS:
+        raise ValueError(f"Unknown table format: {exportTables!r} (expected 'parquet' or 'arrow')")
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        if chunksize is None and max_memory is None:
+            print("Reading EBD file...")
+            ebd = read_EBD(EBD_file, **kwargs)
+
+            print("Adding ADU number...")
+            ebd = add_ADU(ebd)
+
+            print("Computing checklists...")
+            chk = ebd2chk(ebd)
+        else:
+            print("Reading EBD file in chunks...")
+            partitions, chk = spill_EBD(
+                EBD_file,
+                spill_dir,
+                chunksize=chunksize,
+                max_memory=max_memory,
+                **kwargs,
+            )
+            ebd = read_EBD_partitions(partitions)
+
+            print("Computing checklists...")
+            chk = ebd2chk(chk)
+
+        if state_dir is not None:
+            print("Comparing checklists with the previous state...")
+            settings = json.loads(json.dumps(kwargs, sort_keys=True, default=str))
+            state = load_state(state_dir, settings)
+            fingerprint = checklist_fingerprint(
+                chk,
+                ebd if isinstance(ebd, pd.DataFrame) else read_EBD_partitions(partitions),
+            )
+            affected = affected_groups(fingerprint, state)
+            chk = chk[
+                _pentad_observer(chk["PENTAD"], _observer_str(chk["OBSERVER ID"])).isin(
+                    affected
+                )
+            ]
+            print(f"{len(affected)} pentad/observer groups to update.")
 
-    print("Checking validity of cards...")
-    card_valid = chk2valid_card(chk)
+        print("Checking validity of cards...")
+        card_valid = chk2valid_card(chk)
 
-    print("Converting valid cards to CHK cards...")
-    chk_card = valid_card2chk_card(chk, card_valid)
+        print("Converting valid cards to CHK cards...")
+        chk_card = valid_card2chk_card(chk, card_valid)
 
-    print("Converting CHK cards to card check...")
-    card_chk = chk_card2card_chk(chk_card, card_valid)
+        print("Converting CHK cards to card check...")
+        card_chk = chk_card2card_chk(chk_card, card_valid)
 
-    print("Converting CHK cards to EBD formatted units...")
-    ebd_f_u = chk_card2ebd_f_u(ebd, chk_card)
+        print("Converting CHK cards to EBD formatted units...")
+        ebd_f_u = chk_card2ebd_f_u(ebd, chk_card)
 
     print("Converting EBD formatted units to card expressions...")
-    card_exp = ebd_f_u2card_exp(card_chk, ebd_f_u)
+    card_exp, records = ebd_f_u2card_exp(card_chk, ebd_f_u, columnar=True)
+    # JSON of the records, shared by the fingerprints of the cards and the JSON export
+    records_json = _records_json(records)
+
+    if state_dir is not None:
+        print("Comparing cards with the previous state...")
+        card_exp, deleted, state = _update_state(
+            state,
+            fingerprint,
+            affected,
+            card_valid,
+            card_chk,
+            card_exp,
+            records_json,
+        )
+        print(f"{len(card_exp)} new or changed cards, {len(deleted)} deleted cards.")
 
-    print("Converting card expressions to JSON format...")
-    json_data = card_exp.to_json(orient="records", indent=2)
 
     if JSON_file is None:
         basename = (
-            os.path.basename(EBD_file).removesuffix(".txt.gz").removesuffix(".txt")
+            os.path.basename(EBD_file)
+            .removesuffix(".tar")
+            .removesuffix(".txt.gz")
+            .removesuffix(".txt")
         )
         JSON_file = (
             f"{basename}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         )
 
-    print(f"Writing JSON data to {JSON_file}...")
-    with open(JSON_file, "w") as f:
-        f.write(json_data)
+    # Path of the other output files, without the JSON and compression extensions
+    name, extension = os.path.splitext(os.fspath(JSON_file))
+    if extension in _JSON_COMPRESSIONS:
+        name, extension = os.path.splitext(name)
+    if extension not in (".json",) + _NDJSON_EXTENSIONS:
+        name += extension
+
+    if shard_dir is None:
+        print(f"Writing JSON data to {JSON_file}...")
+        _write_cards_json(card_exp, JSON_file, records_json, *_json_options(JSON_file, None, "infer"))
+    else:
+        print(f"Writing JSON shards to {shard_dir}...")
+        manifest = _write_cards_shards(
+            card_exp, shard_dir, records_json, extension=os.fspath(JSON_file)[len(name) :] or ".json"
+        )
+        print(f"{len(manifest['shards'])} shards written.")
+
+    if state_dir is not None and len(deleted) > 0:
+        if shard_dir is None:
+            deleted_file = f"{os.path.splitext(JSON_file)[0]}_deleted.json"
+        else:
+            deleted_file = os.path.join(shard_dir, "deleted.json")
+        print(f"Writing deleted cards to {deleted_file}...")
+        with open(deleted_file, "w") as f:
+            json.dump(deleted, f, indent=2)
+
+    if exportTables is not None:
+        print(f"Writing {exportTables} tables...")
+        write_cards_tables(card_exp, name, records, format=exportTables)
 
     if exportCSV:
         print(f"Writing CSV data...")
-        card_chk.to_csv(
-            f"{basename}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_cards.csv",
-            index=False,
-        )
-        ebd_f_u[["CARD", "ADU", "SEQ"]].to_csv(
-            f"{basename}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_records.csv",
-            index=False,
-        )
+        card_chk, ebd_f_u = _with_card_number(card_chk, ebd_f_u)
+        card_chk.drop(columns="GROUP").to_csv(f"{name}_cards.csv", index=False)
+        ebd_f_u[["CARD", "ADU", "SEQ"]].to_csv(f"{name}_records.csv", index=False)
+
+    if state_dir is not None:
+        # Saved once the cards are written, so that a failed export is done again by the next run
+        print("Saving state...")
+        save_state(state_dir, state, settings)
 
     print("Process completed successfully.")
 
 
-def download_EBD(year=None, month=None):
+def download_EBD(year=None, month=None, extract=False, data_dir="../data/eBird/", checksum=None):
+    # The tar release can be read directly by read_EBD, read_EBD_chunks and ebird2abap. Use extract=True to also extract it.
     if (year is None) | (month is None):
         # Calculate previous month and year
         today = datetime.date.today()
@@ -85,62 +368,288 @@ def download_EBD(year=None, month=None):
     # Construct URL and filename
     url = f"https://download.ebird.org/ebd/prepackaged/ebd_AFR_rel{month}-{year}.tar"
     filename = os.path.basename(url)
-    filepath = os.path.join("../data/eBird/", filename)
+    filepath = os.path.join(data_dir, filename)
 
-    with open(filepath, "wb") as f:
-        print(f"Request data at {url}")
-        f.write(requests.get(url).content)
+    print(f"Request data at {url}")
+    download_file(url, filepath, checksum=checksum)
 
-    with tarfile.open(filepath, "r") as tar:
-        tar.extractall(f"../data/eBird/ebd_AFR_rel{month}-{year}/")
+    if extract:
+        with tarfile.open(filepath, "r") as tar:
+            tar.extractall(os.path.join(data_dir, f"ebd_AFR_rel{month}-{year}/"))
 
     return filepath
 
 
-def read_EBD(file, nrows=None):
-    ebd0 = pd.read_csv(
-        file,
-        delimiter="\t",
-        usecols=[
-            "SAMPLING EVENT IDENTIFIER",
-            "GROUP IDENTIFIER",
-            "SCIENTIFIC NAME",
-            "TAXON CONCEPT ID",
-            "CATEGORY",
-            "LATITUDE",
-            "LONGITUDE",
-            "OBSERVATION DATE",
-            "TIME OBSERVATIONS STARTED",
-            "PROTOCOL TYPE",
-            "DURATION MINUTES",
-            "EFFORT DISTANCE KM",
-            "ALL SPECIES REPORTED",
-            "OBSERVER ID",
-        ],
-        parse_dates=["OBSERVATION DATE"],
-        nrows=nrows,  # Use this to read only a smaller portion of the file to run faster and test the code
+def download_file(
+    url,
+    filepath,
+    checksum=None,
+    chunk_size=2**20,
+    max_retries=5,
+    timeout=60,
+    session=None,
+):
+    """
+    Download a (large) file in a streaming and resumable way.
+
+    The file is streamed in chunks to `<filepath>.part`, so that it is never
+    held in memory. If the connection drops, the download is resumed where it
+    stopped with an HTTP Range request (also across runs, as long as the
+    `.part` file is kept). The ETag or Last-Modified of the first response is
+    sent back in an If-Range header, so that a file changed on the server is
+    downloaded again from scratch instead of being appended to the old part.
+    Once complete, the size (and `checksum` if given) are verified and the
+    file is moved to `filepath`, with the modification time of the server.
+
+    If `filepath` already exists and is up to date (same checksum if given,
+    otherwise same size and not older than the server's Last-Modified), the
+    download is skipped.
+
+    Parameters:
+    -----------
+    url : str
+        URL of the file.
+    filepath : str
+        Output file path.
+    checksum : str, optional
+        Expected checksum as "<algorithm>:<hex digest>", e.g., "md5:9e10...".
+        Any algorithm of hashlib is accepted.
+    chunk_size : int, default=2**20
+        Size in bytes of the chunks written to disk.
+    max_retries : int, default=5
+        Number of consecutive failed attempts before giving up. An attempt
+        only resets the count if it extends the download by at least
+        `chunk_size` bytes.
+    timeout : float, default=60
+        Timeout in seconds of the connection and of each read.
+    session : requests.Session, optional
+        Session used for the requests. By default, a new session closed
+        at the end of the download.
+
+    Returns:
+    --------
+    str
+        filepath
+    """
+    if session is None:
+        with requests.Session() as session:
+            return download_file(url, filepath, checksum, chunk_size, max_retries, timeout, session)
+
+    part = f"{filepath}.part"
+
+    # Skip the download if the file is already up to date
+    if os.path.exists(filepath):
+        if checksum is not None:
+            if _file_checksum(filepath, checksum) == checksum.split(":", 1)[1].lower():
+                print(f"{filepath} is up to date (checksum).")
+                return filepath
+        else:
+            head = session.head(url, allow_redirects=True, timeout=timeout)
+            head.raise_for_status()
+            size = head.headers.get("Content-Length")
+            modified = _http_date(head.headers.get("Last-Modified"))
+            if (
+                size is not None
+                and int(size) == os.path.getsize(filepath)
+                and (modified is None or modified <= os.path.getmtime(filepath))
+            ):
+                print(f"{filepath} is up to date.")
+                return filepath
+
+    # Validator (ETag or Last-Modified) of the version of the file in the .part file
+    validator_file = f"{part}.validator"
+    total = None
+    modified = None
+    retries = 0
+    largest = 0
+    start = time.monotonic()
+    downloaded = 0
+    while True:
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        validator = _read_validator(validator_file) if offset > 0 else None
+        if validator is None:
+            # Unknown version of the .part file: restart from scratch
+            offset = 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset > 0 else {}
+        received = 0
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as r:
+                if r.status_code == 416:
+                    # Nothing left to download: the .part file is complete if it has the size of the file
+                    content_range = r.headers.get("Content-Range", "")
+                    total = int(content_range.rsplit("/", 1)[1]) if content_range.startswith("bytes */") else None
+                    if total == offset:
+                        break
+                    error = f"Size of {part} ({offset}) does not match the size of the file ({total})"
+                    _remove_part(part, validator_file)
+                elif r.status_code == 206 and _response_validator(r.headers) not in (None, validator):
+                    error = f"{url} changed since the download of {part} started"
+                    _remove_part(part, validator_file)
+                else:
+                    r.raise_for_status()
+                    if r.status_code != 206:
+                        # The file changed (If-Range) or the server ignored the range request: restart from scratch
+                        offset = 0
+                        _write_validator(validator_file, _response_validator(r.headers))
+                    total = _content_total(r.headers, offset)
+                    modified = _http_date(r.headers.get("Last-Modified"))
+                    with open(part, "ab" if offset > 0 else "wb") as f:
+                        for chunk in r.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                            received += len(chunk)
+                    if total is None or offset + received >= total:
+                        # Complete (or unknown size: the server closed the connection at the end of the file)
+                        downloaded += received
+                        break
+                    error = "Incomplete response"
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            error = f"Connection lost ({e.__class__.__name__})"
+        downloaded += received
+
+        # Retry, as long as the attempts keep on extending the .part file by at least a chunk
+        if offset + received >= largest + chunk_size:
+            retries = 0
+        largest = max(largest, offset + received)
+        retries += 1
+        if retries > max_retries:
+            raise IOError(f"Download of {url} failed after {max_retries} retries: {error}")
+        print(f"{error}, resuming download ({retries}/{max_retries})...")
+        time.sleep(min(2**retries, 30) * 0.1)
+
+    elapsed = time.monotonic() - start
+    print(
+        f"Downloaded {downloaded / 2**20:.1f} MB in {elapsed:.1f} s "
+        f"({downloaded / 2**20 / max(elapsed, 1e-9):.1f} MB/s)"
     )
 
+    # Integrity checks
+    size = os.path.getsize(part)
+    if total is not None and size != total:
+        raise IOError(f"Downloaded size of {part} ({size}) does not match the expected size ({total})")
+    if checksum is not None:
+        digest = _file_checksum(part, checksum)
+        if digest != checksum.split(":", 1)[1].lower():
+            _remove_part(part, validator_file)
+            raise IOError(f"Checksum of {url} ({digest}) does not match {checksum}")
+
+    os.replace(part, filepath)
+    _remove_part(part, validator_file)
+    if modified is not None:
+        os.utime(filepath, (modified, modified))
+    return filepath
+
+
+def _content_total(headers, offset):
+    # Total size of the file from the Content-Range (partial response) or Content-Length header
+    content_range = headers.get("Content-Range")
+    if content_range is not None and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total != "*":
+            return int(total)
+    if headers.get("Content-Length") is not None:
+        return offset + int(headers["Content-Length"])
+    return None
+
+
+def _response_validator(headers):
+    # Strong ETag or Last-Modified of a response, usable in an If-Range header
+    etag = headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _read_validator(validator_file):
+    # Validator saved with a .part file, None if unknown
+    if not os.path.exists(validator_file):
+        return None
+    with open(validator_file) as f:
+        return f.read() or None
+
+
+def _write_validator(validator_file, validator):
+    # Save the validator of a .part file (empty if the server sent none: the download cannot be resumed)
+    with open(validator_file, "w") as f:
+        f.write(validator or "")
+
+
+def _remove_part(part, validator_file):
+    # Remove a .part file that cannot be resumed, with its validator
+    for file in [part, validator_file]:
+        if os.path.exists(file):
+            os.remove(file)
+
+
+def _http_date(value):
+    # Convert an HTTP date header to a timestamp (UTC if without timezone), None if missing or invalid
+    if value is None:
+        return None
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return date.timestamp()
+
+
+def _file_checksum(filepath, checksum):
+    # Hex digest of the file with the algorithm of checksum ("<algorithm>:<hex digest>")
+    h = hashlib.new(checksum.split(":", 1)[0])
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_EBD(
+    file,
+    nrows=None,
+    compact=False,
+    bbox=None,
+    pentads=None,
+    date_range=None,
+    protocols=None,
+):
+    # file can also be a parquet dataset written by convert_EBD_to_parquet
+    # bbox, pentads, date_range and protocols drop the rows outside the selection as the file is read (see filter_EBD)
+    filters = dict(bbox=bbox, pentads=pentads, date_range=date_range, protocols=protocols)
+    if _is_parquet(file):
+        ebd0 = read_EBD_parquet(file, nrows=nrows, filters=_EBD_parquet_filters(**filters))
+        ebd0 = filter_EBD(ebd0, **filters)
+    elif any(v is not None for v in filters.values()):
+        # Filter the file in chunks so that only the selected rows are held in memory
+        ebd0 = pd.concat(
+            _read_EBD_raw(file, EBD_COLUMNS, _EBD_FILTER_CHUNKSIZE, nrows, compact, **filters),
+            ignore_index=True,
+        )
+    else:
+        # file can also be the .tar release, read without extraction
+        with _open_EBD(file) as (f, compression):
+            ebd0 = pd.read_csv(
+                f,
+                delimiter="\t",
+                usecols=EBD_COLUMNS,
+                parse_dates=["OBSERVATION DATE"],
+                dtype=_EBD_COMPACT_DTYPES if compact else None,
+                compression=compression,
+                nrows=nrows,  # Use this to read only a smaller portion of the file to run faster and test the code
+            )
+
+    # Use low-memory dtypes (see compact_EBD)
+    if compact:
+        ebd0 = compact_EBD(ebd0)
+
     ebd = ebd0
 
     # Combine shared checklist: Overwrite sampling event identifier by the first one submitted (lower SXXXXXX value)
-    ebd["SAMPLING EVENT IDENTIFIER"] = (
-        ebd.groupby("GROUP IDENTIFIER")["SAMPLING EVENT IDENTIFIER"]
-        .transform("min")
-        .where(ebd["GROUP IDENTIFIER"].notna(), ebd["SAMPLING EVENT IDENTIFIER"])
-    )
-    # Drop the GROUP IDENTIFIER column
-    ebd = ebd.drop(columns="GROUP IDENTIFIER")
+    ebd = merge_shared_checklist(ebd, shared_checklist_map(ebd))
 
-    # Create OBSERVATIONDATETIME by combining date and time
-    tmp = ebd["TIME OBSERVATIONS STARTED"].fillna("00:00:00")
-    ebd["OBSERVATION DATETIME"] = pd.to_datetime(
-        ebd["OBSERVATION DATE"].dt.strftime("%Y-%m-%d") + " " + tmp,
-        format="%Y-%m-%d %H:%M:%S",
-    )
+    # Create OBSERVATION DATETIME and MINUTE OF DAY from the date and start time
+    ebd = add_observation_datetime(ebd)
 
     # Sort by date: Important to have for filtering duplicate card-adu and needed for sequence
-    ebd.sort_values(by="OBSERVATION DATETIME", inplace=True)
+    ebd.sort_values(by="OBSERVATION DATETIME", inplace=True, kind="stable")
 
     # Keep only species category
     # ebd0[["COMMONNAME", "SCIENTIFIC NAME", "CATEGORY"]].drop_duplicates().to_csv("species_list_ebird.csv", index=False)
@@ -152,6 +661,583 @@ def read_EBD(file, nrows=None):
     return ebd
 
 
+def shared_checklist_map(ebd):
+    # Map each GROUP IDENTIFIER to the first sampling event submitted for that group
+    return (
+        ebd.loc[ebd["GROUP IDENTIFIER"].notna()]
+        .groupby("GROUP IDENTIFIER")["SAMPLING EVENT IDENTIFIER"]
+        .min()
+    )
+
+
+def merge_shared_checklist(ebd, group_map):
+    # Overwrite the sampling event identifier of shared checklists with the one of group_map
+    ebd["SAMPLING EVENT IDENTIFIER"] = (
+        ebd["GROUP IDENTIFIER"]
+        .map(group_map)
+        .where(ebd["GROUP IDENTIFIER"].notna(), ebd["SAMPLING EVENT IDENTIFIER"])
+        .astype(ebd["SAMPLING EVENT IDENTIFIER"].dtype)
+    )
+    # Drop the GROUP IDENTIFIER column
+    return ebd.drop(columns="GROUP IDENTIFIER")
+
+
+def add_observation_datetime(ebd):
+    # Start time in seconds of the day, either from the minute of the day (compact_EBD) or from the "HH:MM:SS" string
+    time = ebd["TIME OBSERVATIONS STARTED"]
+    if pd.api.types.is_numeric_dtype(time):
+        seconds = time.astype("float64") * 60
+    else:
+        seconds = _time2seconds(time)
+
+    # Minute of the day, kept as missing when the start time is missing
+    ebd["MINUTE OF DAY"] = (seconds // 60).astype("Int16")
+
+    # Create OBSERVATION DATETIME by adding the start time (00:00:00 if missing) to the date
+    ebd["OBSERVATION DATETIME"] = ebd["OBSERVATION DATE"] + pd.to_timedelta(
+        seconds.fillna(0).astype("int64"), unit="s"
+    )
+    return ebd
+
+
+def _time2seconds(time):
+    # Parse "HH:MM:SS" strings into seconds of the day. Each distinct time (at most 86,400) is parsed only once.
+    codes, uniques = pd.factorize(time)
+    seconds = pd.to_timedelta(uniques).total_seconds().to_numpy()
+    # Missing times have code -1, i.e., the NaN appended at the end
+    return pd.Series(np.append(seconds, np.nan)[codes], index=time.index)
+
+
+def filter_EBD(ebd, bbox=None, pentads=None, date_range=None, protocols=None):
+    """
+    Keep only the EBD rows within a region, a date range and a set of protocols.
+
+    Used by `read_EBD` and `read_EBD_chunks` to drop the rows outside the
+    selection as the file is read, before any further processing. Filters
+    which are None are not applied.
+
+    Parameters:
+    -----------
+    ebd : pandas.DataFrame
+        EBD rows with the columns needed by the filters.
+    bbox : tuple of float, optional
+        (min_lng, min_lat, max_lng, max_lat), bounds included.
+    pentads : list of str, optional
+        Pentad IDs (e.g., "2530_2750") of the checklists to keep.
+    date_range : tuple, optional
+        (start, end) observation dates, bounds included. Either can be None
+        for an open range.
+    protocols : list of str, optional
+        PROTOCOL TYPE values to keep (e.g., ["Traveling", "Stationary"]).
+
+    Returns:
+    --------
+    pandas.DataFrame
+    """
+    mask = np.ones(len(ebd), dtype=bool)
+
+    if bbox is not None:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        mask &= (
+            ebd["LATITUDE"].between(min_lat, max_lat)
+            & ebd["LONGITUDE"].between(min_lng, max_lng)
+        ).to_numpy()
+
+    if date_range is not None:
+        start, end = date_range
+        if start is not None:
+            mask &= (ebd["OBSERVATION DATE"] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (ebd["OBSERVATION DATE"] <= pd.Timestamp(end)).to_numpy()
+
+    if protocols is not None:
+        mask &= ebd["PROTOCOL TYPE"].isin(protocols).to_numpy()
+
+    if pentads is not None:
+        # Cheap pre-selection on the bounding box of the pentads (padded by one pentad), then exact pentad code
+        pentad_code = str2pentad_code(list(pentads))
+        min_lng, min_lat, max_lng, max_lat = _pentads_bbox(pentad_code)
+        mask &= (
+            ebd["LATITUDE"].between(min_lat, max_lat)
+            & ebd["LONGITUDE"].between(min_lng, max_lng)
+        ).to_numpy()
+        idx = np.flatnonzero(mask)
+        mask[idx] = np.isin(
+            latlng2pentad_code(
+                ebd["LATITUDE"].to_numpy()[idx], ebd["LONGITUDE"].to_numpy()[idx]
+            ),
+            pentad_code,
+        )
+
+    if mask.all():
+        return ebd
+    return ebd.loc[mask]
+
+
+def _pentads_bbox(pentad_code):
+    # Bounding box of the pentads, padded by one pentad as the "named" cells of northern and western pentads are offset from their points
+    minx, miny, maxx, maxy = pentad_code2bounds(pentad_code)
+    d = 5 / 60
+    return (
+        np.min(minx) - d,
+        np.min(miny) - d,
+        np.max(maxx) + d,
+        np.max(maxy) + d,
+    )
+
+
+def _EBD_parquet_filters(bbox=None, pentads=None, date_range=None, protocols=None):
+    # Same selection as filter_EBD, as pyarrow filters, so that only the matching partitions and row groups are read
+    filters = []
+    if bbox is not None:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        filters += [
+            ("LATITUDE", ">=", min_lat),
+            ("LATITUDE", "<=", max_lat),
+            ("LONGITUDE", ">=", min_lng),
+            ("LONGITUDE", "<=", max_lng),
+        ]
+    if date_range is not None:
+        start, end = date_range
+        if start is not None:
+            start = pd.Timestamp(start)
+            filters += [("YEAR", ">=", start.year), ("OBSERVATION DATE", ">=", start)]
+        if end is not None:
+            end = pd.Timestamp(end)
+            filters += [("YEAR", "<=", end.year), ("OBSERVATION DATE", "<=", end)]
+    if protocols is not None:
+        filters.append(("PROTOCOL TYPE", "in", list(protocols)))
+    if pentads is not None:
+        # Degree square partitions of the pentads. The exact pentads are selected by filter_EBD
+        filters.append(("DEGREE SQUARE", "in", sorted(set(_degree_square(list(pentads))))))
+    return filters or None
+
+
+def compact_EBD(ebd):
+    """
+    Convert the EBD columns to low-memory dtypes.
+
+    - `SAMPLING EVENT IDENTIFIER`, `GROUP IDENTIFIER` and `OBSERVER ID` are
+      stored as integers without their prefix ("S", "G" and "obsr").
+    - `SCIENTIFIC NAME`, `TAXON CONCEPT ID`, `CATEGORY` and `PROTOCOL TYPE`
+      are categoricals.
+    - `LATITUDE` and `LONGITUDE` are float32 (about 1 m precision).
+    - `ALL SPECIES REPORTED` is a boolean.
+    - `TIME OBSERVATIONS STARTED` is the minute of the day (nullable integer).
+
+    Columns which are missing or already converted are left untouched. All
+    the downstream functions accept these dtypes, and the identifiers are
+    converted back to their string format in the exported cards.
+
+    Note that shared checklists are then merged on the lowest numerical
+    sampling event identifier instead of the lowest string.
+
+    Parameters:
+    -----------
+    ebd : pandas.DataFrame
+        Raw EBD columns as read from the file.
+
+    Returns:
+    --------
+    pandas.DataFrame
+    """
+    for col, prefix in _EBD_ID_PREFIX.items():
+        if col in ebd.columns and not pd.api.types.is_numeric_dtype(ebd[col]):
+            ebd[col] = (
+                ebd[col]
+                .str[len(prefix) :]
+                .astype("Int64" if col == "GROUP IDENTIFIER" else "int64")
+            )
+
+    for col, dtype in _EBD_COMPACT_DTYPES.items():
+        if col in ebd.columns:
+            ebd[col] = ebd[col].astype(dtype)
+
+    col = "TIME OBSERVATIONS STARTED"
+    if col in ebd.columns and not pd.api.types.is_numeric_dtype(ebd[col]):
+        ebd[col] = (pd.to_timedelta(ebd[col]).dt.total_seconds() // 60).astype(
+            "Int16"
+        )
+
+    return ebd
+
+
+def read_EBD_chunks(
+    file,
+    chunksize=None,
+    max_memory=None,
+    nrows=None,
+    adu=True,
+    compact=False,
+    bbox=None,
+    pentads=None,
+    date_range=None,
+    protocols=None,
+):
+    """
+    Stream an EBD file in chunks of rows.
+
+    The file is read twice: a first light pass over the `GROUP IDENTIFIER` and
+    `SAMPLING EVENT IDENTIFIER` columns builds the shared checklist map (a
+    shared checklist can span several chunks), then the second pass yields each
+    chunk with the shared checklists merged, `OBSERVATION DATETIME` built and,
+    if `adu` is True, the ADU number added. Each chunk is sorted by datetime,
+    but the chunks are not sorted with respect to each other.
+
+    Parameters:
+    -----------
+    file : str
+        Path to the EBD file (`.txt` or `.txt.gz`), to the `.tar` release or
+        to a parquet dataset written by `convert_EBD_to_parquet`.
+    chunksize : int, optional
+        Number of rows per chunk.
+    max_memory : float, optional
+        Approximate memory ceiling in MB for one chunk in flight. When
+        `chunksize` is not given, a probe chunk is read to measure the
+        in-memory size of a row and `chunksize` is derived from it, allowing
+        for the copies made while processing the chunk.
+    nrows : int, optional
+        Only read the first `nrows` rows of the file.
+    adu : bool, default=True
+        Add the ADU number to each chunk (see `add_ADU`).
+    compact : bool, default=False
+        Use low-memory dtypes (see `compact_EBD`).
+    bbox, pentads, date_range, protocols : optional
+        Only keep the rows within this selection (see `filter_EBD`). Rows
+        are dropped as soon as each chunk is read, so that chunks only
+        contain selected rows. `chunksize` and `nrows` count the rows read
+        from the file, before filtering.
+
+    Yields:
+    -------
+    pandas.DataFrame
+        Processed chunk with the same columns as `read_EBD` (plus `ADU`).
+    """
+    if chunksize is None and max_memory is None:
+        raise ValueError("Either chunksize or max_memory must be provided.")
+
+    filters = dict(bbox=bbox, pentads=pentads, date_range=date_range, protocols=protocols)
+
+    if chunksize is None:
+        # Derive the chunk size from the memory used by the rows of a probe chunk
+        probe = next(
+            _read_EBD_raw(file, EBD_COLUMNS, _EBD_PROBE_ROWS, nrows, compact)
+        )
+        row_bytes = probe.memory_usage(deep=True).sum() / max(len(probe), 1)
+        chunksize = max(
+            1, int(max_memory * 2**20 / (row_bytes * _EBD_PROCESSING_OVERHEAD))
+        )
+        del probe
+
+    # First pass: shared checklist map (of the selected rows, as in read_EBD)
+    group_map = [
+        shared_checklist_map(chunk)
+        for chunk in _read_EBD_raw(
+            file,
+            ["SAMPLING EVENT IDENTIFIER", "GROUP IDENTIFIER"]
+            + _EBD_filter_columns(**filters),
+            chunksize,
+            nrows,
+            compact,
+            **filters,
+        )
+    ]
+    group_map = pd.concat(group_map)
+    group_map = group_map.groupby(level=0).min()
+
+    matched_species = load_matched_species() if adu else None
+
+    # Second pass: process each chunk
+    for ebd in _read_EBD_raw(file, EBD_COLUMNS, chunksize, nrows, compact, **filters):
+        if len(ebd) == 0:
+            continue
+        ebd = merge_shared_checklist(ebd, group_map)
+        ebd = add_observation_datetime(ebd)
+        ebd.sort_values(by="OBSERVATION DATETIME", inplace=True, kind="stable")
+        if adu:
+            ebd = add_ADU(ebd, matched_species=matched_species)
+        yield ebd
+
+
+def _read_EBD_raw(file, usecols, chunksize, nrows=None, compact=False, **filters):
+    # Yield the raw (unprocessed) columns of an EBD text file, tar release or parquet dataset in chunks
+    # Rows outside the selection of filters (see filter_EBD) are dropped first
+    if _is_parquet(file):
+        for chunk in _read_EBD_parquet_batches(
+            file, usecols, chunksize, nrows, _EBD_parquet_filters(**filters)
+        ):
+            chunk = filter_EBD(chunk, **filters)
+            yield compact_EBD(chunk) if compact else chunk
+        return
+
+    with _open_EBD(file) as (f, compression):
+        with pd.read_csv(
+            f,
+            delimiter="\t",
+            usecols=usecols,
+            parse_dates=["OBSERVATION DATE"] if "OBSERVATION DATE" in usecols else False,
+            dtype=(
+                {k: v for k, v in _EBD_COMPACT_DTYPES.items() if k in usecols}
+                if compact
+                else None
+            ),
+            compression=compression,
+            chunksize=chunksize,
+            nrows=nrows,
+        ) as chunks:
+            for chunk in chunks:
+                chunk = filter_EBD(chunk, **filters)
+                yield compact_EBD(chunk) if compact else chunk
+
+
+def _EBD_filter_columns(bbox=None, pentads=None, date_range=None, protocols=None):
+    # Columns needed by filter_EBD
+    columns = []
+    if bbox is not None or pentads is not None:
+        columns += ["LATITUDE", "LONGITUDE"]
+    if date_range is not None:
+        columns.append("OBSERVATION DATE")
+    if protocols is not None:
+        columns.append("PROTOCOL TYPE")
+    return columns
+
+
+@contextlib.contextmanager
+def _open_EBD(file):
+    """
+    Open an EBD file for pd.read_csv.
+
+    Text files (`.txt` or `.txt.gz`) are passed through as is. For a `.tar`
+    release (as downloaded by `download_EBD`), the EBD member
+    (`ebd_*.txt.gz`, not the sampling event file) is streamed out of the
+    archive without extracting it to disk.
+
+    Yields:
+    -------
+    tuple
+        (file path or file object, compression) to pass to pd.read_csv.
+    """
+    if not str(file).endswith(".tar"):
+        yield file, "infer"
+        return
+
+    # Stream mode ("r|") reads the archive sequentially, without seeking
+    with tarfile.open(file, "r|") as tar:
+        for member in tar:
+            name = os.path.basename(member.name)
+            if (
+                member.isfile()
+                and name.startswith("ebd_")
+                and name.endswith((".txt.gz", ".txt"))
+                and "sampling" not in name
+            ):
+                yield tar.extractfile(member), "gzip" if name.endswith(".gz") else None
+                return
+    raise FileNotFoundError(f"No EBD file (ebd_*.txt.gz) found in {file}")
+
+
+def spill_EBD(file, spill_dir, chunksize=None, max_memory=None, nrows=None, **kwargs):
+    """
+    Stream an EBD file to compact partitions on disk.
+
+    Each chunk of `read_EBD_chunks` is reduced to the columns needed at
+    record level and written as a pickle in `spill_dir`. The checklist-level
+    columns (one row per checklist) are kept in memory and returned so that
+    `ebd2chk` can be run on them. Additional keyword arguments are passed
+    to `read_EBD_chunks`.
+
+    Returns:
+    --------
+    tuple
+        (partitions, chk) - list of partition paths and DataFrame of
+        checklist rows ready for `ebd2chk`.
+    """
+    partitions = []
+    chk = []
+    for i, ebd in enumerate(
+        read_EBD_chunks(
+            file, chunksize=chunksize, max_memory=max_memory, nrows=nrows, **kwargs
+        )
+    ):
+        chk.append(ebd[CHK_COLUMNS].drop_duplicates())
+        partition = os.path.join(spill_dir, f"ebd_{i:05d}.pkl")
+        ebd[RECORD_COLUMNS].to_pickle(partition)
+        partitions.append(partition)
+    return partitions, pd.concat(chk, ignore_index=True)
+
+
+def read_EBD_partitions(partitions):
+    # Lazily read the partitions written by spill_EBD
+    for partition in partitions:
+        yield pd.read_pickle(partition)
+
+
+def convert_EBD_to_parquet(EBD_file, parquet_dir, chunksize=1_000_000):
+    """
+    Convert an EBD file to a partitioned parquet dataset.
+
+    Only the columns used by `read_EBD` are kept. The dataset is partitioned
+    (hive style) by `YEAR` of observation and `DEGREE SQUARE` (the degree part
+    of the pentad, e.g., "25_27" for pentad "2530_2750" or "10_100" for
+    pentad "1010_10005"), so that a year or a region can be read without
+    scanning the rest of the release. A previous dataset in `parquet_dir` is
+    replaced. The
+    conversion is done in chunks of `chunksize` rows.
+
+    The dataset can be passed in place of the EBD file to `read_EBD`,
+    `read_EBD_chunks` and `ebird2abap`, or read directly with
+    `read_EBD_parquet`.
+
+    Parameters:
+    -----------
+    EBD_file : str
+        Path to the EBD file (`.txt` or `.txt.gz`) or to the `.tar` release.
+    parquet_dir : str
+        Output directory of the dataset.
+    chunksize : int, default=1_000_000
+        Number of rows converted at a time.
+
+    Returns:
+    --------
+    str
+        parquet_dir
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    # Replace a previous dataset, as the chunks are added to the existing partitions
+    if os.path.isdir(parquet_dir) and os.listdir(parquet_dir):
+        if not all(name.startswith("YEAR=") for name in os.listdir(parquet_dir)):
+            raise ValueError(
+                f"{parquet_dir} is not empty and is not a dataset written by convert_EBD_to_parquet"
+            )
+        shutil.rmtree(parquet_dir)
+
+    schema = _ebd_parquet_schema()
+    for i, ebd in enumerate(_read_EBD_raw(EBD_file, EBD_COLUMNS, chunksize)):
+        ebd["YEAR"] = ebd["OBSERVATION DATE"].dt.year
+        ebd["DEGREE SQUARE"] = _degree_square(latlng2pentad_code(ebd["LATITUDE"], ebd["LONGITUDE"]))
+        ds.write_dataset(
+            pa.Table.from_pandas(ebd, schema=schema, preserve_index=False),
+            parquet_dir,
+            format="parquet",
+            partitioning=["YEAR", "DEGREE SQUARE"],
+            partitioning_flavor="hive",
+            basename_template=f"part-{i:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    return parquet_dir
+
+
+def read_EBD_parquet(parquet_dir, columns=None, filters=None, nrows=None):
+    """
+    Read the raw EBD columns from a dataset written by `convert_EBD_to_parquet`.
+
+    Only the requested columns and partitions are read. Use `read_EBD` to
+    get the processed EBD (shared checklists merged, datetime added).
+
+    Parameters:
+    -----------
+    parquet_dir : str
+        Directory of the parquet dataset.
+    columns : list of str, optional
+        Columns to read. Defaults to all the EBD columns used by `read_EBD`.
+    filters : list of tuple, optional
+        Row filters in the pyarrow format, e.g., `[("YEAR", ">=", 2020)]`.
+        Filters on `YEAR` and `DEGREE SQUARE` only read the matching partitions.
+    nrows : int, optional
+        Only read the first `nrows` rows.
+
+    Returns:
+    --------
+    pandas.DataFrame
+    """
+    import pyarrow.parquet as pq
+
+    dataset = _ebd_dataset(parquet_dir)
+    columns = EBD_COLUMNS if columns is None else columns
+    expression = None if filters is None else pq.filters_to_expression(filters)
+    if nrows is None:
+        table = dataset.to_table(columns=columns, filter=expression)
+    else:
+        table = dataset.head(nrows, columns=columns, filter=expression)
+    return table.to_pandas()
+
+
+def _read_EBD_parquet_batches(parquet_dir, columns, chunksize, nrows=None, filters=None):
+    # Yield the columns of the parquet dataset in chunks of chunksize rows
+    import pyarrow.parquet as pq
+
+    dataset = _ebd_dataset(parquet_dir)
+    expression = None if filters is None else pq.filters_to_expression(filters)
+    n = 0
+    for batch in dataset.to_batches(
+        columns=columns, filter=expression, batch_size=chunksize
+    ):
+        if nrows is not None:
+            batch = batch.slice(0, nrows - n)
+        if batch.num_rows == 0:
+            continue
+        n += batch.num_rows
+        yield batch.to_pandas()
+        if nrows is not None and n >= nrows:
+            break
+
+
+def _degree_square(pentads):
+    # Degree square of pentad IDs or codes, e.g., "25_27" for "2530_2750" and "10_100" for "1010_10005" (partitions of convert_EBD_to_parquet)
+    pentads = np.asarray(pentads)
+    codes = pentads if np.issubdtype(pentads.dtype, np.integer) else str2pentad_code(pentads)
+    codes, inverse = np.unique(codes, return_inverse=True)
+    # Degrees and quadrant of the pentad IDs (see pentad_code2str)
+    row, col = _unpack_pentad_code(codes)
+    lat_deg = np.where(row >= 0, row, -row - 1) // 12
+    lng_deg = np.where(col >= 0, col, -col - 1) // 12
+    quadrant = _QUADRANTS[2 * (row < 0) + (col < 0)]
+    squares = [f"{i:02d}{q}{j:02d}" for i, q, j in zip(lat_deg, quadrant, lng_deg)]
+    return np.array(squares, dtype=object)[inverse.ravel()]
+
+
+def _ebd_parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("SAMPLING EVENT IDENTIFIER", pa.string()),
+            ("GROUP IDENTIFIER", pa.string()),
+            ("SCIENTIFIC NAME", pa.string()),
+            ("TAXON CONCEPT ID", pa.string()),
+            ("CATEGORY", pa.string()),
+            ("LATITUDE", pa.float64()),
+            ("LONGITUDE", pa.float64()),
+            ("OBSERVATION DATE", pa.timestamp("ns")),
+            ("TIME OBSERVATIONS STARTED", pa.string()),
+            ("PROTOCOL TYPE", pa.string()),
+            ("DURATION MINUTES", pa.float64()),
+            ("EFFORT DISTANCE KM", pa.float64()),
+            ("ALL SPECIES REPORTED", pa.int64()),
+            ("OBSERVER ID", pa.string()),
+            ("YEAR", pa.int32()),
+            ("DEGREE SQUARE", pa.string()),
+        ]
+    )
+
+
+def _ebd_dataset(parquet_dir):
+    import pyarrow.dataset as ds
+
+    return ds.dataset(
+        parquet_dir,
+        schema=_ebd_parquet_schema(),
+        format="parquet",
+        partitioning="hive",
+    )
+
+
+def _is_parquet(file):
+    return os.path.isdir(file) or str(file).endswith(".parquet")
+
+
 def load_matched_species():
     with pkg_resources.files("eBird2ABAP").joinpath("matched_species.csv") as file_path:
         print(file_path)
@@ -159,17 +1245,17 @@ def load_matched_species():
     return df
 
 
-def add_ADU(ebd, return_unmatched=False):
+def add_ADU(ebd, return_unmatched=False, matched_species=None):
     # Read matched_species data. See species_match.ipynb
-    matched_species = load_matched_species()
+    if matched_species is None:
+        matched_species = load_matched_species()
 
-    ebd = pd.merge(
-        ebd,  # .loc[:,['OBSERVER ID', 'PENTAD', "SAMPLING EVENT IDENTIFIER", "OBSERVATION DATE"]],
-        matched_species[["TAXON CONCEPT ID", "ADU"]].drop_duplicates(
-            subset="TAXON CONCEPT ID"
-        ),
-        how="left",
-    )
+    # Map the ADU of each taxon concept (only the categories are mapped if TAXON CONCEPT ID is categorical)
+    adu = matched_species.drop_duplicates(subset="TAXON CONCEPT ID").set_index(
+        "TAXON CONCEPT ID"
+    )["ADU"]
+    ebd = ebd.reset_index(drop=True)
+    ebd["ADU"] = ebd["TAXON CONCEPT ID"].map(adu).astype("float64")
 
     if return_unmatched:
         unmatched = (
@@ -187,23 +1273,10 @@ def add_ADU(ebd, return_unmatched=False):
 
 
 def ebd2chk(ebd):
-    chk = ebd[
-        [
-            "SAMPLING EVENT IDENTIFIER",
-            "LATITUDE",
-            "LONGITUDE",
-            "OBSERVATION DATE",
-            "OBSERVATION DATETIME",
-            "PROTOCOL TYPE",
-            "DURATION MINUTES",
-            "EFFORT DISTANCE KM",
-            "ALL SPECIES REPORTED",
-            "OBSERVER ID",
-        ]
-    ].drop_duplicates()
+    chk = ebd[CHK_COLUMNS].drop_duplicates()
 
     # Sort by date
-    chk.sort_values(by="OBSERVATION DATETIME", inplace=True)
+    chk.sort_values(by="OBSERVATION DATETIME", inplace=True, kind="stable")
 
     # For some shared checklist some variable are different for the same sampling event.
     # chk[chk["SAMPLING EVENT IDENTIFIER"].duplicated(keep=False)].sort_values(by="SAMPLING EVENT IDENTIFIER")
@@ -217,11 +1290,13 @@ def ebd2chk(ebd):
     )
 
     # Pentad
-    # Assign the pentad to all checklists based on their location
-    chk["PENTAD"] = latlng2pentad(chk["LATITUDE"], chk["LONGITUDE"])
+    # Assign the pentad to all checklists based on their location (as integer code, converted to pentad ID once per pentad)
+    pentad_code = latlng2pentad_code(chk["LATITUDE"], chk["LONGITUDE"])
+    codes, uniques = pd.factorize(pentad_code)
+    chk["PENTAD"] = pentad_code2str(uniques)[codes]
 
     # Retrieve the lat, lon center of the assigned pentad
-    lat, lon = pentad2latlng(chk["PENTAD"])
+    lat, lon = pentad_code2latlng(pentad_code)
 
     # Convert effort distance of the checklisst into degree lat-lon
     effort_distance_lat = 180 / np.pi / 6371 * chk["EFFORT DISTANCE KM"]
@@ -263,9 +1338,51 @@ def ebd2chk(ebd):
         "KEEP PENTAD",
     ] = False
 
+    # Integer codes used to join checklists and cards
+    chk = encode_keys(chk)
+
     return chk
 
 
+def encode_keys(chk):
+    """
+    Add the integer code of the pentad/observer group of each checklist.
+
+    The card pipeline (`chk2valid_card`, `valid_card2chk_card`,
+    `chk_card2card_chk` and `chk_card2ebd_f_u`) groups and joins checklists
+    and cards on integer codes rather than on strings: `GROUP` for the
+    pentad/observer and `CARD` for the cards (see `chk2valid_card`). The card
+    numbers are only built at export (see `card_number`).
+
+    Parameters:
+    -----------
+    chk : pandas.DataFrame
+        Checklists with `PENTAD` and `OBSERVER ID`.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        chk with the `GROUP` column.
+    """
+    chk["GROUP"] = (
+        chk.groupby(["PENTAD", "OBSERVER ID"], sort=False, dropna=False)
+        .ngroup()
+        .astype("int64")
+    )
+    return chk
+
+
+def card_number(card):
+    # CardNo of each card: pentad, observer number and start date (e.g., "0910c0725_r050642_20230815")
+    return (
+        card["PENTAD"]
+        + "_"
+        + _observer_str(card["OBSERVER ID"]).str[3:]
+        + "_"
+        + card["OBSERVATION DATE"].dt.strftime("%Y%m%d")
+    )
+
+
 def chk2valid_card(chk):
     # Find all possible valid card
     # Cards are considered to be full protocol if the sum of durations of the underlying checklists exceed 2 hours over the next rolling 5 days.
@@ -280,62 +1397,125 @@ def chk2valid_card(chk):
     )
 
     # Filter for valid checklist and create in a smaller table
-    check = chk.loc[
-        valid_id, ["PENTAD", "OBSERVER ID", "OBSERVATION DATE", "DURATION MINUTES"]
-    ]
+    check = chk.loc[valid_id, ["GROUP", "OBSERVATION DATE", "DURATION MINUTES"]]
 
     # Combine checklists made by the same observer, pentad, and day. This is an intermediate step which enables us to grid the 5 days windows more easily
+    # checkday is sorted by pentad_observer (GROUP) and date
     checkday = (
-        check.groupby(["PENTAD", "OBSERVER ID", "OBSERVATION DATE"])
+        check.groupby(["GROUP", "OBSERVATION DATE"])
         .agg({"DURATION MINUTES": "sum"})
         .reset_index()
     )
 
-    # Sort the checklist by date
-    checkday.sort_values(by=["OBSERVATION DATE"], inplace=True)
-
-    # Create additional columns
-    checkday["pentad_observer"] = checkday["PENTAD"] + "_" + checkday["OBSERVER ID"]
-    checkday["pentad_observer_date"] = (
-        checkday["PENTAD"]
-        + "_"
-        + checkday["OBSERVER ID"].str[3:]
-        + "_"
-        + checkday["OBSERVATION DATE"].dt.strftime("%Y%m%d")
-    )
-
     # Do a first filter to eliminate all pentad_observer witout sufficient total duration time. (Aim is to just reduce the computation later)
-    pentad_observer_duration = checkday.groupby(["pentad_observer"])[
-        "DURATION MINUTES"
-    ].sum()
-    pentad_observer_duration_index = pentad_observer_duration[
-        pentad_observer_duration >= 2 * 60
-    ].index
     checkday_long = checkday[
-        checkday["pentad_observer"].isin(pentad_observer_duration_index)
+        checkday.groupby("GROUP")["DURATION MINUTES"].transform("sum") >= 2 * 60
     ]
 
-    # Second filter for reducing the test case
-    # pentad_observer_unique = checkday_long["pentad_observer"].unique()
-    # pentad_observer_unique = pentad_observer_unique[0:1000]
-    # checkday_long = checkday_long[checkday_long["pentad_observer"].isin(pentad_observer_unique)]
-
-    # Apply the function defined above for each pentad-observer at the same time (makes operation much faster)
-    checkday_long_card = (
-        checkday_long.groupby("pentad_observer")
-        .apply(checkday_pentad_observer, include_groups=False)
-        .reset_index()
+    # Find the checkdays starting a valid card, for all pentad_observer at once (same cards as checkday_pentad_observer)
+    starts = card_window_starts(
+        checkday_long["GROUP"].to_numpy(),
+        checkday_long["OBSERVATION DATE"].to_numpy(),
+        checkday_long["DURATION MINUTES"].to_numpy(dtype="float64"),
     )
 
-    # Create the DataFrame of all valid card
-    card_valid = checkday_long_card[
-        checkday_long_card["CARD"] == checkday_long_card["pentad_observer_date"]
-    ][["PENTAD", "OBSERVER ID", "OBSERVATION DATE", "CARD"]]
-
-    # Sort by card
-    card_valid.sort_values(by="CARD", inplace=True)
-
-    return card_valid
+    # Create the DataFrame of all valid card, with the pentad and observer of their group and an integer CARD code
+    card_valid = checkday_long.iloc[starts][["GROUP", "OBSERVATION DATE"]]
+    card_valid = card_valid.join(
+        chk.drop_duplicates("GROUP").set_index("GROUP")[["PENTAD", "OBSERVER ID"]],
+        on="GROUP",
+    )
+    card_valid["CARD"] = np.arange(len(card_valid))
+
+    return card_valid[
+        ["PENTAD", "OBSERVER ID", "OBSERVATION DATE", "GROUP", "CARD"]
+    ].reset_index(drop=True)
+
+
+def card_window_starts(group, date, duration, min_duration=2 * 60, window_days=5):
+    """
+    Find the checkdays starting a valid card.
+
+    Vectorized equivalent of applying `checkday_pentad_observer` to each
+    pentad_observer group: within each group, a window starts at the first
+    checkday and covers all the checkdays within `window_days`; the next
+    window starts at the first checkday after it, and so on. A window is a
+    valid card if its total duration is at least `min_duration`.
+
+    The window ends are found with a single `searchsorted` over all groups
+    and their durations with a cumulative sum, so that the cost is linear in
+    the number of checkdays. The windows are then chained from the first
+    checkday of each group, with a compiled loop if numba is installed.
+
+    Parameters:
+    -----------
+    group : numpy.ndarray
+        Integer code of the pentad_observer of each checkday, sorted.
+    date : numpy.ndarray
+        Date (datetime64) of each checkday, sorted within each group, unique.
+    duration : numpy.ndarray
+        Duration (minutes) of each checkday.
+    min_duration : float, default=120
+        Minimum total duration (minutes) of a card.
+    window_days : int, default=5
+        Length of a card in days.
+
+    Returns:
+    --------
+    numpy.ndarray
+        Positions of the checkdays starting a valid card.
+    """
+    n = len(group)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Sort key combining group and day, with groups further apart than any window
+    day = date.astype("datetime64[D]").astype(np.int64)
+    day = day - day.min()
+    key = group.astype(np.int64) * (day.max() + window_days + 1) + day
+
+    # End (exclusive) of the window starting at each checkday, and its total duration
+    end = np.searchsorted(key, key + window_days, side="left")
+    cumsum = np.concatenate([[0.0], np.cumsum(duration)])
+    valid = (cumsum[end] - cumsum[:n]) >= min_duration
+
+    # Chain the windows: the first window of a group starts at its first checkday and the next one at the end of the previous one.
+    # As windows never cross groups, the end of the last window of a group is the first checkday of the next group.
+    kernel = _window_chain_kernel()
+    if kernel is not None:
+        is_start = kernel(end)
+    else:
+        # Follow all the chains at the same time, one window per iteration
+        is_start = np.zeros(n, dtype=bool)
+        first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        current, last = first, np.r_[first[1:], n]
+        while len(current) > 0:
+            is_start[current] = True
+            current = end[current]
+            keep = current < last
+            current, last = current[keep], last[keep]
+
+    return np.flatnonzero(is_start & valid)
+
+
+@functools.lru_cache(maxsize=None)
+def _window_chain_kernel():
+    # Compiled loop over the window chain (see card_window_starts), or None if numba is not installed
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(cache=True)
+    def chain(end):
+        is_start = np.zeros(len(end), dtype=np.bool_)
+        i = 0
+        while i < len(end):
+            is_start[i] = True
+            i = end[i]
+        return is_start
+
+    return chain
 
 
 # To find all pentad with sufficient duration effort (i.e, a sum of 2h over 5 days period), we apply this function for each pentad_observer.
@@ -368,37 +1548,47 @@ def checkday_pentad_observer(df):
 def valid_card2chk_card(chk, card_valid):
     # Create Card dataframe by aggregating all checklists
     # We take back `chk` where all checklists (i.e., including the incidentals, stationary, etc...) and find if they contribute to an existing full card.
-    # Filter for checklist to keep: within pentad and and pentad and observer present in the valid card list
-    chk_keep = chk[
-        (chk["KEEP PENTAD"])
-        & (
-            (chk["PENTAD"] + chk["OBSERVER ID"]).isin(
-                (card_valid["PENTAD"] + card_valid["OBSERVER ID"])
-            )
-        )
-    ]
-
-    # Combine all possible checklits with the valid card based on observer and pentad.
-    # This will create duplicate checklist with all cards submitted by the same observer, same pentad, but any date
-    chk_card = pd.merge(
-        chk_keep,  # .loc[:,['OBSERVER ID', 'PENTAD', "SAMPLING EVENT IDENTIFIER", "OBSERVATION DATE"]],
-        card_valid,
-        on=["OBSERVER ID", "PENTAD"],
-        suffixes=("_chk", "_card"),
-        how="left",
+    # Filter for checklist to keep: within pentad
+    chk_keep = chk[chk["KEEP PENTAD"]]
+
+    # Join each checklist with the last card of the same observer and pentad (GROUP) starting on or before its date.
+    # The cards of an observer and pentad never overlap (see card_window_starts), so this is the only card the checklist can belong to.
+    # Keep the original order of the checklists, which merge_asof needs sorted by date
+    chk_keep = chk_keep.rename(columns={"OBSERVATION DATE": "OBSERVATION DATE_chk"})
+    chk_keep.insert(0, "_order", np.arange(len(chk_keep)))
+    chk_card = pd.merge_asof(
+        chk_keep.sort_values(by="OBSERVATION DATE_chk", kind="stable"),
+        card_valid[["GROUP", "OBSERVATION DATE", "CARD"]]
+        .rename(columns={"OBSERVATION DATE": "OBSERVATION DATE_card"})
+        .sort_values(by="OBSERVATION DATE_card", kind="stable"),
+        left_on="OBSERVATION DATE_chk",
+        right_on="OBSERVATION DATE_card",
+        by="GROUP",
+        direction="backward",
     )
+    chk_card = chk_card.sort_values(by="_order").drop(columns="_order")
 
     # Filter the checklist for checklist beeing within the 5 days of the card so that there will be a single checklist-card now
     duration = (
         chk_card["OBSERVATION DATE_chk"] - chk_card["OBSERVATION DATE_card"]
     ).dt.days
     chk_card = chk_card[(duration >= 0) & (duration < 5)]
+    chk_card = chk_card.astype({"CARD": "int64"})
 
     return chk_card
 
 
 def chk_card2card_chk(chk_card, card_valid):
 
+    # Checklists are listed with their string identifier
+    chk_card = chk_card.assign(
+        **{
+            "SAMPLING EVENT IDENTIFIER": _checklist_str(
+                chk_card["SAMPLING EVENT IDENTIFIER"]
+            )
+        }
+    )
+
     # Cretate the card list with all checklists that belong to it. Compute aggregated value of all checklists
     card_chk = (
         chk_card.groupby("CARD")
@@ -421,32 +1611,24 @@ def chk_card2card_chk(chk_card, card_valid):
 
 
 def chk_card2ebd_f_u(ebd, chk_card):
-    # Filter the full dataset to get only the checklist used in the card data
-    ebd_f = ebd.loc[
-        ebd["SAMPLING EVENT IDENTIFIER"].isin(chk_card["SAMPLING EVENT IDENTIFIER"]),
-        [
-            "SAMPLING EVENT IDENTIFIER",
-            "SCIENTIFIC NAME",
-            "TAXON CONCEPT ID",
-            "ADU",
-            "OBSERVATION DATETIME",
-            "LATITUDE",
-            "LONGITUDE",
-            "EFFORT DISTANCE KM",
-        ],
-    ]
-
-    # Add card_id
-    ebd_f = pd.merge(
-        ebd_f,
-        chk_card.loc[:, ["SAMPLING EVENT IDENTIFIER", "CARD"]],
-        on="SAMPLING EVENT IDENTIFIER",
-        how="left",
-    )
+    # ebd can also be an iterable of DataFrames (e.g., read_EBD_partitions) which are filtered one at a time
+    if isinstance(ebd, pd.DataFrame):
+        ebd = [ebd]
+
+    # Filter the full dataset to get only the checklist used in the card data, and add their card.
+    # Each checklist belongs to a single card: its position in chk_card gives the CARD code of the record, joined on the integer checklist codes
+    checklists = pd.Index(_checklist_code(chk_card["SAMPLING EVENT IDENTIFIER"]))
+    card = chk_card["CARD"].to_numpy()
+    ebd_f = []
+    for part in ebd:
+        position = checklists.get_indexer(_checklist_code(part["SAMPLING EVENT IDENTIFIER"]))
+        keep = position >= 0
+        ebd_f.append(part.loc[keep, RECORD_COLUMNS].assign(CARD=card[position[keep]]))
+    ebd_f = pd.concat(ebd_f, ignore_index=True)
 
     # Keep a unique list of card-species (remove duplicate species in the same card, keeping the first one in time)
     ebd_f.sort_values(
-        by="OBSERVATION DATETIME", inplace=True
+        by="OBSERVATION DATETIME", inplace=True, kind="stable"
     )  # SHould have been done already above, but necessary for keep="first"
 
     ebd_f_u = ebd_f.drop_duplicates(
@@ -460,11 +1642,14 @@ def chk_card2ebd_f_u(ebd, chk_card):
     # )
 
     # Compute the sequence basd on taxonomical order
+    taxon = ebd_f_u["TAXON CONCEPT ID"]
+    if isinstance(taxon.dtype, pd.CategoricalDtype):
+        # Rank categorical taxon (compact_EBD) in the order of their string value
+        taxon = taxon.cat.set_categories(
+            taxon.cat.categories.sort_values(), ordered=True
+        )
     ebd_f_u["SEQ"] = (
-        ebd_f_u.groupby("CARD")["TAXON CONCEPT ID"]
-        .rank(method="min")
-        .fillna(-1)
-        .astype(int)
+        taxon.groupby(ebd_f_u["CARD"]).rank(method="min").fillna(-1).astype(int)
     )
 
     # Not sure why, but fillina NA by nothing
@@ -478,31 +1663,71 @@ def chk_card2ebd_f_u(ebd, chk_card):
     return ebd_f_u
 
 
-def ebd_f_u2card_exp(card_chk, ebd_f_u):
-
-    # Extract the species list per card as a cell for vectorized computation
-    card_sp = (
-        ebd_f_u.groupby("CARD")[
-            [
-                "TAXON CONCEPT ID",
-                "ADU",
-                "SEQ",
-                "LATITUDE",
-                "LONGITUDE",
-                "OBSERVATION DATETIME",
-                "EFFORT DISTANCE KM",
-            ]
-        ]
-        .agg(list)
-        .reset_index()
+def ebd_f_u2card_exp(card_chk, ebd_f_u, columnar=False):
+    """
+    Build the export cards, in the card layout of the ABAP API.
+
+    By default, the species records of each card are a list of dicts in the
+    `records` column. With `columnar=True`, they are returned as a flat
+    table of records instead, sorted by card number: no Python object is
+    built per record, and the cards are serialized directly from the table
+    by `write_cards_json`.
+
+    Parameters:
+    -----------
+    card_chk : pandas.DataFrame
+        Cards (see `chk_card2card_chk`).
+    ebd_f_u : pandas.DataFrame
+        Species records of the cards (see `chk_card2ebd_f_u`).
+    columnar : bool, default=False
+        Return the records as a flat table.
+
+    Returns:
+    --------
+    pandas.DataFrame or tuple
+        card_exp, or (card_exp, records) with `columnar=True`: card_exp
+        without the `records` column, and the records with the fields of
+        the API, the records of each card being the rows with its CardNo.
+    """
+    # Export coordinates and observer in their original format (see compact_EBD)
+    ebd_f_u = ebd_f_u.assign(
+        LATITUDE=_coordinate_float64(ebd_f_u["LATITUDE"]),
+        LONGITUDE=_coordinate_float64(ebd_f_u["LONGITUDE"]),
+        **{"TAXON CONCEPT ID": _category_values(ebd_f_u["TAXON CONCEPT ID"])},
+    )
+    card_chk = card_chk.assign(**{"OBSERVER ID": _observer_str(card_chk["OBSERVER ID"])})
+
+    # Cards sorted by card number (see _with_card_number)
+    card_chk = card_chk.assign(NUMBER=card_number(card_chk)).sort_values(by="NUMBER", kind="stable")
+
+    # Species records of the cards as flat columns, in the order of the cards (and in their order in ebd_f_u within a card)
+    position = pd.Index(card_chk["CARD"]).get_indexer(ebd_f_u["CARD"])
+    rows = np.flatnonzero(position >= 0)
+    rows = rows[np.argsort(position[rows], kind="stable")]
+    count = np.bincount(position[rows], minlength=len(card_chk))
+    records = pd.DataFrame(
+        {
+            "Sequence": ebd_f_u["SEQ"].to_numpy()[rows],
+            "Latitude": ebd_f_u["LATITUDE"].to_numpy()[rows],
+            "Longitude": ebd_f_u["LONGITUDE"].to_numpy()[rows],
+            "Altitude": "",
+            "CardNo": np.repeat(card_chk["NUMBER"].to_numpy(), count),
+            "Spp": ebd_f_u["ADU"].to_numpy()[rows],
+            "SourceSpp": ebd_f_u["TAXON CONCEPT ID"].to_numpy()[rows],
+            "Accuracy": ebd_f_u["EFFORT DISTANCE KM"].to_numpy()[rows] * 1000,
+            "SightingTime": ebd_f_u["OBSERVATION DATETIME"].to_numpy()[rows],
+        },
+        columns=_RECORD_FIELDS,
     )
 
-    # Merge the card information by checklist and species into an export card dataframe
-    card_exp = pd.merge(
-        card_chk,
-        card_sp,
-        on="CARD",
+    # Cards with at least one record, with their number as CARD
+    card_exp = (
+        card_chk.loc[count > 0]
+        .drop(columns="CARD")
+        .rename(columns={"NUMBER": "CARD"})
+        .reset_index(drop=True)
     )
+    count = count[count > 0]
 
     # Set some default values
     card_exp["Protocol"] = "F"
@@ -524,60 +1749,11 @@ def ebd_f_u2card_exp(card_chk, ebd_f_u):
 
     card_exp["TotalHours"] = round(card_exp["DURATION MINUTES_sum"] / 60, 2)
     card_exp["TotalDistance"] = round(card_exp["EFFORT DISTANCE KM_sum"], 2)
-    card_exp["TotalSpp"] = card_exp["ADU"].apply(lambda x: len(x))
+    card_exp["TotalSpp"] = count
     card_exp["StartDate"] = card_exp["OBSERVATION DATETIME_min"].dt.date.apply(str)
     card_exp["EndDate"] = card_exp["OBSERVATION DATETIME_max"].dt.date.apply(str)
     card_exp["StartTime"] = card_exp["OBSERVATION DATETIME_min"].dt.strftime("%H:%M")
 
-    # Function that generate species record to be used for each species of each card
-    def create_records(
-        TAXON_CONCEPT_ID,
-        ADU,
-        SEQ,
-        LATITUDE,
-        LONGITUDE,
-        OBSERVATION_DATETIME,
-        EFFORT_DISTANCE_KM,
-        CARD,
-    ):
-        return [
-            {
-                "Sequence": SEQ,
-                "Latitude": LATITUDE,
-                "Longitude": LONGITUDE,
-                "Altitude": "",
-                "CardNo": CARD,
-                "Spp": ADU,
-                "SourceSpp": TAXON_CONCEPT_ID,
-                "Accuracy": EFFORT_DISTANCE_KM * 1000,
-                "SightingTime": OBSERVATION_DATETIME,
-            }
-            for TAXON_CONCEPT_ID, ADU, SEQ, LATITUDE, LONGITUDE, OBSERVATION_DATETIME, EFFORT_DISTANCE_KM in zip(
-                TAXON_CONCEPT_ID,
-                ADU,
-                SEQ,
-                LATITUDE,
-                LONGITUDE,
-                OBSERVATION_DATETIME,
-                EFFORT_DISTANCE_KM,
-            )
-        ]
-
-    # Apply the function
-    card_exp["records"] = card_exp.apply(
-        lambda row: create_records(
-            row["TAXON CONCEPT ID"],
-            row["ADU"],
-            row["SEQ"],
-            row["LATITUDE"],
-            row["LONGITUDE"],
-            row["OBSERVATION DATETIME"],
-            row["EFFORT DISTANCE KM"],
-            row["CARD"],
-        ),
-        axis=1,
-    )
-
     # Rename to match ABAP server input
     card_exp = card_exp.rename(
         columns={
@@ -589,35 +1765,858 @@ def ebd_f_u2card_exp(card_chk, ebd_f_u):
         }
     )
 
-    card_exp = card_exp.reindex(
-        columns=[
-            "Protocol",
-            "ObserverEmail",
-            "CardNo",
-            "StartDate",
-            "EndDate",
-            "StartTime",
-            "Pentad",
-            "ObserverNo",
-            "TotalHours",
-            "Hour1",
-            "Hour2",
-            "Hour3",
-            "Hour4",
-            "Hour5",
-            "Hour6",
-            "Hour7",
-            "Hour8",
-            "Hour9",
-            "Hour10",
-            "TotalSpp",
-            "InclNight",
-            "AllHabitats",
-            "Checklists",
-            "TotalDistance",
-            "ObserverNoEbird",
-            "records",
+    # All fields but the records, added last
+    card_exp = card_exp.reindex(columns=_CARD_FIELDS[:-1])
+    if columnar:
+        return card_exp, records
+
+    # Records of each card as a list of dicts
+    dicts = records.to_dict(orient="records")
+    offsets = np.r_[0, np.cumsum(count)]
+    card_exp["records"] = [dicts[i:j] for i, j in zip(offsets[:-1], offsets[1:])]
+    return card_exp
+
+
+def write_cards_json(
+    card_exp, file, records=None, lines=None, compression="infer", batch_size=10_000
+):
+    """
+    Write the export cards to a JSON file, batch by batch.
+
+    The file is the same as `card_exp.to_json(orient="records", indent=2)`
+    (the card layout of the ABAP API), or one card per line (NDJSON) with
+    `lines=True`, but the cards are encoded `batch_size` at a time: the JSON
+    of all the cards is never held in memory.
+
+    Parameters:
+    -----------
+    card_exp : pandas.DataFrame or iterable of pandas.DataFrame
+        Export cards (see `ebd_f_u2card_exp`), or batches of export cards.
+    file : str or file-like
+        Path of the file, or file handle (binary, or text if not compressed).
+    records : pandas.DataFrame, optional
+        Species records of the cards, for the cards built with
+        `columnar=True` (see `ebd_f_u2card_exp`). The records are serialized
+        from the table, with the same JSON as the lists of dicts.
+    lines : bool, optional
+        Write one card per line. Defaults to True for the paths ending with
+        `.ndjson` or `.jsonl` (before the compression extension).
+    compression : {"infer", "gzip", "zstd", None}, default="infer"
+        Compression of the file, inferred from the `.gz` or `.zst` extension
+        of the path. zstd requires `zstandard`.
+    batch_size : int, default=10_000
+        Number of cards encoded at once.
+
+    Returns:
+    --------
+    int
+        Number of cards written.
+    """
+    lines, compression = _json_options(file, lines, compression)
+    records_json = _records_json(records) if records is not None else None
+    return _write_cards_json(card_exp, file, records_json, lines, compression, batch_size)
+
+
+def write_cards_shards(card_exp, directory, records=None, max_cards=10_000, extension=".json"):
+    """
+    Write the export cards to JSON shards by year and degree square, with a manifest.
+
+    The cards are split by the year of their StartDate and the degree
+    square of their pentad (e.g., "25_27" for pentad "2530_2750", as the
+    partitions of `convert_EBD_to_parquet`), and each group in shards of at
+    most `max_cards` cards, written to
+    `<directory>/<year>/<degree square>_<shard number><extension>` (see
+    `write_cards_json`). The shards are listed in `<directory>/manifest.json`
+    with their year, degree square, number of cards, size in bytes and
+    SHA-256 checksum, so that they can be ingested in parallel and checked
+    or retried one at a time.
+
+    Parameters:
+    -----------
+    card_exp : pandas.DataFrame
+        Export cards (see `ebd_f_u2card_exp`).
+    directory : str
+        Output directory, created if needed.
+    records : pandas.DataFrame, optional
+        Species records of the cards built with `columnar=True`.
+    max_cards : int, default=10_000
+        Maximum number of cards per shard.
+    extension : str, default=".json"
+        Extension of the shards, e.g., ".ndjson.gz" for compressed files
+        with one card per line.
+
+    Returns:
+    --------
+    dict
+        The manifest: total number of cards and list of shards.
+    """
+    records_json = _records_json(records) if records is not None else None
+    return _write_cards_shards(card_exp, directory, records_json, max_cards, extension)
+
+
+def _write_cards_shards(card_exp, directory, records_json=None, max_cards=10_000, extension=".json"):
+    # Write the JSON shards and their manifest (see write_cards_shards)
+    lines, compression = _json_options(f"cards{extension}", None, "infer")
+    os.makedirs(directory, exist_ok=True)
+
+    groups = card_exp.groupby(
+        [card_exp["StartDate"].str[0:4], _degree_square(card_exp["Pentad"].to_numpy())]
+    ).indices
+    shards = []
+    for (year, square), positions in sorted(groups.items()):
+        os.makedirs(os.path.join(directory, year), exist_ok=True)
+        for k, start in enumerate(range(0, len(positions), max_cards)):
+            file = f"{year}/{square}_{k:04d}{extension}"
+            path = os.path.join(directory, file)
+            n = _write_cards_json(
+                card_exp.iloc[positions[start : start + max_cards]], path, records_json, lines, compression
+            )
+            shards.append(
+                {
+                    "file": file,
+                    "year": int(year),
+                    "degree_square": square,
+                    "cards": n,
+                    "bytes": os.path.getsize(path),
+                    "sha256": _file_checksum(path, "sha256"),
+                }
+            )
+
+    manifest = {"cards": sum(shard["cards"] for shard in shards), "shards": shards}
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def write_cards_tables(card_exp, file, records=None, format="parquet", row_group_size=100_000):
+    """
+    Write the export cards and their species records as two columnar tables.
+
+    The cards are written to `<file>_cards.<ext>` with the fields of the
+    cards but the records, and the species records to
+    `<file>_records.<ext>`, one row per record with the CardNo of its card
+    (CardNo, Sequence, Spp, SourceSpp, SightingTime, Latitude, Longitude and
+    Accuracy). Unlike in the JSON, the columns are typed: dates and times,
+    integer hours and flags (empty values as nulls), the checklists of each
+    card as a list, the sighting time in UTC and the accuracy in meters.
+    The tables are written as Parquet or Arrow IPC files in row groups of
+    `row_group_size` rows, and can be loaded or scanned without parsing
+    the JSON.
+
+    Requires `pyarrow` (pip install eBird2ABAP[parquet]).
+
+    Parameters:
+    -----------
+    card_exp : pandas.DataFrame
+        Export cards (see `ebd_f_u2card_exp`), with their records in the
+        `records` column or in `records`.
+    file : str
+        Path of the files, without the `_cards.<ext>` suffix.
+    records : pandas.DataFrame, optional
+        Species records of the cards built with `columnar=True`. Only the
+        records of the cards in card_exp are written.
+    format : {"parquet", "arrow"}, default="parquet"
+        Parquet (`.parquet`) or Arrow IPC (`.arrow`) files.
+    row_group_size : int, default=100_000
+        Number of rows per row group (record batch for Arrow IPC).
+
+    Returns:
+    --------
+    tuple of str
+        Paths of the cards and records tables.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if format not in _TABLE_EXTENSIONS:
+        raise ValueError(f"Unknown table format: {format!r} (expected 'parquet' or 'arrow')")
+
+    files = tuple(
+        f"{os.fspath(file)}_{name}{_TABLE_EXTENSIONS[format]}" for name in ["cards", "records"]
+    )
+    for table, path in zip(_cards_tables(card_exp, records), files):
+        if format == "parquet":
+            pq.write_table(table, path, row_group_size=row_group_size)
+        else:
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=row_group_size)
+    return files
+
+
+def upload_cards(
+    card_exp,
+    url,
+    records=None,
+    batch_size=100,
+    max_workers=4,
+    journal=None,
+    max_retries=5,
+    timeout=60,
+    session=None,
+    headers=None,
+):
+    """
+    Upload the export cards to the ABAP API, in concurrent batches.
+
+    The cards are POSTed `batch_size` at a time, as a JSON array of cards
+    (the JSON of `write_cards_json`), by `max_workers` threads sharing a
+    session with a pool of keep-alive connections. Only a few batches are
+    encoded ahead of the uploads.
+
+    Rate limited (429) and failed (5xx, lost connection) requests are
+    retried with an exponential backoff, or after the delay of the
+    Retry-After header. All the workers pause during the backoff. A batch
+    still failing after `max_retries` retries, or rejected by the server
+    (other 4xx), is reported as failed and the upload continues.
+
+    If `journal` is given, the CardNo of each uploaded card is appended to
+    this file with the fingerprint of its JSON. Cards already in the
+    journal with the same JSON are skipped, so that an interrupted or
+    failed upload can be resumed without sending the cards twice, and
+    cards changed by an incremental run (see `ebird2abap`) are sent again.
+
+    Parameters:
+    -----------
+    card_exp : pandas.DataFrame
+        Export cards (see `ebd_f_u2card_exp`).
+    url : str
+        URL of the card upload endpoint.
+    records : pandas.DataFrame, optional
+        Species records of the cards built with `columnar=True`.
+    batch_size : int, default=100
+        Number of cards per request.
+    max_workers : int, default=4
+        Number of concurrent requests.
+    journal : str, optional
+        Path of the journal of the uploaded cards, created if needed.
+    max_retries : int, default=5
+        Number of retries of a batch before giving up.
+    timeout : float, default=60
+        Timeout in seconds of the connection and of the response.
+    session : requests.Session, optional
+        Session used for the requests (e.g., with authentication). By
+        default, a session with a pool of `max_workers` connections, closed
+        at the end of the upload.
+    headers : dict, optional
+        Additional headers of the requests.
+
+    Returns:
+    --------
+    dict
+        Number of cards uploaded and skipped, CardNo of the failed cards,
+        duration in seconds and upload rate in cards per second.
+    """
+    owned = session is None
+    if owned:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    sent = _read_upload_journal(journal) if journal is not None else {}
+    records_json = _records_json(records) if records is not None else None
+
+    lock = threading.Lock()
+    resume = 0.0
+    log = None
+
+    def post(batch):
+        # Upload a batch of (CardNo, fingerprint, JSON) cards, retried with a backoff shared by all workers
+        nonlocal resume
+        body = ("[" + ",".join(line for _, _, line in batch) + "]").encode()
+        retries = 0
+        while True:
+            time.sleep(max(resume - time.monotonic(), 0))
+            try:
+                r = session.post(url, data=body, headers=headers, timeout=timeout)
+                if r.status_code != 429 and r.status_code < 500:
+                    r.raise_for_status()
+                    break
+                if retries >= max_retries:
+                    r.raise_for_status()
+                delay = _retry_after(r.headers.get("Retry-After"))
+            except (requests.ConnectionError, requests.Timeout):
+                if retries >= max_retries:
+                    raise
+                delay = None
+            retries += 1
+            delay = min(2**retries, 30) * 0.1 if delay is None else delay
+            with lock:
+                resume = max(resume, time.monotonic() + delay)
+
+        if log is not None:
+            with lock:
+                log.write("".join(f"{number}\t{fingerprint}\n" for number, fingerprint, _ in batch))
+                log.flush()
+
+    uploaded = 0
+    skipped = 0
+    failed = []
+    futures = {}
+
+    def collect(done):
+        # Count the cards of the completed batches
+        nonlocal uploaded
+        for future in done:
+            batch = futures.pop(future)
+            try:
+                future.result()
+                uploaded += len(batch)
+            except requests.RequestException as e:
+                failed.extend(number for number, _, _ in batch)
+                print(f"Upload of {len(batch)} cards failed ({e})")
+
+    start = time.monotonic()
+    with contextlib.ExitStack() as stack:
+        if owned:
+            stack.enter_context(session)
+        if journal is not None:
+            log = stack.enter_context(open(journal, "a"))
+            if log.tell() > 0 and not _journal_ends_with_newline(journal):
+                # Line cut by an interrupted run
+                log.write("\n")
+        executor = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers))
+
+        for numbers, lines in _card_lines(card_exp, records_json):
+            cards = [
+                (number, hashlib.sha1(line.encode()).hexdigest(), line)
+                for number, line in zip(numbers, lines)
+            ]
+            todo = [card for card in cards if sent.get(card[0]) != card[1]]
+            skipped += len(cards) - len(todo)
+            for i in range(0, len(todo), batch_size):
+                # Bound the number of batches waiting for a worker
+                if len(futures) >= 2 * max_workers:
+                    done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                    collect(done)
+                batch = todo[i : i + batch_size]
+                futures[executor.submit(post, batch)] = batch
+        collect(concurrent.futures.wait(futures)[0])
+
+    elapsed = time.monotonic() - start
+    print(
+        f"Uploaded {uploaded} cards in {elapsed:.1f} s ({uploaded / max(elapsed, 1e-9):.1f} cards/s), "
+        f"{skipped} already uploaded, {len(failed)} failed"
+    )
+    return {
+        "uploaded": uploaded,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": elapsed,
+        "cards_per_second": uploaded / max(elapsed, 1e-9),
+    }
+
+
+def _read_upload_journal(journal):
+    # Fingerprint of the last upload of each card of the journal (see upload_cards)
+    sent = {}
+    if os.path.exists(journal):
+        with open(journal) as f:
+            for line in f:
+                number, _, fingerprint = line.rstrip("\n").partition("\t")
+                sent[number] = fingerprint
+    return sent
+
+
+def _journal_ends_with_newline(journal):
+    # Whether the last line of the journal is complete
+    with open(journal, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _retry_after(value):
+    # Delay in seconds of a Retry-After header (in seconds or as an HTTP date), None if missing or invalid
+    if value is None:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        date = _http_date(value)
+        return None if date is None else max(date - time.time(), 0)
+    return max(delay, 0) if np.isfinite(delay) else None
+
+
+def checklist_fingerprint(chk, ebd):
+    """
+    Compute a fingerprint of each checklist.
+
+    The fingerprint combines the hash of the checklist-level columns with the
+    sum of the hashes of its records, so that any edit of the checklist or of
+    its species list changes it. It is used to find the checklists which
+    changed between two releases.
+
+    Parameters:
+    -----------
+    chk : pandas.DataFrame
+        Checklists as returned by `ebd2chk`.
+    ebd : pandas.DataFrame or iterable of pandas.DataFrame
+        EBD rows (with ADU), or its partitions (see `spill_EBD`).
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per checklist with `SAMPLING EVENT IDENTIFIER`,
+        `pentad_observer` and `FINGERPRINT` (uint64).
+    """
+    if isinstance(ebd, pd.DataFrame):
+        ebd = [ebd]
+
+    # Sum of the record hashes of each checklist, independent of the order (and of the partitioning) of the records
+    records = pd.concat(
+        [
+            pd.util.hash_pandas_object(part[RECORD_COLUMNS], index=False)
+            .groupby(part["SAMPLING EVENT IDENTIFIER"].to_numpy())
+            .sum()
+            for part in ebd
         ]
     )
+    records = records.groupby(level=0).sum()
+
+    fingerprint = pd.util.hash_pandas_object(chk[CHK_COLUMNS], index=False).to_numpy()
+    fingerprint = fingerprint + records.reindex(
+        chk["SAMPLING EVENT IDENTIFIER"], fill_value=0
+    ).to_numpy(dtype="uint64")
+
+    return pd.DataFrame(
+        {
+            "SAMPLING EVENT IDENTIFIER": _checklist_str(
+                chk["SAMPLING EVENT IDENTIFIER"]
+            ).to_numpy(),
+            "pentad_observer": _pentad_observer(
+                chk["PENTAD"], _observer_str(chk["OBSERVER ID"])
+            ).to_numpy(),
+            "FINGERPRINT": fingerprint,
+        }
+    )
 
-    return card_exp
+
+def affected_groups(fingerprint, state):
+    """
+    Find the pentad/observer groups with new, edited or deleted checklists.
+
+    The groups of an edited checklist are taken both from the current and the
+    previous release, as the edit can move it to another pentad. Without a
+    previous state, all the groups are returned.
+
+    Parameters:
+    -----------
+    fingerprint : pandas.DataFrame
+        Fingerprints of the current release (see `checklist_fingerprint`).
+    state : dict or None
+        State of the previous run (see `load_state`).
+
+    Returns:
+    --------
+    numpy.ndarray
+        pentad_observer of the affected groups.
+    """
+    if state is None:
+        return fingerprint["pentad_observer"].unique()
+
+    delta = pd.merge(
+        fingerprint,
+        state["checklists"],
+        on="SAMPLING EVENT IDENTIFIER",
+        how="outer",
+        suffixes=("", "_previous"),
+    )
+    changed = (delta["FINGERPRINT"] != delta["FINGERPRINT_previous"]) | (
+        delta["pentad_observer"] != delta["pentad_observer_previous"]
+    )
+    delta = delta[changed]
+    return pd.unique(
+        pd.concat([delta["pentad_observer"], delta["pentad_observer_previous"]]).dropna()
+    )
+
+
+def load_state(state_dir, settings=None):
+    """
+    Load the state saved by the previous incremental run of `ebird2abap`.
+
+    Returns None if there is no state in `state_dir`, or if it was saved with
+    different `settings` (e.g., other filters), in which case all the
+    checklists need to be processed again.
+
+    Returns:
+    --------
+    dict or None
+        `checklists` (fingerprints), `card_valid`, `card_chk` and `cards`
+        (fingerprints of the exported cards), all with a `pentad_observer`
+        column.
+    """
+    state_file = os.path.join(state_dir, "state.pkl")
+    if not os.path.exists(state_file):
+        return None
+    state = pd.read_pickle(state_file)
+    if state["settings"] != settings:
+        print("Settings differ from the previous state: processing all checklists.")
+        return None
+    return {name: state[name] for name in _STATE_TABLES}
+
+
+def save_state(state_dir, state, settings):
+    """
+    Save the state of an incremental run of `ebird2abap`.
+
+    The state is written to a temporary file which then replaces the
+    previous state, so that an interrupted save leaves the previous state
+    intact.
+
+    Parameters:
+    -----------
+    state_dir : str
+        Directory of the state, created if needed.
+    state : dict
+        State of the run (see `update_state`).
+    settings : dict
+        Settings of the run, saved with the state.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    state_file = os.path.join(state_dir, "state.pkl")
+    with open(f"{state_file}.tmp", "wb") as f:
+        pd.to_pickle({"settings": settings, **state}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{state_file}.tmp", state_file)
+
+
+def update_state(state, fingerprint, affected, card_valid, card_chk, card_exp, records=None):
+    """
+    Merge the cards recomputed for the affected groups into the state.
+
+    The state is not saved: save it with `save_state` once the cards are
+    written, so that the changes are exported again if the export fails.
+
+    Parameters:
+    -----------
+    state : dict or None
+        Previous state (see `load_state`).
+    fingerprint : pandas.DataFrame
+        Fingerprints of the current release (see `checklist_fingerprint`).
+    affected : array-like
+        pentad_observer of the recomputed groups (see `affected_groups`).
+    card_valid, card_chk, card_exp : pandas.DataFrame
+        Cards recomputed for the affected groups.
+    records : pandas.DataFrame, optional
+        Species records of card_exp, if built with `columnar=True` (see
+        `ebd_f_u2card_exp`).
+
+    Returns:
+    --------
+    tuple
+        (card_exp, deleted, state) - the new or changed cards, the list of
+        the card numbers which no longer exist, and the new state.
+    """
+    records_json = _records_json(records) if records is not None else None
+    return _update_state(state, fingerprint, affected, card_valid, card_chk, card_exp, records_json)
+
+
+def _update_state(state, fingerprint, affected, card_valid, card_chk, card_exp, records_json=None):
+    # Merge the recomputed cards into the state, with the JSON of the records of the export (see update_state)
+    # Cards are stored with their number, as the integer CARD and GROUP codes are specific to each run
+    card_valid = card_valid.drop(columns="GROUP").assign(
+        CARD=card_number(card_valid),
+        pentad_observer=_pentad_observer(
+            card_valid["PENTAD"], _observer_str(card_valid["OBSERVER ID"])
+        ),
+    )
+    card_chk = card_chk.drop(columns="GROUP").assign(
+        CARD=card_number(card_chk),
+        pentad_observer=_pentad_observer(
+            card_chk["PENTAD"], _observer_str(card_chk["OBSERVER ID"])
+        ),
+    )
+    # Fingerprint of the exported cards, from their JSON
+    cards = pd.DataFrame(
+        {
+            "CARD": card_exp["CardNo"].to_numpy(),
+            "pentad_observer": _pentad_observer(
+                card_exp["Pentad"], card_exp["ObserverNoEbird"]
+            ).to_numpy(),
+            "FINGERPRINT": _card_fingerprints(card_exp, records_json),
+        }
+    )
+
+    new = {
+        "checklists": fingerprint,
+        "card_valid": card_valid,
+        "card_chk": card_chk,
+        "cards": cards,
+    }
+    if state is None:
+        changed = np.ones(len(cards), dtype=bool)
+        deleted = []
+    else:
+        previous = state["cards"]
+        previous = previous[previous["pentad_observer"].isin(affected)]
+        changed = ~(
+            pd.MultiIndex.from_frame(cards[["CARD", "FINGERPRINT"]]).isin(
+                pd.MultiIndex.from_frame(previous[["CARD", "FINGERPRINT"]])
+            )
+        )
+        deleted = sorted(set(previous["CARD"]) - set(cards["CARD"]))
+        # Keep the cards of the groups which were not recomputed
+        for name in ["card_valid", "card_chk", "cards"]:
+            unchanged = state[name][~state[name]["pentad_observer"].isin(affected)]
+            new[name] = pd.concat([unchanged, new[name]], ignore_index=True)
+
+    return card_exp[changed].reset_index(drop=True), deleted, new
+
+
+def _card_lines(card_exp, records_json=None, batch_size=10_000):
+    # Card numbers and JSON lines of the cards (as NDJSON), batch by batch
+    for start in range(0, len(card_exp), batch_size):
+        batch = card_exp.iloc[start : start + batch_size]
+        yield batch["CardNo"].tolist(), _cards_json(batch, records_json, lines=True).splitlines()
+
+
+def _card_fingerprints(card_exp, records_json=None, batch_size=10_000):
+    # SHA-1 of the JSON line of each card, hashed batch by batch
+    return [
+        hashlib.sha1(line.encode()).hexdigest()
+        for _, lines in _card_lines(card_exp, records_json, batch_size)
+        for line in lines
+    ]
+
+
+def _with_card_number(card_chk, ebd_f_u):
+    # Replace the integer CARD codes of card_chk and ebd_f_u by the card numbers, with card_chk sorted by card number
+    number = card_number(card_chk)
+    lookup = pd.Series(number.to_numpy(), index=card_chk["CARD"].to_numpy())
+    card_chk = card_chk.assign(CARD=number).sort_values(by="CARD", kind="stable")
+    ebd_f_u = ebd_f_u.assign(CARD=ebd_f_u["CARD"].map(lookup).astype(number.dtype))
+    return card_chk, ebd_f_u
+
+
+def _records_json(records):
+    # JSON of the columnar records (sorted by card, see ebd_f_u2card_exp), for _cards_json: distinct card numbers, offsets of their records, the codes and JSON of the distinct values of each field, and their keyed JSON by layout (see _records_fields)
+    numbers = records["CardNo"].to_numpy()
+    first = np.flatnonzero(np.r_[True, numbers[1:] != numbers[:-1]]) if len(numbers) else np.empty(0, dtype=np.int64)
+    values = []
+    for field in _RECORD_FIELDS:
+        codes, uniques = pd.factorize(records[field].to_numpy(), use_na_sentinel=False)
+        # JSON of each distinct value as encoded by to_json
+        encoded = pd.DataFrame({"v": uniques}).to_json(orient="records", lines=True).split("\n")[:-1]
+        values.append((codes, [line[5:-1] for line in encoded]))
+    return pd.Index(numbers[first]), np.r_[first, len(numbers)], values, {}
+
+
+def _records_fields(records_json, lines=False):
+    # Codes and JSON of the distinct values of each field with its key, and the braces for the first and last fields, built once per layout
+    _, _, values, fields = records_json
+    if lines not in fields:
+        indent = "" if lines else "\n        "
+        fields[lines] = []
+        for k, (field, (codes, encoded)) in enumerate(zip(_RECORD_FIELDS, values)):
+            prefix = ("{" if k == 0 else "") + f'{indent}"{field}":'
+            suffix = "" if k < len(_RECORD_FIELDS) - 1 else ("}" if lines else "\n      }")
+            fields[lines].append((codes, np.array([prefix + value + suffix for value in encoded], dtype=object)))
+    return fields[lines]
+
+
+def _cards_json(card_exp, records_json=None, lines=False):
+    # JSON of the cards, one card per line or with indent=2 (as to_json), with their records serialized from the JSON of the columnar records (see _records_json)
+    kwargs = {"orient": "records", "lines": True} if lines else {"orient": "records", "indent": 2}
+    if records_json is None:
+        return card_exp.to_json(**kwargs)
+
+    # Rows of the records of the cards, in the order of the cards
+    cards, offsets, _, _ = records_json
+    fields = _records_fields(records_json, lines)
+    position = cards.get_indexer(card_exp["CardNo"])
+    count = np.where(position >= 0, offsets[position + 1] - offsets[position], 0)
+    start = np.r_[0, np.cumsum(count)]
+    rows = np.repeat(offsets[position] - start[:-1], count) + np.arange(start[-1])
+
+    # JSON of each record, joining the JSON of its fields
+    items = list(map(",".join, zip(*(encoded[codes[rows]] for codes, encoded in fields))))
+    if lines:
+        arrays = [f"[{','.join(items[i:j])}]" for i, j in zip(start[:-1], start[1:])]
+    else:
+        separator = ",\n      "
+        arrays = [
+            f"[\n      {separator.join(items[i:j])}\n    ]" if j > i else "[\n\n    ]"
+            for i, j in zip(start[:-1], start[1:])
+        ]
+
+    # Cards with an empty string as records, replaced by the records of each card
+    parts = card_exp.drop(columns="records", errors="ignore").assign(records="").to_json(**kwargs)
+    parts = parts.split('"records":""')
+    return parts[0] + "".join(f'"records":{array}{part}' for array, part in zip(arrays, parts[1:]))
+
+
+def _cards_tables(card_exp, records=None):
+    # Arrow tables of the export cards and of their records, with typed columns (see write_cards_tables)
+    import pyarrow as pa
+
+    if records is None:
+        records = pd.DataFrame(
+            [record for card in card_exp["records"] for record in card], columns=_RECORD_FIELDS
+        )
+    else:
+        records = records[pd.Index(card_exp["CardNo"]).get_indexer(records["CardNo"]) >= 0]
+    card_exp = card_exp.drop(columns="records", errors="ignore")
+
+    # Empty hours and flags as nulls
+    numbers = [f"Hour{i}" for i in range(1, 11)] + ["InclNight", "AllHabitats"]
+    cards = card_exp.assign(
+        StartDate=pd.to_datetime(card_exp["StartDate"], format="%Y-%m-%d"),
+        EndDate=pd.to_datetime(card_exp["EndDate"], format="%Y-%m-%d"),
+        StartTime=pd.to_datetime(card_exp["StartTime"], format="%H:%M").dt.time,
+        **{column: pd.to_numeric(card_exp[column], errors="coerce").astype("Int16") for column in numbers},
+    )
+    records = records.assign(
+        Accuracy=pd.to_numeric(records["Accuracy"], errors="coerce"),
+        SightingTime=pd.to_datetime(records["SightingTime"], format="%Y-%m-%dT%H:%M:%SZ", utc=True),
+    )
+    return (
+        pa.Table.from_pandas(cards, schema=_cards_table_schema(), preserve_index=False),
+        pa.Table.from_pandas(records, schema=_records_table_schema(), preserve_index=False),
+    )
+
+
+def _cards_table_schema():
+    import pyarrow as pa
+
+    types = {
+        "StartDate": pa.date32(),
+        "EndDate": pa.date32(),
+        "StartTime": pa.time32("s"),
+        "TotalHours": pa.float64(),
+        **{f"Hour{i}": pa.int16() for i in range(1, 11)},
+        "TotalSpp": pa.int32(),
+        "InclNight": pa.int8(),
+        "AllHabitats": pa.int8(),
+        "Checklists": pa.list_(pa.string()),
+        "TotalDistance": pa.float64(),
+    }
+    return pa.schema([(field, types.get(field, pa.string())) for field in _CARD_FIELDS[:-1]])
+
+
+def _records_table_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("CardNo", pa.string()),
+            ("Sequence", pa.int32()),
+            ("Spp", pa.int32()),
+            ("SourceSpp", pa.string()),
+            ("SightingTime", pa.timestamp("s", tz="UTC")),
+            ("Latitude", pa.float64()),
+            ("Longitude", pa.float64()),
+            ("Accuracy", pa.float64()),
+        ]
+    )
+
+
+def _json_options(file, lines=None, compression="infer"):
+    # Lines and compression of a JSON card file, inferred from the extension of its path (see write_cards_json)
+    is_path = isinstance(file, (str, os.PathLike))
+    name, extension = os.path.splitext(os.fspath(file)) if is_path else ("", "")
+    if compression == "infer":
+        compression = _JSON_COMPRESSIONS.get(extension)
+    if lines is None:
+        lines = is_path and (name if extension in _JSON_COMPRESSIONS else os.fspath(file)).endswith(
+            _NDJSON_EXTENSIONS
+        )
+    return lines, compression
+
+
+def _write_cards_json(card_exp, file, records_json=None, lines=False, compression=None, batch_size=10_000):
+    # Write the cards (or batches of cards) to a JSON file, batch by batch (see write_cards_json)
+    batches = card_exp
+    if isinstance(card_exp, pd.DataFrame):
+        batches = (
+            card_exp.iloc[start : start + batch_size]
+            for start in range(0, len(card_exp), batch_size)
+        )
+
+    n = 0
+    with _open_json_output(file, compression) as write:
+        if not lines:
+            write("[")
+        for batch in batches:
+            if len(batch) == 0:
+                continue
+            if lines:
+                write(_cards_json(batch, records_json, lines=True).removesuffix("\n") + "\n")
+            else:
+                # Cards of the batch without the brackets of the list, separated from the previous batch by a comma
+                text = _cards_json(batch, records_json)[1:-2]
+                write(text if n == 0 else "," + text)
+            n += len(batch)
+        if not lines:
+            write("\n]" if n > 0 else "\n\n]")
+    return n
+
+
+@contextlib.contextmanager
+def _open_json_output(file, compression=None):
+    # Function writing str to a path or file handle, through a gzip or zstd compressor
+    if compression not in [None, "gzip", "zstd"]:
+        raise ValueError(f"Unknown compression '{compression}', use 'gzip', 'zstd' or None.")
+    if isinstance(file, io.TextIOBase):
+        if compression is not None:
+            raise ValueError("Compressed JSON files require a path or a binary file handle.")
+        yield file.write
+        return
+
+    with contextlib.ExitStack() as stack:
+        if isinstance(file, (str, os.PathLike)):
+            file = stack.enter_context(open(file, "wb"))
+        if compression == "gzip":
+            # No file name nor time in the header, so that the same cards give the same file
+            file = stack.enter_context(gzip.GzipFile(filename="", mode="wb", fileobj=file, mtime=0))
+        elif compression == "zstd":
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError(
+                    "zstd compression requires zstandard (pip install eBird2ABAP[zstd])"
+                ) from e
+            file = stack.enter_context(
+                zstandard.ZstdCompressor().stream_writer(file, closefd=False)
+            )
+        yield lambda text: file.write(text.encode())
+
+
+def _pentad_observer(pentad, observer):
+    # Key of the pentad/observer groups in which cards are computed independently
+    return pentad + "_" + observer
+
+
+def _observer_str(observer):
+    # OBSERVER ID as "obsrXXX" string, also when stored as integer (compact_EBD)
+    if pd.api.types.is_numeric_dtype(observer):
+        return "obsr" + observer.astype(str)
+    return observer
+
+
+def _checklist_str(checklist):
+    # SAMPLING EVENT IDENTIFIER as "SXXX" string, also when stored as integer (compact_EBD)
+    if pd.api.types.is_numeric_dtype(checklist):
+        return "S" + checklist.astype(str)
+    return checklist
+
+
+def _checklist_code(checklist):
+    # SAMPLING EVENT IDENTIFIER as int64 code, the number of the "SXXX" string (as stored by compact_EBD)
+    if pd.api.types.is_numeric_dtype(checklist):
+        return checklist.to_numpy(dtype=np.int64)
+    return checklist.str[len(_EBD_ID_PREFIX["SAMPLING EVENT IDENTIFIER"]) :].astype("int64").to_numpy()
+
+
+def _coordinate_float64(coord):
+    # float32 coordinates (compact_EBD) converted to the float64 of their shortest decimal representation
+    if coord.dtype == "float32":
+        return coord.astype(str).astype("float64")
+    return coord
+
+
+def _category_values(col):
+    # Values of a categorical column (compact_EBD) in the dtype of its categories
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.astype(col.cat.categories.dtype)
+    return col
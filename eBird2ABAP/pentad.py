@@ -4,13 +4,20 @@ Pentad grid system utilities for SABAP (Southern African Bird Atlas Project).
 A pentad is a 5-minute by 5-minute geographic grid cell used for bird atlas data collection.
 This module provides functions for:
 - Converting between lat/lng coordinates and pentad IDs
+- Converting between pentad IDs and compact integer pentad codes
 - Generating pentad polygons
 - Creating pentad grids covering geographic areas
 """
 
+import concurrent.futures
+import hashlib
+import json
+import os
+
 import numpy as np
+import pandas as pd
 import geopandas as gpd
-from shapely.geometry import box
+import shapely
 
 
 # ============================================================================
@@ -84,8 +91,9 @@ def latlng2pentad(lat, lng):
         
     Returns:
     --------
-    list of str
-        List of pentad IDs corresponding to the input coordinates.
+    numpy.ndarray of str
+        Pentad IDs corresponding to the input coordinates (1D, also for
+        scalar inputs). Longitudes of 100° or more have three degree digits.
     """
     # Convert inputs to numpy arrays for vectorized operations
     lat = np.asarray(lat)
@@ -101,38 +109,87 @@ def latlng2pentad(lat, lng):
     # Input validation
     if lat.shape != lng.shape:
         raise ValueError("Latitude and longitude arrays must have the same shape.")
+    if not (np.all(np.isfinite(lat)) and np.all(np.isfinite(lng))):
+        raise ValueError("Latitude and longitude values must be finite (no NaN or inf).")
     if np.any(np.abs(lat) > 90):
         raise ValueError("Latitude values must be between -90 and 90 degrees.")
     if np.any(np.abs(lng) > 180):
         raise ValueError("Longitude values must be between -180 and 180 degrees.")
     
-    # Compute pentad grid cell
-    latDeg, lngDeg, latSec, lngSec = _get_nw_corner(lat, lng)
-    
-    # Determine the quadrant character based on latitude and longitude signs
-    letter = np.empty_like(lat, dtype=str)
-    letter[(lat <= 0) & (lng > 0)] = "_"
-    letter[(lat <= 0) & (lng <= 0)] = "a"
-    letter[(lat > 0) & (lng <= 0)] = "b"
-    letter[(lat > 0) & (lng > 0)] = "c"
-    
-    # Convert to pentad string format (vectorized)
-    if np.isscalar(latDeg):
-        # Single value case
-        return [f"{int(latDeg):02d}{int(latSec):02d}{letter}{int(lngDeg):02d}{int(lngSec):02d}"]
-    else:
-        # Array case
-        pentad_ids = [
-            f"{int(latDeg[i]):02d}{int(latSec[i]):02d}{letter[i]}{int(lngDeg[i]):02d}{int(lngSec[i]):02d}"
-            for i in range(len(lat))
-        ]
-        return pentad_ids
+    # Compute the pentad grid cell and format it (vectorized, see pentad_code2str)
+    return pentad_code2str(latlng2pentad_code(lat, lng))
 
 
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
+# Signs of the latitude and longitude of the quadrants 'c', 'b', '_' and 'a'
+_LAT_SIGNS = np.array([1.0, 1.0, -1.0, -1.0])
+_LNG_SIGNS = np.array([1.0, -1.0, 1.0, -1.0])
+
+
+def _raise_invalid(invalid, inverse, uniques, error, message):
+    # Raise error listing all the elements whose distinct pentad ID is invalid
+    if not invalid.any():
+        return
+    index = np.flatnonzero(invalid[inverse])
+    values = [uniques[k] for k in inverse[index[:10]]]
+    more = f" (and {len(index) - 10} more)" if len(index) > 10 else ""
+    raise error(f"Elements at indices {index[:10].tolist()}{more} {message}: {values}")
+
+
+def _parse_pentads(pentads, lengths=(9, 10)):
+    # Validate and split pentad IDs into degrees, minutes and quadrant index (0-3 for 'c', 'b', '_', 'a'),
+    # decoding the distinct IDs only. Also returns the distinct IDs and the inverse index to the input order.
+    if isinstance(pentads, str):
+        pentads = [pentads]
+    pentads = pd.Series(pentads) if not isinstance(pentads, pd.Series) else pentads
+    inverse, uniques = pd.factorize(pentads, use_na_sentinel=False)
+    uniques = np.asarray(uniques, dtype=object)
+
+    # Type check (only missing values for string dtypes)
+    if isinstance(pentads.dtype, pd.StringDtype):
+        is_str = ~pd.isna(uniques)
+    else:
+        is_str = np.array([isinstance(p, str) for p in uniques], dtype=bool)
+    _raise_invalid(~is_str, inverse, uniques, TypeError, "are not strings")
+
+    # Fixed-width matrix of the character codes, padded with 0
+    chars = uniques.astype(str)
+    chars = chars.astype(f"U{max(chars.dtype.itemsize // 4, 10)}")
+    length = np.char.str_len(chars)
+    chars = chars.view(np.uint32).reshape(len(chars), chars.dtype.itemsize // 4)[:, :10].astype(np.int64)
+    _raise_invalid(
+        ~np.isin(length, lengths), inverse, uniques, ValueError,
+        f"are not {' or '.join(map(str, lengths))} characters long",
+    )
+
+    # Degrees and minutes must be digits, the fifth character a quadrant
+    digits = chars - ord("0")
+    position = np.arange(10)
+    is_digit = (digits >= 0) & (digits <= 9)
+    need_digit = (position != 4) & (position < length[:, None])
+    _raise_invalid(
+        (need_digit & ~is_digit).any(axis=1), inverse, uniques, ValueError,
+        "have non-numeric degrees or minutes",
+    )
+    quadrant = np.full(len(chars), -1)
+    for k, q in enumerate("cb_a"):
+        quadrant[chars[:, 4] == ord(q)] = k
+    _raise_invalid(quadrant < 0, inverse, uniques, ValueError, "have an invalid quadrant character")
+
+    # Longitudes of 100° or more have three degree digits
+    long = length == 10
+    lat_deg = digits[:, 0] * 10 + digits[:, 1]
+    lat_min = digits[:, 2] * 10 + digits[:, 3]
+    lng_deg = np.where(long, digits[:, 5] * 100, 0) + np.where(
+        long, digits[:, 6] * 10 + digits[:, 7], digits[:, 5] * 10 + digits[:, 6]
+    )
+    lng_min = np.where(long, digits[:, 8] * 10 + digits[:, 9], digits[:, 7] * 10 + digits[:, 8])
+    return inverse, uniques, lat_deg, lat_min, quadrant, lng_deg, lng_min
+
+
 def pentad2latlng(pentads):
     """
     Converts pentad IDs to their center latitude and longitude coordinates.
@@ -145,6 +202,8 @@ def pentad2latlng(pentads):
     -----------
     pentads : str or list of str
         Pentad ID(s) in the format "XXYYcZZWW" (see latlng2pentad for details).
+        Repeated IDs are decoded once. Invalid IDs raise a single error
+        listing the indices of all the invalid elements.
     
     Returns:
     --------
@@ -158,29 +217,9 @@ def pentad2latlng(pentads):
     >>> print(lat)  # Output: [-25.54166667, -34.625]
     >>> print(lng)  # Output: [27.875, -29.45833333]
     """
-    # Accept a single pentad string or a list/array
-    if isinstance(pentads, str):
-        pentads = [pentads]
-    pentads = np.array(pentads)
+    # Decode each distinct pentad ID once
+    inverse, _, lat_deg, lat_min, quadrant, lng_deg, lng_min = _parse_pentads(pentads, lengths=(9,))
 
-    # Input validation
-    for i, p in enumerate(pentads):
-        if not isinstance(p, str):
-            raise TypeError(f"Element at index {i} is not a string: {p}")
-        if len(p) != 9:
-            raise ValueError(f"Element at index {i} is not 9 characters long: {p}")
-        if not (p[0:4].isdigit() and p[5:9].isdigit()):
-            raise ValueError(f"Element at index {i} has non-numeric degrees or minutes: {p}")
-        if p[4] not in ["_", "a", "b", "c"]:
-            raise ValueError(f"Element at index {i} has an invalid quadrant character '{p[4]}': {p}")
-
-    # Extract components
-    lat_deg = np.array([int(p[0:2]) for p in pentads])
-    lat_min = np.array([int(p[2:4]) for p in pentads])
-    lng_deg = np.array([int(p[5:7]) for p in pentads])
-    lng_min = np.array([int(p[7:9]) for p in pentads])
-    quadrant = np.array([p[4] for p in pentads])
-    
     # Calculate absolute values
     lat_abs = lat_deg + lat_min / 60
     lng_abs = lng_deg + lng_min / 60
@@ -188,23 +227,11 @@ def pentad2latlng(pentads):
     # Cell size
     d = 5 / 60
     
-    # Calculate signed NW corner coordinates based on quadrant
-    lat_north = np.zeros_like(lat_abs)
-    lng_west = np.zeros_like(lng_abs)
-    
-    for i, q in enumerate(quadrant):
-        if q == '_':  # Southern + Eastern
-            lat_north[i] = 0.0 if lat_abs[i] == 0 else -lat_abs[i]
-            lng_west[i] = lng_abs[i]
-        elif q == 'a':  # Southern + Western
-            lat_north[i] = 0.0 if lat_abs[i] == 0 else -lat_abs[i]
-            lng_west[i] = -lng_abs[i] if lng_abs[i] > 0 else -d
-        elif q == 'b':  # Northern + Western
-            lat_north[i] = lat_abs[i]
-            lng_west[i] = -lng_abs[i] if lng_abs[i] > 0 else -d
-        else:  # 'c': Northern + Eastern
-            lat_north[i] = lat_abs[i]
-            lng_west[i] = lng_abs[i]
+    # Calculate signed NW corner coordinates based on quadrant ('c', 'b', '_', 'a')
+    lat_north = _LAT_SIGNS[quadrant] * lat_abs
+    lng_west = np.where(
+        (_LNG_SIGNS[quadrant] < 0) & (lng_abs == 0), -d, _LNG_SIGNS[quadrant] * lng_abs
+    )
     
     # Half pentad size (2.5 arcminutes)
     half_d = d / 2
@@ -213,14 +240,283 @@ def pentad2latlng(pentads):
     lat_centers = lat_north - half_d  # Always move toward equator (decrease absolute value)
     lng_centers = lng_west + half_d   # Always move east (increase value)
 
-    return lat_centers.tolist(), lng_centers.tolist()
+    return lat_centers[inverse].tolist(), lng_centers[inverse].tolist()
+
+
+# ============================================================================
+# Integer Pentad Codes
+# ============================================================================
+
+# A pentad code packs the signed row and column of the pentad on the 5' grid
+# in an int32: code = (row << 16) | (column & 0xFFFF).
+# - row = i for northern pentads and -i - 1 for southern pentads ('_', 'a'),
+#   where i is the number of 5' steps of the pentad ID latitude (XXYY).
+# - column = j for eastern pentads and -j - 1 for western pentads ('a', 'b'),
+#   where j is the number of 5' steps of the pentad ID longitude (ZZWW).
+# Each pentad ID has a single code and vice versa, and codes sort by row then
+# column.
+
+_QUADRANTS = np.array(["c", "b", "_", "a"])  # Indexed by 2 * south + west
+_QUADRANT_BYTES = np.frombuffer(b"cb_a", dtype=np.uint8)
+
+# ASCII bytes of the two-digit numbers 00 to 99
+_TWO_DIGITS = np.frombuffer(
+    "".join(f"{k:02d}" for k in range(100)).encode(), dtype=np.uint8
+).reshape(100, 2)
+
+
+def _pack_pentad_code(row, col):
+    return ((row.astype(np.int32) << 16) | (col.astype(np.int32) & 0xFFFF)).astype(np.int32)
+
+
+def _unpack_pentad_code(codes):
+    codes = np.asarray(codes, dtype=np.int32)
+    row = codes >> 16
+    col = ((codes & 0xFFFF) ^ 0x8000) - 0x8000
+    return row, col
+
+
+def latlng2pentad_code(lat, lng):
+    """
+    Convert latitude and longitude coordinates to integer pentad codes.
+    
+    Same pentads as `latlng2pentad`, packed as int32 codes (see
+    `pentad_code2str` for the conversion to pentad IDs).
+    
+    Parameters:
+    -----------
+    lat : float or array-like
+        Latitude(s) in decimal degrees.
+    lng : float or array-like
+        Longitude(s) in decimal degrees.
+        
+    Returns:
+    --------
+    numpy.ndarray
+        int32 pentad codes (1D).
+    """
+    lat = np.atleast_1d(np.asarray(lat, dtype=float))
+    lng = np.atleast_1d(np.asarray(lng, dtype=float))
+
+    # Input validation
+    if lat.shape != lng.shape:
+        raise ValueError("Latitude and longitude arrays must have the same shape.")
+    if not (np.all(np.isfinite(lat)) and np.all(np.isfinite(lng))):
+        raise ValueError("Latitude and longitude values must be finite (no NaN or inf).")
+    if np.any(np.abs(lat) > 90):
+        raise ValueError("Latitude values must be between -90 and 90 degrees.")
+    if np.any(np.abs(lng) > 180):
+        raise ValueError("Longitude values must be between -180 and 180 degrees.")
+
+    # Number of 5' steps of the pentad ID from the equator and the prime meridian
+    latDeg, lngDeg, latSec, lngSec = _get_nw_corner(lat, lng)
+    i = latDeg * 12 + latSec // 5
+    j = lngDeg * 12 + lngSec // 5
+
+    # Same quadrants as latlng2pentad: southern if lat <= 0, western if lng <= 0
+    row = np.where(lat > 0, i, -i - 1)
+    col = np.where(lng > 0, j, -j - 1)
+    return _pack_pentad_code(row, col)
+
+
+def pentad_code2str(codes):
+    """
+    Convert integer pentad codes to pentad IDs.
+    
+    Parameters:
+    -----------
+    codes : int or array-like of int
+        Pentad code(s) (see `latlng2pentad_code`).
+        
+    Returns:
+    --------
+    numpy.ndarray of str
+        Pentad IDs in the format of `latlng2pentad`.
+    """
+    row, col = _unpack_pentad_code(np.atleast_1d(codes))
+    i = np.where(row >= 0, row, -row - 1)
+    j = np.where(col >= 0, col, -col - 1)
+    lng_deg = j // 12
+
+    # Write the ASCII bytes of all IDs at once: XXYYcZZWW, or XXYYcZZZWW for longitudes of 100° or more
+    ids = np.zeros((len(i), 10), dtype=np.uint8)
+    ids[:, 0:2] = _TWO_DIGITS[i // 12]
+    ids[:, 2:4] = _TWO_DIGITS[i % 12 * 5]
+    ids[:, 4] = _QUADRANT_BYTES[2 * (row < 0) + (col < 0)]
+    long = lng_deg >= 100
+    ids[~long, 5:7] = _TWO_DIGITS[lng_deg[~long]]
+    ids[~long, 7:9] = _TWO_DIGITS[j[~long] % 12 * 5]
+    ids[long, 5] = ord("1")
+    ids[long, 6:8] = _TWO_DIGITS[lng_deg[long] - 100]
+    ids[long, 8:10] = _TWO_DIGITS[j[long] % 12 * 5]
+
+    # Trailing NUL bytes of 9-character IDs are dropped by the bytes dtype
+    return ids.view("S10").ravel().astype(str)
+
+
+def str2pentad_code(pentads):
+    """
+    Convert pentad IDs to integer pentad codes.
+    
+    Parameters:
+    -----------
+    pentads : str or list-like of str
+        Pentad ID(s) (e.g., "2530_2750"). Longitudes of 100° or more have
+        three digits (e.g., "2530_11750"), as returned by `latlng2pentad`.
+        
+    Returns:
+    --------
+    numpy.ndarray
+        int32 pentad codes.
+    """
+    inverse, uniques, lat_deg, lat_min, quadrant, lng_deg, lng_min = _parse_pentads(pentads)
+    invalid = (lat_min % 5 > 0) | (lng_min % 5 > 0) | (lat_min >= 60) | (lng_min >= 60)
+    _raise_invalid(
+        invalid, inverse, uniques, ValueError, "have minutes which are not a multiple of 5 below 60"
+    )
+    i = lat_deg * 12 + lat_min // 5
+    j = lng_deg * 12 + lng_min // 5
+
+    south = quadrant >= 2
+    west = quadrant % 2 == 1
+    return _pack_pentad_code(np.where(south, -i - 1, i), np.where(west, -j - 1, j))[inverse]
+
+
+def pentad_code2latlng(codes):
+    """
+    Convert integer pentad codes to their center latitude and longitude.
+    
+    Same centers as `pentad2latlng` for the corresponding pentad IDs.
+    
+    Parameters:
+    -----------
+    codes : int or array-like of int
+        Pentad code(s) (see `latlng2pentad_code`).
+        
+    Returns:
+    --------
+    tuple of numpy.ndarray
+        (lat, lng) - Center coordinates of each pentad.
+    """
+    row, col = _unpack_pentad_code(np.atleast_1d(codes))
+    i = np.where(row >= 0, row, -row - 1)
+    j = np.where(col >= 0, col, -col - 1)
+
+    # Absolute NW corner, computed as in pentad2latlng from the degrees and minutes
+    lat_abs = i // 12 + (i % 12 * 5) / 60
+    lng_abs = j // 12 + (j % 12 * 5) / 60
+
+    d = 5 / 60
+    lat_north = np.where(row >= 0, lat_abs, -lat_abs)
+    lng_west = np.where(col >= 0, lng_abs, np.where(lng_abs > 0, -lng_abs, -d))
+
+    half_d = d / 2
+    return lat_north - half_d, lng_west + half_d
+
+
+def pentad_code2bounds(codes):
+    """
+    Return the bounds of the pentads of integer pentad codes.
+    
+    Same "named" cells as `pentad2polygon`.
+    
+    Parameters:
+    -----------
+    codes : int or array-like of int
+        Pentad code(s) (see `latlng2pentad_code`).
+        
+    Returns:
+    --------
+    tuple of numpy.ndarray
+        (minx, miny, maxx, maxy) of each pentad.
+    """
+    lat, lng = pentad_code2latlng(codes)
+    d_half = (5 / 60) / 2
+    return lng - d_half, lat - d_half, lng + d_half, lat + d_half
+
+
+def assign_pentads(df, lat=None, lng=None, code=False, grid=None, index=None):
+    """
+    Assign the pentad of each point of a DataFrame.
+    
+    The pentads are computed arithmetically from the coordinates, with the
+    same naming convention as `latlng2pentad`, and each distinct pentad is
+    formatted once: no polygon nor spatial join is needed. Grid attributes
+    are attached through the integer pentad codes.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame or geopandas.GeoDataFrame
+        Points.
+    lat, lng : str, optional
+        Columns of the latitude and longitude. Default to the point
+        geometries of a GeoDataFrame, otherwise to "LATITUDE" and "LONGITUDE".
+    code : bool, default=False
+        Also add the int32 pentad codes as column 'pentad_code' (nullable
+        Int32 if some points have no coordinates).
+    grid : pandas.DataFrame, optional
+        Pentad attributes with a 'pentad' column of distinct pentad IDs
+        (e.g., from `generate_pentad_grid`). Its other columns, except the
+        geometry, are added (missing for pentads not in grid).
+    index : dict, optional
+        Pentad index (see `pentad_index`). Adds the region of the pentads as
+        column 'region'.
+    
+    Returns:
+    --------
+    pandas.DataFrame or geopandas.GeoDataFrame
+        Copy of df with the column 'pentad' (missing for points without
+        coordinates) and the requested attributes.
+    """
+    if lat is None and lng is None and isinstance(df, gpd.GeoDataFrame):
+        lat_values, lng_values = df.geometry.y.to_numpy(), df.geometry.x.to_numpy()
+    else:
+        lat_values = df[lat or "LATITUDE"].to_numpy(dtype=float)
+        lng_values = df[lng or "LONGITUDE"].to_numpy(dtype=float)
+
+    # Pentad codes of the points with coordinates (row -32768, not a valid code, for the others)
+    valid = ~(np.isnan(lat_values) | np.isnan(lng_values))
+    codes = np.full(len(df), np.iinfo(np.int32).min, dtype=np.int32)
+    codes[valid] = latlng2pentad_code(lat_values[valid], lng_values[valid])
+
+    # Pentad IDs, formatted once per pentad
+    positions, uniques = pd.factorize(codes)
+    ids = np.full(len(uniques), None, dtype=object)
+    ids[uniques != np.iinfo(np.int32).min] = pentad_code2str(uniques[uniques != np.iinfo(np.int32).min])
+    columns = {"pentad": ids[positions]}
+    if code:
+        columns["pentad_code"] = codes if valid.all() else pd.arrays.IntegerArray(codes, ~valid)
+
+    # Grid attributes, joined on the pentad codes
+    if grid is not None:
+        geometry = [grid.geometry.name] if isinstance(grid, gpd.GeoDataFrame) else []
+        attributes = pd.DataFrame(grid.drop(columns=["pentad"] + geometry)).reset_index(drop=True)
+        rows = pd.Index(str2pentad_code(grid["pentad"].to_numpy())).get_indexer(codes)
+        attributes = attributes.reindex(rows)  # Missing for the pentads not in grid (row -1)
+        for column in attributes.columns:
+            columns[column] = attributes[column].to_numpy()
+    if index is not None:
+        region = np.full(len(df), None, dtype=object)
+        region[valid] = pentad_region(index, codes[valid])
+        columns["region"] = region
+
+    return df.assign(**columns)
 
 
 # ============================================================================
 # Geometric Operations
 # ============================================================================
 
-def pentad2polygon(pentads):
+# Polygon outputs of pentad2polygon and latlng2polygon
+_POLYGON_OUTPUTS = ["list", "geoseries", "wkb", "bounds"]
+
+# WKB of a polygon with one ring of 5 points: byte order, type, number of rings, number of points, coordinates
+_WKB_POLYGON_HEADER = np.frombuffer(
+    np.array([3, 1, 5], dtype="<u4").tobytes(), dtype=np.uint8
+)
+
+
+def pentad2polygon(pentads, output="list"):
     """
     Returns the geometric bounding box (Polygon) for the given pentad ID(s).
     
@@ -236,25 +532,28 @@ def pentad2polygon(pentads):
     -----------
     pentads : str or list-like of str
         Pentad ID(s) (e.g., "2530_2750").
+    output : str, default="list"
+        Type of the returned polygons (see `_bounds2polygons`):
+        - "list": list of shapely Polygons
+        - "geoseries": geopandas.GeoSeries (EPSG:4326)
+        - "wkb": numpy array of the WKB of the polygons
+        - "bounds": tuple of arrays (minx, miny, maxx, maxy)
         
     Returns:
     --------
     shapely.geometry.Polygon or list of shapely.geometry.Polygon
-        The pentad grid cell(s) as polygon(s).
+        The pentad grid cell(s) as polygon(s), a single Polygon for a single
+        pentad ID with output="list". Otherwise, see `output`.
     """
-    is_scalar = isinstance(pentads, str)
+    is_scalar = isinstance(pentads, str) and output == "list"
+    _check_polygon_output(output)
     lats, lngs = pentad2latlng(pentads)  # Returns lists of centers
+    lats, lngs = np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
     
     # Half-width in degrees (2.5 minutes)
     d_half = (5 / 60) / 2
     
-    polys = []
-    for lat, lng in zip(lats, lngs):
-        minx = lng - d_half
-        maxx = lng + d_half
-        miny = lat - d_half
-        maxy = lat + d_half
-        polys.append(box(minx, miny, maxx, maxy))
+    polys = _bounds2polygons(lngs - d_half, lats - d_half, lngs + d_half, lats + d_half, output)
         
     if is_scalar:
         return polys[0]
@@ -262,7 +561,7 @@ def pentad2polygon(pentads):
 
 
 
-def latlng2polygon(lat, lng):
+def latlng2polygon(lat, lng, output="list"):
     """
     Returns the exact pentad grid cell polygon containing the given coordinate(s).
     
@@ -280,20 +579,70 @@ def latlng2polygon(lat, lng):
         Latitude(s).
     lng : float or array-like
         Longitude(s).
+    output : str, default="list"
+        Type of the returned polygons: "list", "geoseries", "wkb" or
+        "bounds" (see `pentad2polygon`).
     
     Returns:
     --------
     shapely.geometry.Polygon or list of Polygons
-        The rectangular polygon(s) representing the grid cell(s).
+        The rectangular polygon(s) representing the grid cell(s), a single
+        Polygon for scalar inputs with output="list". Otherwise, see `output`.
     """
+    _check_polygon_output(output)
     lat = np.asarray(lat)
     lng = np.asarray(lng)
-    scalar_input = lat.ndim == 0
+    scalar_input = lat.ndim == 0 and output == "list"
     
-    if scalar_input:
+    if lat.ndim == 0:
         lat = lat[np.newaxis]
         lng = lng[np.newaxis]
         
+    minx, miny, maxx, maxy = _latlng2bounds(lat, lng)
+    polys = _bounds2polygons(minx, miny, maxx, maxy, output)
+    
+    if scalar_input:
+        return polys[0]
+    return polys
+
+
+def _check_polygon_output(output):
+    if output not in _POLYGON_OUTPUTS:
+        raise ValueError(f"output must be one of {_POLYGON_OUTPUTS}, got {output!r}")
+
+
+def _bounds2polygons(minx, miny, maxx, maxy, output):
+    # Polygons of bounds arrays, built in one vectorized call
+    if output == "bounds":
+        return minx, miny, maxx, maxy
+    if output == "wkb":
+        return _bounds2wkb(minx, miny, maxx, maxy)
+    polys = shapely.box(minx, miny, maxx, maxy)
+    if output == "geoseries":
+        return gpd.GeoSeries(polys, crs="EPSG:4326")
+    return polys.tolist()
+
+
+def _bounds2wkb(minx, miny, maxx, maxy):
+    # Little-endian WKB of the boxes (same as shapely.to_wkb(shapely.box(...)))
+    return _bounds2wkb_buffer(minx, miny, maxx, maxy).view("V93").ravel().astype(object)
+
+
+def _bounds2wkb_buffer(minx, miny, maxx, maxy):
+    # WKB of the boxes written into one contiguous buffer, one 93-byte row per box
+    ring = np.stack([maxx, miny, maxx, maxy, minx, maxy, minx, miny, maxx, miny], axis=-1)
+    wkb = np.empty((len(ring), 93), dtype=np.uint8)
+    wkb[:, 0] = 1
+    wkb[:, 1:13] = _WKB_POLYGON_HEADER
+    wkb[:, 13:] = ring.astype("<f8").view(np.uint8)
+    return wkb
+
+
+def _latlng2bounds(lat, lng):
+    # Exact bounds (minx, miny, maxx, maxy) of the grid cells containing the coordinates (see latlng2polygon)
+    lat = np.asarray(lat)
+    lng = np.asarray(lng)
+
     # Compute grid cell (absolute)
     lat_deg, lng_deg, lat_min, lng_min = _get_nw_corner(lat, lng)
     
@@ -312,20 +661,21 @@ def latlng2polygon(lat, lng):
     
     minx = np.where(lng >= 0, abs_lng0, -(abs_lng0 + d))
     maxx = np.where(lng >= 0, abs_lng0 + d, -abs_lng0)
-    
-    polys = [box(x1, y1, x2, y2) for x1, y1, x2, y2 in zip(minx, miny, maxx, maxy)]
-    
-    if scalar_input:
-        return polys[0]
-    return polys
+    return minx, miny, maxx, maxy
 
 
-def generate_pentad_grid(geometry, return_geojson=True):
+def generate_pentad_grid(
+    geometry, return_geojson=True, tile_size=32, n_jobs=1, file=None, chunksize=100_000
+):
     """
     Generate all pentads that intersect with a given geometry.
     
-    This function creates a grid of pentad cells covering the bounding box
-    of the input geometry, then filters to only those that intersect it.
+    This function covers the bounding box of the input geometry with a grid
+    of pentad cells and keeps those that intersect it. The grid is split in
+    square tiles of `tile_size` x `tile_size` cells: the cells of tiles
+    within the geometry are kept and those of tiles outside of it dropped
+    without testing them, so that only the cells of tiles crossing the
+    boundary of the geometry are tested, against the prepared geometry.
     
     Parameters:
     -----------
@@ -333,6 +683,19 @@ def generate_pentad_grid(geometry, return_geojson=True):
         The area to cover with pentads (Polygon, MultiPolygon, etc.).
     return_geojson : bool, default=True
         If True, returns GeoJSON string. If False, returns GeoDataFrame.
+    tile_size : int, default=32
+        Number of cells along each side of a tile (32 cells ≈ 2.7°).
+    n_jobs : int, default=1
+        Number of processes testing the cells of the boundary tiles. Only
+        worth it for large and detailed geometries.
+    file : str, optional
+        Write the grid to this file instead of returning it, streaming the
+        pentads in chunks of `chunksize`. The format is given by the
+        extension: GeoJSON sequence (".geojsonl", ".geojsons"), FlatGeobuf
+        (".fgb") or GeoParquet (".parquet"). Requires `pyarrow`. Use
+        `read_pentad_grid` to read it back.
+    chunksize : int, default=100_000
+        Number of pentads written at a time (and GeoParquet row group size).
     
     Returns:
     --------
@@ -340,7 +703,11 @@ def generate_pentad_grid(geometry, return_geojson=True):
         Pentad grid as GeoJSON string or GeoDataFrame with columns:
         - 'pentad': Pentad ID
         - 'geometry': Polygon geometry
+        or `file` if given.
     """
+    if file is not None:
+        _grid_file_driver(file)
+    
     # Get bounds
     minx, miny, maxx, maxy = geometry.bounds
     
@@ -362,26 +729,631 @@ def generate_pentad_grid(geometry, return_geojson=True):
     xs = np.arange(x_start, x_end + d/2, d) + d/2
     ys = np.arange(y_start, y_end + d/2, d) + d/2
     
-    # Create meshgrid of centers
-    xx, yy = np.meshgrid(xs, ys)
-    xx = xx.flatten()
-    yy = yy.flatten()
+    # Cell bounds of each column and row of the grid
+    cell_minx, _, cell_maxx, _ = _latlng2bounds(np.zeros_like(xs), xs)
+    _, cell_miny, _, cell_maxy = _latlng2bounds(ys, np.zeros_like(ys))
+    
+    # Tiles: bounds of the union of their cells
+    tile_x = np.arange(0, len(xs), tile_size)
+    tile_y = np.arange(0, len(ys), tile_size)
+    tx, ty = np.meshgrid(np.arange(len(tile_x)), np.arange(len(tile_y)))
+    tiles = shapely.box(
+        np.minimum.reduceat(cell_minx, tile_x)[tx],
+        np.minimum.reduceat(cell_miny, tile_y)[ty],
+        np.maximum.reduceat(cell_maxx, tile_x)[tx],
+        np.maximum.reduceat(cell_maxy, tile_y)[ty],
+    )
+    
+    # Classify the tiles against the prepared geometry: 0 outside, 1 on the boundary, 2 within
+    # The geometry of the caller is left unprepared, as it was given
+    prepared = shapely.is_prepared(geometry)
+    shapely.prepare(geometry)
+    try:
+        tile_state = shapely.intersects(geometry, tiles).astype(np.int8)
+        tile_state[tile_state == 1] += shapely.contains(geometry, tiles[tile_state == 1])
+        
+        # Expand to the cells (row-major, as the meshgrid of centers)
+        iy = np.arange(len(ys)) // tile_size
+        ix = np.arange(len(xs)) // tile_size
+        cell_state = tile_state[iy[:, None], ix[None, :]].ravel()
+        
+        # Test the cells of the boundary tiles only
+        keep = cell_state == 2
+        boundary = np.flatnonzero(cell_state == 1)
+        row, col = np.divmod(boundary, len(xs))
+        bounds = (cell_minx[col], cell_miny[row], cell_maxx[col], cell_maxy[row])
+        keep[boundary] = _intersects_cells(geometry, bounds, n_jobs)
+    finally:
+        if not prepared:
+            shapely.destroy_prepared(geometry)
     
-    # Vectorized creation of polygons and IDs
-    polys = latlng2polygon(yy, xx)
-    ids = latlng2pentad(yy, xx)
+    # Kept cells (index: position in the grid)
+    index = np.flatnonzero(keep)
+    row, col = np.divmod(index, len(xs))
     
-    # Create GeoDataFrame
+    if file is not None:
+        # Stream the pentad IDs and cell bounds to the file, without building the polygons
+        chunks = (
+            (
+                latlng2pentad(ys[r], xs[c]),
+                (cell_minx[c], cell_miny[r], cell_maxx[c], cell_maxy[r]),
+            )
+            for r, c in (
+                (row[k:k + chunksize], col[k:k + chunksize])
+                for k in range(0, len(index), chunksize)
+            )
+        )
+        return _write_pentad_grid(chunks, file)
+    
+    # Create GeoDataFrame of the kept cells
+    ids = latlng2pentad(ys[row], xs[col])
+    polys = shapely.box(cell_minx[col], cell_miny[row], cell_maxx[col], cell_maxy[row])
     gdf = gpd.GeoDataFrame(
         {'pentad': ids, 'geometry': polys}, 
+        index=index,
         crs='EPSG:4326'
     )
     
-    # Filter by intersection with the geometry
-    # Using spatial index if available or just boolean indexing
-    gdf = gdf[gdf.intersects(geometry)]
-    
     if return_geojson:
         return gdf.to_json()
     else:
         return gdf
+
+
+def read_pentad_grid(file, bbox=None):
+    """
+    Read a pentad grid written by `generate_pentad_grid` to a file.
+    
+    With `bbox`, only the pentads intersecting it are read: FlatGeobuf
+    files use their spatial index and GeoParquet files skip the row groups
+    outside of it.
+    
+    Parameters:
+    -----------
+    file : str
+        GeoJSON sequence (".geojsonl", ".geojsons"), FlatGeobuf (".fgb")
+        or GeoParquet (".parquet") file.
+    bbox : tuple of float, optional
+        (minx, miny, maxx, maxy) of the area to read.
+    
+    Returns:
+    --------
+    geopandas.GeoDataFrame
+        Pentad grid with columns 'pentad' and 'geometry'.
+    """
+    if _grid_file_driver(file) == "Parquet":
+        return gpd.read_parquet(file, columns=["pentad", "geometry"], bbox=bbox)
+    return gpd.read_file(file, bbox=bbox)
+
+
+# GDAL drivers of the pentad grid files by extension (GeoParquet is written with pyarrow)
+_GRID_FILE_DRIVERS = {
+    ".geojsonl": "GeoJSONSeq",
+    ".geojsons": "GeoJSONSeq",
+    ".fgb": "FlatGeobuf",
+    ".parquet": "Parquet",
+}
+
+
+def _grid_file_driver(file):
+    extension = os.path.splitext(str(file))[1].lower()
+    if extension not in _GRID_FILE_DRIVERS:
+        raise ValueError(
+            f"Unsupported pentad grid file extension {extension!r}, expected one of {list(_GRID_FILE_DRIVERS)}"
+        )
+    return _GRID_FILE_DRIVERS[extension]
+
+
+def _write_pentad_grid(chunks, file):
+    # Write the (pentad IDs, cell bounds) chunks to file as arrow record batches with WKB geometries
+    import pyarrow as pa
+
+    driver = _grid_file_driver(file)
+    fields = [
+        pa.field("pentad", pa.string()),
+        pa.field("geometry", pa.binary(), metadata={"ARROW:extension:name": "geoarrow.wkb"}),
+    ]
+    if driver == "Parquet":
+        # GeoParquet 1.1 bbox covering column, used to skip row groups when reading a bbox
+        fields.append(
+            pa.field("bbox", pa.struct([(k, pa.float64()) for k in ["xmin", "ymin", "xmax", "ymax"]]))
+        )
+    schema = pa.schema(fields)
+
+    def batches():
+        for ids, bounds in chunks:
+            wkb = _bounds2wkb_buffer(*bounds)
+            offsets = np.arange(len(wkb) + 1, dtype=np.int32) * wkb.shape[1]
+            arrays = [
+                pa.array(ids, pa.string()),
+                pa.Array.from_buffers(
+                    pa.binary(), len(wkb), [None, pa.py_buffer(offsets), pa.py_buffer(wkb)]
+                ),
+            ]
+            if driver == "Parquet":
+                arrays.append(pa.StructArray.from_arrays(bounds, names=["xmin", "ymin", "xmax", "ymax"]))
+            yield pa.record_batch(arrays, schema=schema)
+
+    if driver == "Parquet":
+        _write_geoparquet(batches(), schema, file)
+    else:
+        import pyogrio
+
+        pyogrio.write_arrow(
+            pa.RecordBatchReader.from_batches(schema, batches()),
+            file,
+            driver=driver,
+            geometry_name="geometry",
+            geometry_type="Polygon",
+            crs="EPSG:4326",
+            **({"COORDINATE_PRECISION": 15} if driver == "GeoJSONSeq" else {}),
+        )
+    return file
+
+
+def _write_geoparquet(batches, schema, file):
+    # Write record batches with a WKB geometry and bbox column to a GeoParquet file, one row group per batch
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyproj import CRS
+
+    geo = {
+        "version": "1.1.0",
+        "primary_column": "geometry",
+        "columns": {
+            "geometry": {
+                "encoding": "WKB",
+                "geometry_types": ["Polygon"],
+                "crs": CRS.from_epsg(4326).to_json_dict(),
+                "covering": {
+                    "bbox": {k: ["bbox", k] for k in ["xmin", "ymin", "xmax", "ymax"]}
+                },
+            }
+        },
+    }
+    schema = schema.with_metadata({"geo": json.dumps(geo)})
+    with pq.ParquetWriter(file, schema) as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_batches([batch], schema=schema))
+
+
+def _intersects_cells(geometry, bounds, n_jobs=1):
+    # Whether the cells of bounds (minx, miny, maxx, maxy) intersect geometry, in n_jobs processes
+    if n_jobs == 1 or len(bounds[0]) < 10000:
+        return _intersects_boxes(geometry, *bounds)
+    chunks = [np.array_split(b, 4 * n_jobs) for b in bounds]
+    with concurrent.futures.ProcessPoolExecutor(n_jobs) as executor:
+        futures = [executor.submit(_intersects_boxes, geometry, *chunk) for chunk in zip(*chunks)]
+        return np.concatenate([future.result() for future in futures])
+
+
+def _intersects_boxes(geometry, minx, miny, maxx, maxy):
+    # Intersection test of boxes with the prepared geometry (also run in worker processes)
+    shapely.prepare(geometry)
+    return shapely.intersects(geometry, shapely.box(minx, miny, maxx, maxy))
+
+
+# ============================================================================
+# Pentad Index
+# ============================================================================
+
+# A pentad index is a directory of memory-mappable .npy arrays:
+# - pentads.npy: pentad code, cell bounds and region of each pentad, sorted by code
+# - grid.npy: row in pentads.npy of each cell of the grid of pentad codes (-1 if none)
+# - region_pentads.npy / region_offsets.npy: rows in pentads.npy of the
+#   pentads of each region (region k: region_pentads[offsets[k]:offsets[k + 1]])
+# - meta.json: region names, origin of grid.npy and fingerprint of the regions
+
+_PENTAD_INDEX_DTYPE = np.dtype(
+    [
+        ("code", np.int32),
+        ("minx", np.float64),
+        ("miny", np.float64),
+        ("maxx", np.float64),
+        ("maxy", np.float64),
+        ("region", np.int32),
+    ]
+)
+_PENTAD_INDEX_ARRAYS = ["pentads", "grid", "region_pentads", "region_offsets"]
+
+
+def pentad_index(regions, index_dir, region_column=None, tile_size=32, n_jobs=1):
+    """
+    Build or load the pentad index of regions (e.g., countries).
+    
+    The index lists the pentads intersecting each region (see
+    `generate_pentad_grid`) with their code and bounds, and is stored in
+    `index_dir` as memory-mapped arrays. It is only built if `index_dir`
+    does not hold the index of the same regions yet: later calls just map
+    the arrays. Lookups are then array reads: `pentads_in_region` for the
+    pentads of a region and `pentad_region` for the region of pentads.
+    
+    Parameters:
+    -----------
+    regions : shapely.geometry, geopandas.GeoSeries or geopandas.GeoDataFrame
+        Region geometries. A single geometry is region 0.
+    index_dir : str
+        Directory of the index.
+    region_column : str, optional
+        Column of the GeoDataFrame with the region names (str or int).
+        Defaults to the index.
+    tile_size : int, default=32
+        See `generate_pentad_grid`.
+    n_jobs : int, default=1
+        See `generate_pentad_grid`.
+    
+    Returns:
+    --------
+    dict
+        The index (see `load_pentad_index`).
+    """
+    if isinstance(regions, gpd.GeoDataFrame) and region_column is not None:
+        names = regions[region_column].tolist()
+    elif isinstance(regions, (gpd.GeoDataFrame, gpd.GeoSeries)):
+        names = regions.index.tolist()
+    else:
+        names = [0]
+    if isinstance(regions, (gpd.GeoDataFrame, gpd.GeoSeries)):
+        geometries = np.asarray(regions.geometry.values)
+    else:
+        geometries = np.array([regions], dtype=object)
+
+    # Fingerprint of the regions, to reuse an index built for the same regions
+    fingerprint = hashlib.sha1(json.dumps(names).encode())
+    for wkb in shapely.to_wkb(geometries):
+        fingerprint.update(wkb)
+    fingerprint = fingerprint.hexdigest()
+
+    meta_file = os.path.join(index_dir, "meta.json")
+    if os.path.exists(meta_file):
+        with open(meta_file) as f:
+            if json.load(f)["fingerprint"] == fingerprint:
+                return load_pentad_index(index_dir)
+
+    _build_pentad_index(geometries, names, fingerprint, index_dir, tile_size, n_jobs)
+    return load_pentad_index(index_dir)
+
+
+def load_pentad_index(index_dir):
+    """
+    Load a pentad index built by `pentad_index`, with memory-mapped arrays.
+    
+    Parameters:
+    -----------
+    index_dir : str
+        Directory of the index.
+    
+    Returns:
+    --------
+    dict
+        - 'pentads': structured array of the pentads sorted by code, with
+          fields 'code', 'minx', 'miny', 'maxx', 'maxy' and 'region' (the
+          region with the largest part of the pentad)
+        - 'grid': row in 'pentads' of each pentad code (-1 if none), on the
+          grid of pentad rows and columns starting at 'origin'
+        - 'origin': (row, column) of grid[0, 0]
+        - 'regions': region names
+        - 'region_pentads', 'region_offsets': rows in 'pentads' of the
+          pentads intersecting each region
+    """
+    with open(os.path.join(index_dir, "meta.json")) as f:
+        meta = json.load(f)
+    index = {
+        name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+        for name in _PENTAD_INDEX_ARRAYS
+    }
+    index["origin"] = tuple(meta["origin"])
+    index["regions"] = meta["regions"]
+    return index
+
+
+def pentads_in_region(index, region):
+    """
+    Return the pentads intersecting a region of a pentad index.
+    
+    Parameters:
+    -----------
+    index : dict
+        Pentad index (see `pentad_index`).
+    region : str or int
+        Region name.
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Structured array of the pentads (fields 'code', 'minx', 'miny',
+        'maxx', 'maxy' and 'region'), sorted by code. Use `pentad_code2str`
+        for their pentad IDs.
+    """
+    if region not in index["regions"]:
+        raise ValueError(f"Unknown region {region!r}")
+    k = index["regions"].index(region)
+    offsets = index["region_offsets"]
+    rows = index["region_pentads"][offsets[k] : offsets[k + 1]]
+    return index["pentads"][rows]
+
+
+def pentad_region(index, pentads):
+    """
+    Return the region of pentads in a pentad index.
+    
+    Pentads intersecting several regions are assigned to the region with
+    the largest part of the pentad.
+    
+    Parameters:
+    -----------
+    index : dict
+        Pentad index (see `pentad_index`).
+    pentads : str, int or array-like
+        Pentad ID(s) or code(s).
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Region name of each pentad (None for pentads outside of the index).
+    """
+    if isinstance(pentads, str) or np.asarray(pentads).dtype.kind in "UO":
+        codes = str2pentad_code(pentads)
+    else:
+        codes = np.atleast_1d(np.asarray(pentads, dtype=np.int32))
+
+    # Position on the grid of pentad codes
+    grid = index["grid"]
+    row, col = _unpack_pentad_code(codes)
+    row = row - index["origin"][0]
+    col = col - index["origin"][1]
+    inside = (row >= 0) & (row < grid.shape[0]) & (col >= 0) & (col < grid.shape[1])
+    position = np.full(len(codes), -1)
+    position[inside] = grid[row[inside], col[inside]]
+
+    region = np.where(position >= 0, index["pentads"]["region"][position], -1)
+    return np.array(index["regions"] + [None], dtype=object)[region]
+
+
+def _build_pentad_index(geometries, names, fingerprint, index_dir, tile_size=32, n_jobs=1):
+    # Generate the pentads of each region and write the arrays of the index
+    codes, bounds, region = [], [], []
+    for k, geometry in enumerate(geometries):
+        gdf = generate_pentad_grid(geometry, return_geojson=False, tile_size=tile_size, n_jobs=n_jobs)
+        codes.append(str2pentad_code(gdf["pentad"].values))
+        bounds.append(shapely.bounds(gdf.geometry.values))
+        region.append(np.full(len(gdf), k, dtype=np.int32))
+    codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+    bounds = np.concatenate(bounds) if bounds else np.empty((0, 4))
+    region = np.concatenate(region) if region else np.empty(0, dtype=np.int32)
+
+    # Pentads in several regions: region with the largest intersection
+    area = np.ones(len(codes))
+    _, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+    shared = counts[inverse] > 1
+    area[shared] = shapely.area(
+        shapely.intersection(shapely.box(*bounds[shared].T), geometries[region[shared]])
+    )
+    order = np.lexsort((region, -area, codes))
+    first = np.r_[True, codes[order][1:] != codes[order][:-1]] if len(codes) else np.empty(0, dtype=bool)
+    unique = order[first]
+
+    pentads = np.empty(len(unique), dtype=_PENTAD_INDEX_DTYPE)
+    pentads["code"] = codes[unique]
+    for i, field in enumerate(["minx", "miny", "maxx", "maxy"]):
+        pentads[field] = bounds[unique, i]
+    pentads["region"] = region[unique]
+
+    # Dense grid of the rows of the pentads, by pentad row and column
+    row, col = _unpack_pentad_code(pentads["code"])
+    origin = (int(row.min()), int(col.min())) if len(row) else (0, 0)
+    grid = np.full(
+        (int(row.max()) - origin[0] + 1, int(col.max()) - origin[1] + 1) if len(row) else (0, 0),
+        -1,
+        dtype=np.int32,
+    )
+    grid[row - origin[0], col - origin[1]] = np.arange(len(pentads), dtype=np.int32)
+
+    # Rows of the pentads of each region, sorted by region then code
+    rows = np.searchsorted(pentads["code"], codes).astype(np.int32)
+    by_region = np.lexsort((codes, region))
+    region_pentads = rows[by_region]
+    region_offsets = np.searchsorted(region[by_region], np.arange(len(names) + 1)).astype(np.int64)
+
+    # Write the arrays, then the metadata which marks the index as complete
+    os.makedirs(index_dir, exist_ok=True)
+    meta_file = os.path.join(index_dir, "meta.json")
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+    arrays = {"pentads": pentads, "grid": grid, "region_pentads": region_pentads, "region_offsets": region_offsets}
+    for name in _PENTAD_INDEX_ARRAYS:
+        np.save(os.path.join(index_dir, f"{name}.npy"), arrays[name])
+    meta = {"fingerprint": fingerprint, "regions": names, "origin": list(origin)}
+    with open(f"{meta_file}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_file}.tmp", meta_file)
+
+
+# ============================================================================
+# Pentad Rasters
+# ============================================================================
+
+# A pentad raster is a dense north-up grid of 5' cells in EPSG:4326, with the
+# values of each pentad at the cell of its code: the pixel of the pentad code
+# (row, column) covers latitudes [row, row + 1] x 5' and longitudes
+# [column, column + 1] x 5', i.e. the cell of the points of the pentad (see
+# `latlng2polygon`).
+
+
+def pentad_raster(codes, bands=None, bounds=None, chunksize=1_000_000):
+    """
+    Accumulate values of items (e.g., checklists) on a pentad raster.
+    
+    The raster position of each item is computed from its pentad code and all
+    the bands are accumulated with `np.bincount` in a single pass over chunks
+    of `chunksize` items, so that the memory used is the raster plus a chunk:
+    no grouping by pentad nor polygon is needed.
+    
+    Parameters:
+    -----------
+    codes : array-like of int
+        Pentad code of each item (see `latlng2pentad_code`).
+    bands : dict, optional
+        Bands of the raster: name -> values of each item, summed by pentad
+        (missing values are ignored), or None for the number of items of each
+        pentad. Defaults to {"count": None}.
+    bounds : tuple, optional
+        (minx, miny, maxx, maxy) of the raster in degrees, extended to the 5'
+        grid. Items outside are ignored. Defaults to the extent of codes.
+    chunksize : int, default=1_000_000
+        Number of items processed at once.
+    
+    Returns:
+    --------
+    dict
+        The raster:
+        - "data": numpy.ndarray (bands, height, width) of float64, north-up
+        - "bands": list of the band names
+        - "transform": GDAL geotransform (west, 5', 0, north, 0, -5')
+        - "crs": "EPSG:4326"
+    """
+    codes = np.atleast_1d(np.asarray(codes, dtype=np.int32))
+    bands = {"count": None} if bands is None else bands
+    values = {}
+    for name, value in bands.items():
+        if value is not None:
+            value = np.atleast_1d(np.asarray(value, dtype=float))
+            if value.shape != codes.shape:
+                raise ValueError(f"Band '{name}' must have one value per pentad code.")
+        values[name] = value
+
+    left, bottom, right, top = _raster_extent(_raster_bounds(codes) if bounds is None else bounds)
+    width, height = right - left, top - bottom
+    data = np.zeros((len(values), height, width))
+    flat = data.reshape(len(values), -1)
+
+    for start in range(0, len(codes), chunksize):
+        row, col = _unpack_pentad_code(codes[start : start + chunksize])
+        inside = (row >= bottom) & (row < top) & (col >= left) & (col < right)
+        position = ((top - 1 - row[inside]).astype(np.intp) * width + (col[inside] - left))
+        for k, value in enumerate(values.values()):
+            if value is None:
+                sums = np.bincount(position)
+            else:
+                value = value[start : start + chunksize][inside]
+                sums = np.bincount(position, np.where(np.isnan(value), 0, value))
+            flat[k, : len(sums)] += sums
+
+    d = 5 / 60
+    return {
+        "data": data,
+        "bands": list(values),
+        "transform": (left * d, d, 0.0, top * d, 0.0, -d),
+        "crs": "EPSG:4326",
+    }
+
+
+def effort_raster(chk, card=None, bounds=None, file=None):
+    """
+    Compute the eBird effort of each pentad as a raster.
+    
+    Bands: number of checklists ("checklists"), total duration in minutes
+    ("duration") and total distance in km ("distance") of the checklists, and
+    number of cards ("cards") if card is given (see `pentad_raster`).
+    
+    Parameters:
+    -----------
+    chk : pandas.DataFrame
+        Checklists with `LATITUDE`, `LONGITUDE`, `DURATION MINUTES` and
+        `EFFORT DISTANCE KM` (e.g., from `ebd2chk`).
+    card : pandas.DataFrame, optional
+        Cards with `PENTAD` (e.g., from `chk2valid_card`).
+    bounds : tuple, optional
+        (minx, miny, maxx, maxy) of the raster in degrees. Defaults to the
+        extent of the checklists and cards.
+    file : str, optional
+        Also write the raster to this GeoTIFF file (see `write_pentad_raster`).
+    
+    Returns:
+    --------
+    dict
+        The raster (see `pentad_raster`).
+    """
+    codes = latlng2pentad_code(chk["LATITUDE"], chk["LONGITUDE"])
+    card_codes = str2pentad_code(card["PENTAD"].to_numpy()) if card is not None else None
+    if bounds is None:
+        bounds = _raster_bounds(codes if card is None else np.concatenate([codes, card_codes]))
+
+    raster = pentad_raster(
+        codes,
+        {
+            "checklists": None,
+            "duration": chk["DURATION MINUTES"].to_numpy(dtype=float),
+            "distance": chk["EFFORT DISTANCE KM"].to_numpy(dtype=float),
+        },
+        bounds=bounds,
+    )
+    if card is not None:
+        cards = pentad_raster(card_codes, {"cards": None}, bounds=bounds)
+        raster["data"] = np.concatenate([raster["data"], cards["data"]])
+        raster["bands"] += cards["bands"]
+
+    if file is not None:
+        write_pentad_raster(raster, file)
+    return raster
+
+
+def write_pentad_raster(raster, file, dtype="float32"):
+    """
+    Write a pentad raster to a multi-band GeoTIFF file.
+    
+    The bands are named after the bands of the raster. Requires rasterio
+    (`pip install eBird2ABAP[raster]`).
+    
+    Parameters:
+    -----------
+    raster : dict
+        The raster (see `pentad_raster`).
+    file : str
+        Path of the GeoTIFF file.
+    dtype : str, default="float32"
+        Data type of the bands in the file.
+    
+    Returns:
+    --------
+    str
+        file.
+    """
+    try:
+        import rasterio
+        from rasterio.transform import Affine
+    except ImportError as e:
+        raise ImportError("Writing GeoTIFF files requires rasterio (pip install eBird2ABAP[raster])") from e
+
+    count, height, width = raster["data"].shape
+    profile = {
+        "driver": "GTiff",
+        "count": count,
+        "height": height,
+        "width": width,
+        "dtype": dtype,
+        "crs": raster["crs"],
+        "transform": Affine.from_gdal(*raster["transform"]),
+        "compress": "deflate",
+        "tiled": True,
+    }
+    with rasterio.open(file, "w", **profile) as dst:
+        for k, name in enumerate(raster["bands"], start=1):
+            dst.write(raster["data"][k - 1].astype(dtype), k)
+            dst.set_band_description(k, name)
+    return file
+
+
+def _raster_bounds(codes):
+    # Bounds (minx, miny, maxx, maxy) in degrees of the pixels of pentad codes (see pentad_raster)
+    if len(codes) == 0:
+        return 0.0, 0.0, 0.0, 0.0
+    row, col = _unpack_pentad_code(codes)
+    d = 5 / 60
+    return col.min() * d, row.min() * d, (col.max() + 1) * d, (row.max() + 1) * d
+
+
+def _raster_extent(bounds):
+    # Pixel extent (left, bottom, right, top) on the 5' grid of bounds in degrees, rounded against floating point errors
+    minx, miny, maxx, maxy = (np.round(np.asarray(bounds, dtype=float) * 12, 6)).tolist()
+    return int(np.floor(minx)), int(np.floor(miny)), int(np.ceil(maxx)), int(np.ceil(maxy))
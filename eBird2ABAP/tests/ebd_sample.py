@@ -0,0 +1,117 @@
+"""
+Synthetic EBD sample used by the eBird2ABAP pipeline tests.
+
+Writes a small tab-separated (optionally gzipped) file with the same header
+layout as the eBird Basic Dataset so that `read_EBD` and the card pipeline
+can be exercised without downloading a release.
+"""
+
+import gzip
+import numpy as np
+import pandas as pd
+
+EBD_COLUMNS = [
+    "GLOBAL UNIQUE IDENTIFIER",
+    "CATEGORY",
+    "TAXON CONCEPT ID",
+    "COMMON NAME",
+    "SCIENTIFIC NAME",
+    "OBSERVATION COUNT",
+    "COUNTRY",
+    "LATITUDE",
+    "LONGITUDE",
+    "OBSERVATION DATE",
+    "TIME OBSERVATIONS STARTED",
+    "OBSERVER ID",
+    "SAMPLING EVENT IDENTIFIER",
+    "PROTOCOL TYPE",
+    "DURATION MINUTES",
+    "EFFORT DISTANCE KM",
+    "ALL SPECIES REPORTED",
+    "GROUP IDENTIFIER",
+]
+
+# Taxon concepts present in matched_species.csv (with their scientific names)
+TAXA = [
+    ("avibase-1A0ECB6E", "Accipiter badius"),
+    ("avibase-A2BB98A9", "Acanthis flammea"),
+    ("avibase-240E3390", "Passer domesticus"),
+    ("avibase-ADC1F0C9", "Pycnonotus barbatus"),
+    ("avibase-AB937AEB", "Streptopelia capicola"),
+    ("avibase-34D538E1", "Corvus albus"),
+    ("avibase-00000000", "Unmatched sp."),
+]
+
+PROTOCOLS = ["Traveling", "Stationary", "Incidental", "Historical", "Area"]
+
+
+def make_ebd_sample(n_checklists=400, seed=0):
+    """
+    Build a synthetic EBD table.
+
+    Checklists are spread over a handful of observers and pentads around
+    Nairobi and Accra so that several full protocol cards can be formed.
+    A few shared checklists (same GROUP IDENTIFIER) are included.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per checklist-species with the EBD column names.
+    """
+    rng = np.random.default_rng(seed)
+    sites = [(-1.2921, 36.8219), (-1.30, 36.76), (5.6037, -0.1870), (-0.04, 0.04)]
+    observers = [f"obsr{100000 + i}" for i in range(8)]
+    start = pd.Timestamp("2023-01-01")
+
+    rows = []
+    for i in range(n_checklists):
+        lat, lng = sites[rng.integers(len(sites))]
+        lat += rng.uniform(-0.02, 0.02)
+        lng += rng.uniform(-0.02, 0.02)
+        obs = observers[rng.integers(len(observers))]
+        date = start + pd.Timedelta(days=int(rng.integers(0, 60)))
+        time = "" if rng.random() < 0.1 else f"{rng.integers(5, 18):02d}:{rng.integers(0, 60):02d}:00"
+        protocol = PROTOCOLS[rng.integers(len(PROTOCOLS))]
+        duration = "" if rng.random() < 0.05 else int(rng.integers(5, 180))
+        distance = "" if protocol != "Traveling" else round(float(rng.uniform(0, 3)), 3)
+        complete = int(rng.random() < 0.9)
+        sei = f"S{10000000 + i}"
+        group = f"G{500000 + i // 2}" if (i % 20) < 2 else ""
+        for t in rng.choice(len(TAXA), size=int(rng.integers(1, len(TAXA))), replace=False):
+            taxon, sci = TAXA[t]
+            rows.append(
+                {
+                    "GLOBAL UNIQUE IDENTIFIER": f"URN:{sei}:{t}",
+                    "CATEGORY": "species",
+                    "TAXON CONCEPT ID": taxon,
+                    "COMMON NAME": sci,
+                    "SCIENTIFIC NAME": sci,
+                    "OBSERVATION COUNT": "X",
+                    "COUNTRY": "Kenya",
+                    "LATITUDE": round(lat, 6),
+                    "LONGITUDE": round(lng, 6),
+                    "OBSERVATION DATE": date.strftime("%Y-%m-%d"),
+                    "TIME OBSERVATIONS STARTED": time,
+                    "OBSERVER ID": obs,
+                    "SAMPLING EVENT IDENTIFIER": sei,
+                    "PROTOCOL TYPE": protocol,
+                    "DURATION MINUTES": duration,
+                    "EFFORT DISTANCE KM": distance,
+                    "ALL SPECIES REPORTED": complete,
+                    "GROUP IDENTIFIER": group,
+                }
+            )
+    return pd.DataFrame(rows, columns=EBD_COLUMNS)
+
+
+def write_ebd_sample(path, n_checklists=400, seed=0):
+    """Write the synthetic EBD table to `path` (gzipped if it ends in .gz)."""
+    df = make_ebd_sample(n_checklists=n_checklists, seed=seed)
+    text = df.to_csv(sep="\t", index=False)
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "wt") as f:
+            f.write(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text)
+    return path
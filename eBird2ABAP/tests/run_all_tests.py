@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 """
-Run all pentad module tests.
+Run all eBird2ABAP tests.
 
 This script runs all test files in the tests directory and provides
 a summary of results.
@@ -15,6 +15,17 @@ TEST_FILES = [
     'test_pentad_conversions.py',
     'test_pentad_polygons.py',
     'test_pentad_bounds.py',
+    'test_pentad_codes.py',
+    'test_pentad_grid.py',
+    'test_pentad_index.py',
+    'test_assign_pentads.py',
+    'test_pentad_raster.py',
+    'test_ebd_reader.py',
+    'test_download.py',
+    'test_incremental.py',
+    'test_cards.py',
+    'test_export.py',
+    'test_upload.py',
 ]
 
 def run_test(test_file):
@@ -34,7 +45,7 @@ def run_test(test_file):
 def main():
     """Run all tests and report results."""
     print("\n" + "=" * 80)
-    print("PENTAD MODULE - RUNNING ALL TESTS")
+    print("eBird2ABAP - RUNNING ALL TESTS")
     print("=" * 80)
     
     results = {}
@@ -0,0 +1,114 @@
+"""
+Test the assignment of pentads to points.
+
+Compares assign_pentads to latlng2pentad and to a spatial join with the
+polygons of generate_pentad_grid:
+- Same pentad IDs as latlng2pentad, including the naming convention edge cases
+- Points without coordinates and GeoDataFrame points
+- Grid attributes and regions of a pentad index attached through the pentad codes
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pentad import (
+    assign_pentads,
+    generate_pentad_grid,
+    latlng2pentad,
+    latlng2pentad_code,
+    pentad_index,
+    pentad_region,
+)
+
+
+def _points(n=20000, seed=0):
+    # Random points plus points on the equator, the prime meridian, the grid lines and beyond 100°E/W
+    rng = np.random.default_rng(seed)
+    grid = np.arange(-1, 1, 5 / 60)
+    lat = np.r_[rng.uniform(-90, 90, n), 0, 0, 0, 10, -10, 90, -90, grid, grid]
+    lng = np.r_[rng.uniform(-180, 180, n), 0, 1e-9, -1e-9, 100, -100, 180, -180, grid[::-1], grid]
+    return pd.DataFrame({"LATITUDE": lat, "LONGITUDE": lng, "SAMPLING EVENT IDENTIFIER": np.arange(len(lat))})
+
+
+def test_assign_pentads():
+    """Test that assign_pentads gives the pentads of latlng2pentad and of a spatial join."""
+
+    print("=" * 70)
+    print("Testing assign_pentads")
+    print("=" * 70)
+
+    df = _points()
+    out = assign_pentads(df, code=True)
+    assert out["pentad"].tolist() == latlng2pentad(df["LATITUDE"], df["LONGITUDE"]).tolist()
+    assert np.array_equal(out["pentad_code"], latlng2pentad_code(df["LATITUDE"], df["LONGITUDE"]))
+    assert out.drop(columns=["pentad", "pentad_code"]).equals(df)
+    print(f"✓ {len(df)} points: same pentads as latlng2pentad")
+
+    # Points without coordinates, other column names
+    missing = df.rename(columns={"LATITUDE": "lat", "LONGITUDE": "lng"})
+    missing.loc[[0, 5], "lat"] = np.nan
+    out = assign_pentads(missing, lat="lat", lng="lng")
+    assert out["pentad"].isna().tolist()[:6] == [True, False, False, False, False, True]
+    assert out["pentad"][1:5].tolist() == latlng2pentad(df["LATITUDE"][1:5], df["LONGITUDE"][1:5]).tolist()
+    print("✓ Points without coordinates")
+
+    # GeoDataFrame points
+    points = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["LONGITUDE"], df["LATITUDE"]), crs="EPSG:4326")
+    out = assign_pentads(points)
+    assert isinstance(out, gpd.GeoDataFrame)
+    assert out["pentad"].tolist() == latlng2pentad(df["LATITUDE"], df["LONGITUDE"]).tolist()
+    print("✓ GeoDataFrame points")
+
+    # Grid attributes: same as a spatial join with the grid polygons (points within a cell)
+    grid = generate_pentad_grid(box(-2.0, -1.5, 1.0, 2.0), return_geojson=False)
+    grid["cell"] = np.arange(len(grid))
+    rng = np.random.default_rng(1)
+    inner = pd.DataFrame({"LATITUDE": rng.uniform(-3, 3, 5000), "LONGITUDE": rng.uniform(-3, 3, 5000)})
+    inner_points = gpd.GeoDataFrame(
+        inner, geometry=gpd.points_from_xy(inner["LONGITUDE"], inner["LATITUDE"]), crs="EPSG:4326"
+    )
+    expected = gpd.sjoin(inner_points, grid, how="left", predicate="within").sort_index()
+    out = assign_pentads(inner, grid=grid)
+    assert "geometry" not in out.columns
+    joined = out["cell"].notna()
+    assert joined.sum() > 0 and (~joined).sum() > 0
+    assert np.array_equal(out["cell"][joined], expected["cell"][joined])
+    assert expected["cell"][~joined].isna().all()
+    print(f"✓ Grid attributes: {joined.sum()} of {len(inner)} points in the grid, as with sjoin")
+
+    # Regions of a pentad index
+    regions = gpd.GeoDataFrame({"name": ["A", "B"]}, geometry=[box(-3, -3, 0, 3), box(0, -3, 3, 3)], crs="EPSG:4326")
+    with tempfile.TemporaryDirectory() as tmp:
+        index = pentad_index(regions, tmp, region_column="name")
+        inner.loc[0, "LATITUDE"] = np.nan
+        out = assign_pentads(inner, index=index)
+        assert pd.isna(out["region"][0])
+        assert out["region"][1:].tolist() == pentad_region(index, out["pentad"][1:].tolist()).tolist()
+    print("✓ Regions of a pentad index")
+
+    print("\n✓ All assign_pentads tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("ASSIGN PENTADS TESTS")
+    print("=" * 70)
+
+    try:
+        test_assign_pentads()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
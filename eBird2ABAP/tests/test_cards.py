@@ -0,0 +1,228 @@
+"""
+Test the card construction steps of the pipeline.
+
+Compares the vectorized card engine to the reference implementation
+(checkday_pentad_observer applied to each pentad_observer group):
+- card_window_starts / chk2valid_card: Same valid cards
+- valid_card2chk_card: Same checklist-card pairs as the cartesian merge
+"""
+
+import sys
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add package directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from eBird2ABAP import ebird2card
+from eBird2ABAP.ebird2card import (
+    card_number,
+    chk2valid_card,
+    checkday_pentad_observer,
+    encode_keys,
+    valid_card2chk_card,
+)
+
+
+def _random_chk(n=5000, seed=0):
+    # Checklists of a few observers in a few pentads, dense enough in time to form overlapping windows
+    rng = np.random.default_rng(seed)
+    chk = pd.DataFrame(
+        {
+            "PENTAD": rng.choice(["0115_3645", "0120_3650", "0535b0010"], n),
+            "OBSERVER ID": rng.choice([f"obsr{100000 + i}" for i in range(20)], n),
+            "OBSERVATION DATE": pd.Timestamp("2020-01-01")
+            + pd.to_timedelta(rng.integers(0, 400, n), unit="D"),
+            "DURATION MINUTES": rng.choice([0.0, 5.0, 15.0, 30.0, 60.0, 90.0, np.nan], n),
+            "KEEP PENTAD": rng.random(n) < 0.9,
+            "KEEP PROTOCOL": rng.random(n) < 0.9,
+            "ALL SPECIES REPORTED": rng.random(n) < 0.9,
+        }
+    )
+    return encode_keys(chk)
+
+
+def _reference_valid_card(chk):
+    # Valid cards as computed by applying checkday_pentad_observer to each pentad_observer group
+    check = chk.loc[
+        chk["KEEP PENTAD"]
+        & chk["KEEP PROTOCOL"]
+        & (chk["DURATION MINUTES"] > 0)
+        & chk["ALL SPECIES REPORTED"],
+        ["PENTAD", "OBSERVER ID", "OBSERVATION DATE", "DURATION MINUTES"],
+    ]
+    checkday = (
+        check.groupby(["PENTAD", "OBSERVER ID", "OBSERVATION DATE"])
+        .agg({"DURATION MINUTES": "sum"})
+        .reset_index()
+    )
+    checkday.sort_values(by=["OBSERVATION DATE"], inplace=True)
+    checkday["pentad_observer"] = checkday["PENTAD"] + "_" + checkday["OBSERVER ID"]
+    checkday["pentad_observer_date"] = (
+        checkday["PENTAD"]
+        + "_"
+        + checkday["OBSERVER ID"].str[3:]
+        + "_"
+        + checkday["OBSERVATION DATE"].dt.strftime("%Y%m%d")
+    )
+    card = (
+        checkday.groupby("pentad_observer")
+        .apply(checkday_pentad_observer, include_groups=False)
+        .reset_index()
+    )
+    card_valid = card[card["CARD"] == card["pentad_observer_date"]][
+        ["PENTAD", "OBSERVER ID", "OBSERVATION DATE", "CARD"]
+    ]
+    return card_valid.sort_values(by="CARD").reset_index(drop=True)
+
+
+def _reference_chk_card(chk, card_valid):
+    # Checklist-card pairs from the merge of each checklist with all the cards of the same observer and pentad
+    chk_keep = chk[
+        chk["KEEP PENTAD"]
+        & pd.MultiIndex.from_frame(chk[["PENTAD", "OBSERVER ID"]]).isin(
+            pd.MultiIndex.from_frame(card_valid[["PENTAD", "OBSERVER ID"]])
+        )
+    ]
+    chk_card = pd.merge(
+        chk_keep,
+        card_valid[["PENTAD", "OBSERVER ID", "OBSERVATION DATE", "CARD"]],
+        on=["OBSERVER ID", "PENTAD"],
+        suffixes=("_chk", "_card"),
+        how="left",
+    )
+    duration = (chk_card["OBSERVATION DATE_chk"] - chk_card["OBSERVATION DATE_card"]).dt.days
+    chk_card = chk_card[(duration >= 0) & (duration < 5)].reset_index(drop=True)
+    return chk_card.astype({"CARD": "int64"})
+
+
+def _with_number(card_valid):
+    # card_valid with the card numbers instead of the integer CARD codes, sorted by card number
+    card_valid = card_valid.drop(columns="GROUP").assign(CARD=card_number(card_valid))
+    return card_valid.sort_values(by="CARD").reset_index(drop=True)
+
+
+def _chain(end):
+    # Same loop as the numba kernel of card_window_starts, in plain python
+    is_start = np.zeros(len(end), dtype=bool)
+    i = 0
+    while i < len(end):
+        is_start[i] = True
+        i = end[i]
+    return is_start
+
+
+def test_chk2valid_card():
+    """Test that the vectorized card engine finds the same valid cards as checkday_pentad_observer."""
+
+    print("=" * 70)
+    print("Testing chk2valid_card")
+    print("=" * 70)
+
+    for seed in range(5):
+        chk = _random_chk(seed=seed)
+        expected = _reference_valid_card(chk)
+        card_valid = chk2valid_card(chk)
+        assert (card_valid["CARD"] == np.arange(len(card_valid))).all()
+        pd.testing.assert_frame_equal(_with_number(card_valid), expected)
+
+        # Compiled chain loop (numba)
+        with mock.patch.object(ebird2card, "_window_chain_kernel", lambda: _chain):
+            card_valid = chk2valid_card(chk)
+        pd.testing.assert_frame_equal(_with_number(card_valid), expected)
+        print(f"✓ seed={seed}: {len(expected)} valid cards")
+
+    # No pentad_observer with enough effort
+    chk = _random_chk(seed=0)
+    chk["DURATION MINUTES"] = 1.0
+    card_valid = chk2valid_card(chk)
+    assert len(card_valid) == 0
+    assert list(card_valid.columns) == [
+        "PENTAD",
+        "OBSERVER ID",
+        "OBSERVATION DATE",
+        "GROUP",
+        "CARD",
+    ]
+    print("✓ No valid card")
+
+    print("\n✓ All chk2valid_card tests passed!")
+
+
+def test_window_chain_kernel():
+    """Test that the numba kernel of card_window_starts chains the same windows as the vectorized loop."""
+
+    print("\n" + "=" * 70)
+    print("Testing _window_chain_kernel")
+    print("=" * 70)
+
+    pytest.importorskip("numba")
+
+    kernel = ebird2card._window_chain_kernel()
+    assert kernel is not None
+    rng = np.random.default_rng(0)
+    for n in [0, 1, 10, 10_000]:
+        end = np.minimum(np.arange(n) + rng.integers(1, 6, n), n)
+        assert np.array_equal(kernel(end), _chain(end))
+    print("✓ Same chains as the python loop")
+
+    for seed in range(5):
+        chk = _random_chk(seed=seed)
+        card_valid = chk2valid_card(chk)
+        with mock.patch.object(ebird2card, "_window_chain_kernel", lambda: None):
+            expected = chk2valid_card(chk)
+        pd.testing.assert_frame_equal(card_valid, expected)
+        print(f"✓ seed={seed}: {len(expected)} valid cards, same as the vectorized chain")
+
+    print("\n✓ All _window_chain_kernel tests passed!")
+
+
+def test_valid_card2chk_card():
+    """Test that the as-of join gives the same checklist-card pairs as the cartesian merge."""
+
+    print("\n" + "=" * 70)
+    print("Testing valid_card2chk_card")
+    print("=" * 70)
+
+    for seed in range(5):
+        chk = _random_chk(seed=seed)
+        chk.insert(0, "SAMPLING EVENT IDENTIFIER", [f"S{i}" for i in range(len(chk))])
+        # Checklists are sorted by datetime in the pipeline, but not necessarily here
+        if seed % 2:
+            chk = chk.sort_values(by="OBSERVATION DATE", kind="stable").reset_index(drop=True)
+        # Observers stored as integers (compact_EBD)
+        if seed == 4:
+            chk["OBSERVER ID"] = chk["OBSERVER ID"].str[4:].astype("int64")
+        card_valid = chk2valid_card(chk)
+
+        expected = _reference_chk_card(chk, card_valid)
+        chk_card = valid_card2chk_card(chk, card_valid).reset_index(drop=True)
+        pd.testing.assert_frame_equal(chk_card, expected)
+        print(f"✓ seed={seed}: {len(chk_card)} checklist-card pairs")
+
+    print("\n✓ All valid_card2chk_card tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("CARD TESTS")
+    print("=" * 70)
+
+    try:
+        test_chk2valid_card()
+        try:
+            test_window_chain_kernel()
+        except pytest.skip.Exception as e:
+            print(f"- Skipped: {e.msg}")
+        test_valid_card2chk_card()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
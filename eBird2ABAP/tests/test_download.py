@@ -0,0 +1,280 @@
+"""
+Test the EBD download engine.
+
+Downloads from a local HTTP server standing in for download.ebird.org:
+- Streaming download with size and checksum verification
+- Resume with HTTP Range requests after a dropped connection, validated with If-Range
+- Restart of a changed file or of a stale .part file, bounded retries without progress
+- Skip the download of an up-to-date file
+"""
+
+import contextlib
+import email.utils
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add package directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from eBird2ABAP.ebird2card import download_file
+
+CONTENT = os.urandom(3 * 2**20 + 123)
+LAST_MODIFIED = email.utils.formatdate(1700000000, usegmt=True)
+
+
+class _ReleaseHandler(BaseHTTPRequestHandler):
+    """
+    Serve `content` with Range and If-Range support, dropping the connection of the first `drop` GET
+    requests halfway and of all GET requests after `cut` bytes.
+    """
+
+    content = CONTENT
+    etag = '"v1"'
+    if_range = True
+    drop = 0
+    cut = None
+    requests = []
+    if_ranges = []
+
+    def do_HEAD(self):
+        self.requests.append(("HEAD", None))
+        self._send_headers(200, len(self.content))
+
+    def do_GET(self):
+        byte_range = self.headers.get("Range")
+        self.requests.append(("GET", byte_range))
+        self.if_ranges.append(self.headers.get("If-Range"))
+        if byte_range and self.if_range and self.headers.get("If-Range") not in (None, self.etag):
+            # Changed file: full response
+            byte_range = None
+        content = self.content
+        start = int(byte_range[len("bytes=") :].split("-")[0]) if byte_range else 0
+        if start >= len(content):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(content)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = content[start:]
+        if byte_range:
+            self._send_headers(206, len(body), f"bytes {start}-{len(content) - 1}/{len(content)}")
+        else:
+            self._send_headers(200, len(body))
+        if _ReleaseHandler.drop > 0 or self.cut is not None:
+            _ReleaseHandler.drop = max(_ReleaseHandler.drop - 1, 0)
+            body = body[: len(body) // 2 if self.cut is None else self.cut]
+            self.close_connection = True
+        try:
+            self.wfile.write(body)
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Response rejected by the client
+            self.close_connection = True
+
+    def _send_headers(self, status, length, content_range=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("ETag", self.etag)
+        self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def _server():
+    _ReleaseHandler.content = CONTENT
+    _ReleaseHandler.etag = '"v1"'
+    _ReleaseHandler.if_range = True
+    _ReleaseHandler.requests = []
+    _ReleaseHandler.if_ranges = []
+    _ReleaseHandler.drop = 0
+    _ReleaseHandler.cut = None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ReleaseHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/ebd_AFR_relJan-2024.tar"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _interrupted_download(url, filepath):
+    # Leave a .part file (and its validator) as a run whose connection dropped would
+    _ReleaseHandler.drop = 1
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, max_retries=0)
+        raise AssertionError("A dropped connection with max_retries=0 should raise an error")
+    except IOError as e:
+        assert "failed after 0 retries" in str(e), e
+    _ReleaseHandler.requests = []
+    _ReleaseHandler.if_ranges = []
+    return os.path.getsize(f"{filepath}.part")
+
+
+def test_download_file():
+    """Test streaming download, resume, checksum and up-to-date skip."""
+
+    print("=" * 70)
+    print("Testing download_file")
+    print("=" * 70)
+
+    checksum = f"sha256:{hashlib.sha256(CONTENT).hexdigest()}"
+
+    with _server() as url, tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "ebd_AFR_relJan-2024.tar")
+
+        # Dropped connections are resumed with Range requests
+        _ReleaseHandler.drop = 2
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum, chunk_size=2**16)
+        assert Path(filepath).read_bytes() == CONTENT
+        assert not os.path.exists(f"{filepath}.part")
+        ranges = [r for m, r in _ReleaseHandler.requests if m == "GET"]
+        assert ranges[0] is None and all(r is not None for r in ranges[1:]), ranges
+        assert len(ranges) == 3, ranges
+        assert _ReleaseHandler.if_ranges == [None, '"v1"', '"v1"'], _ReleaseHandler.if_ranges
+        assert os.path.getmtime(filepath) == 1700000000
+        print(f"✓ Resumed download after dropped connections: {ranges}")
+
+        # Up-to-date file: only a HEAD request, no download
+        _ReleaseHandler.requests = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath)
+        assert _ReleaseHandler.requests == [("HEAD", None)], _ReleaseHandler.requests
+        print("✓ Up-to-date file not downloaded again")
+
+        # Up-to-date file with checksum: no request at all
+        _ReleaseHandler.requests = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum)
+        assert _ReleaseHandler.requests == []
+        print("✓ Up-to-date file (checksum) not downloaded again")
+
+        # Resume from a .part file left by a previous run, if the file did not change (If-Range)
+        os.remove(filepath)
+        size = _interrupted_download(url, filepath)
+        assert 0 < size < len(CONTENT) and os.path.exists(f"{filepath}.part.validator")
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum)
+        assert Path(filepath).read_bytes() == CONTENT
+        assert _ReleaseHandler.requests == [("GET", f"bytes={size}-")], _ReleaseHandler.requests
+        assert _ReleaseHandler.if_ranges == ['"v1"'], _ReleaseHandler.if_ranges
+        assert not os.path.exists(f"{filepath}.part.validator")
+        print("✓ Resumed download from a previous .part file (If-Range)")
+
+        # .part file of an unknown version (no validator): downloaded again from scratch
+        os.remove(filepath)
+        Path(f"{filepath}.part").write_bytes(CONTENT[:1000])
+        _ReleaseHandler.requests = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum)
+        assert Path(filepath).read_bytes() == CONTENT
+        assert _ReleaseHandler.requests == [("GET", None)], _ReleaseHandler.requests
+        print("✓ .part file without validator downloaded again")
+
+        # File changed on the server since the .part file: the server answers the If-Range with the new file
+        os.remove(filepath)
+        size = _interrupted_download(url, filepath)
+        new_content = os.urandom(len(CONTENT) - 5000)
+        _ReleaseHandler.content, _ReleaseHandler.etag = new_content, '"v2"'
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath)
+        assert Path(filepath).read_bytes() == new_content
+        assert _ReleaseHandler.requests == [("GET", f"bytes={size}-")], _ReleaseHandler.requests
+        print("✓ Changed file downloaded again from scratch (If-Range)")
+
+        # Server ignoring If-Range: the ETag of the partial response does not match, restart from scratch
+        os.remove(filepath)
+        size = _interrupted_download(url, filepath)
+        _ReleaseHandler.content, _ReleaseHandler.etag, _ReleaseHandler.if_range = CONTENT, '"v3"', False
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum)
+        assert Path(filepath).read_bytes() == CONTENT
+        assert _ReleaseHandler.requests == [("GET", f"bytes={size}-"), ("GET", None)], _ReleaseHandler.requests
+        _ReleaseHandler.if_range = True
+        print("✓ Partial response of a changed file rejected")
+
+        # 416 reply: the .part file is only complete if it has the size of the file (Content-Range: */N)
+        os.remove(filepath)
+        Path(f"{filepath}.part").write_bytes(CONTENT)
+        Path(f"{filepath}.part.validator").write_text('"v3"')
+        _ReleaseHandler.requests = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum)
+        assert Path(filepath).read_bytes() == CONTENT
+        assert _ReleaseHandler.requests == [("GET", f"bytes={len(CONTENT)}-")], _ReleaseHandler.requests
+        os.remove(filepath)
+        Path(f"{filepath}.part").write_bytes(CONTENT + b"stale")
+        Path(f"{filepath}.part.validator").write_text('"v3"')
+        _ReleaseHandler.requests = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum)
+        assert Path(filepath).read_bytes() == CONTENT
+        assert _ReleaseHandler.requests == [("GET", f"bytes={len(CONTENT) + 5}-"), ("GET", None)]
+        print("✓ 416 reply accepted only for a .part file of the size of the file")
+
+        # Connection cut after every MB: more drops than max_retries, but each attempt makes progress
+        os.remove(filepath)
+        _ReleaseHandler.requests = []
+        _ReleaseHandler.cut = 2**20
+        with contextlib.redirect_stdout(io.StringIO()):
+            download_file(url, filepath, checksum=checksum, chunk_size=2**16, max_retries=1)
+        assert Path(filepath).read_bytes() == CONTENT
+        assert len(_ReleaseHandler.requests) == 4, _ReleaseHandler.requests
+        print("✓ Download completed while every attempt makes progress")
+
+        # Connection cut before a chunk is downloaded: give up after max_retries
+        os.remove(filepath)
+        _ReleaseHandler.requests = []
+        _ReleaseHandler.cut = 1000
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                download_file(url, filepath, chunk_size=2**16, max_retries=3)
+            raise AssertionError("A download without progress should raise an error")
+        except IOError as e:
+            assert "failed after 3 retries" in str(e), e
+        assert len(_ReleaseHandler.requests) == 4, _ReleaseHandler.requests
+        _ReleaseHandler.cut = None
+        os.remove(f"{filepath}.part")
+        print("✓ Download without progress stopped after max_retries")
+
+        # Wrong checksum is rejected
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                download_file(url, filepath, checksum="md5:" + "0" * 32)
+            raise AssertionError("A wrong checksum should raise an error")
+        except IOError as e:
+            assert "Checksum" in str(e)
+        assert not os.path.exists(filepath) and not os.path.exists(f"{filepath}.part")
+        print("✓ Wrong checksum rejected")
+
+    print("\n✓ All download_file tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("DOWNLOAD TESTS")
+    print("=" * 70)
+
+    try:
+        test_download_file()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
@@ -0,0 +1,401 @@
+"""
+Test the EBD readers.
+
+Tests the different ways of reading an EBD file:
+- read_EBD: Load the whole file in memory
+- read_EBD_chunks: Stream the file in chunks
+- ebird2abap: Same cards whether the file is streamed or not
+- convert_EBD_to_parquet / read_EBD_parquet: Partitioned parquet cache
+- compact: Low-memory dtypes accepted by the whole pipeline
+- add_observation_datetime: Datetime and minute of day from date and start time
+- .tar release: Read without extraction
+- bbox, pentads, date_range, protocols: Rows filtered at read time, also from the parquet dataset
+"""
+
+import contextlib
+import io
+import json
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add package and test directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from eBird2ABAP.ebird2card import (
+    read_EBD,
+    read_EBD_chunks,
+    ebird2abap,
+    convert_EBD_to_parquet,
+    read_EBD_parquet,
+    add_observation_datetime,
+)
+from eBird2ABAP.pentad import latlng2pentad
+from ebd_sample import make_ebd_sample, write_ebd_sample
+
+
+def _sort_ebd(ebd):
+    return ebd.sort_values(
+        by=["SAMPLING EVENT IDENTIFIER", "TAXON CONCEPT ID"]
+    ).reset_index(drop=True)
+
+
+def test_read_EBD_chunks():
+    """Test that the concatenated chunks match read_EBD, including shared checklists split across chunks."""
+
+    print("=" * 70)
+    print("Testing read_EBD_chunks")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = write_ebd_sample(Path(tmp) / "ebd_sample.txt.gz")
+        ebd = read_EBD(file)
+
+        for chunksize in [97, 1000, 10**6]:
+            chunks = list(read_EBD_chunks(file, chunksize=chunksize, adu=False))
+            assert all(len(c) <= chunksize for c in chunks)
+            ebd_chunks = pd.concat(chunks)
+            pd.testing.assert_frame_equal(
+                _sort_ebd(ebd), _sort_ebd(ebd_chunks), check_dtype=False
+            )
+            print(f"✓ chunksize={chunksize}: {len(chunks)} chunks, {len(ebd_chunks)} rows")
+
+        # Memory ceiling derives the chunk size (after a probe chunk of 10,000 rows)
+        file = write_ebd_sample(Path(tmp) / "ebd_large.txt.gz", n_checklists=6000)
+        chunks = list(read_EBD_chunks(file, max_memory=2))
+        assert len(chunks) > 1, "max_memory should split the file in several chunks"
+        assert "ADU" in chunks[0].columns
+        print(f"✓ max_memory=2MB: {len(chunks)} chunks")
+
+    print("\n✓ All read_EBD_chunks tests passed!")
+
+
+def test_ebird2abap_chunked():
+    """Test that streaming the EBD file produces the same JSON as loading it."""
+
+    print("\n" + "=" * 70)
+    print("Testing ebird2abap in chunks")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = write_ebd_sample(Path(tmp) / "ebd_sample.txt.gz")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(file, Path(tmp) / "full.json")
+            ebird2abap(file, Path(tmp) / "chunked.json", chunksize=250)
+
+        full = (Path(tmp) / "full.json").read_text()
+        chunked = (Path(tmp) / "chunked.json").read_text()
+        assert full == chunked, "Chunked and in-memory JSON outputs differ"
+        print(f"✓ Identical JSON output ({len(full)} bytes)")
+
+    print("\n✓ All ebird2abap chunked tests passed!")
+
+
+def test_parquet_cache():
+    """Test the conversion of an EBD file to a partitioned parquet dataset."""
+
+    print("\n" + "=" * 70)
+    print("Testing parquet cache")
+    print("=" * 70)
+
+    pytest.importorskip("pyarrow")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = write_ebd_sample(Path(tmp) / "ebd_sample.txt.gz")
+        parquet_dir = convert_EBD_to_parquet(file, Path(tmp) / "ebd", chunksize=500)
+
+        # Partitioned by year and degree square
+        partitions = sorted(p.name for p in (Path(parquet_dir) / "YEAR=2023").iterdir())
+        assert partitions == [
+            "DEGREE SQUARE=00_00",
+            "DEGREE SQUARE=01_36",
+            "DEGREE SQUARE=05b00",
+        ], partitions
+        print(f"✓ Partitions: {partitions}")
+
+        # read_EBD gives the same data from the text file and the parquet dataset
+        pd.testing.assert_frame_equal(
+            _sort_ebd(read_EBD(file)),
+            _sort_ebd(read_EBD(parquet_dir)),
+            check_dtype=False,
+            check_like=True,
+        )
+        print("✓ read_EBD on parquet dataset matches text file")
+
+        # Column pruning and partition filter
+        nairobi = read_EBD_parquet(
+            parquet_dir,
+            columns=["LATITUDE", "LONGITUDE"],
+            filters=[("DEGREE SQUARE", "=", "01_36")],
+        )
+        assert list(nairobi.columns) == ["LATITUDE", "LONGITUDE"]
+        assert nairobi["LATITUDE"].between(-2, -1).all()
+        print(f"✓ Filtered read: {len(nairobi)} rows")
+
+        # Converting again replaces the dataset
+        n = len(read_EBD_parquet(parquet_dir, columns=["LATITUDE"]))
+        convert_EBD_to_parquet(file, parquet_dir, chunksize=300)
+        assert len(read_EBD_parquet(parquet_dir, columns=["LATITUDE"])) == n
+        (Path(tmp) / "other").mkdir()
+        (Path(tmp) / "other" / "notes.txt").write_text("")
+        try:
+            convert_EBD_to_parquet(file, Path(tmp) / "other")
+            raise AssertionError("A non-empty directory which is not a dataset should raise ValueError")
+        except ValueError:
+            pass
+        print(f"✓ Dataset replaced by a new conversion: {n} rows")
+
+        # Degree squares of the longitudes of 100° or more
+        ebd = make_ebd_sample(40)
+        east = ebd["SAMPLING EVENT IDENTIFIER"] < "S10000020"
+        ebd["LATITUDE"] = 10.1
+        ebd["LONGITUDE"] = np.where(east, 101.05, 100.05)
+        ebd.to_csv(Path(tmp) / "ebd_east.txt", sep="\t", index=False)
+        parquet_dir = convert_EBD_to_parquet(Path(tmp) / "ebd_east.txt", Path(tmp) / "east")
+        partitions = sorted(p.name for p in (Path(parquet_dir) / "YEAR=2023").iterdir())
+        assert partitions == ["DEGREE SQUARE=10c100", "DEGREE SQUARE=10c101"], partitions
+        square = read_EBD_parquet(parquet_dir, filters=[("DEGREE SQUARE", "=", "10c101")])
+        assert len(square) == east.sum() and (square["LONGITUDE"] == 101.05).all()
+        assert len(read_EBD(parquet_dir, pentads=["1005c10100"])) == east.sum()
+        print(f"✓ Partitions east of 100°E: {partitions}")
+
+    print("\n✓ All parquet cache tests passed!")
+
+
+def test_compact():
+    """Test the low-memory dtypes of read_EBD(compact=True) through the whole pipeline."""
+
+    print("\n" + "=" * 70)
+    print("Testing compact dtypes")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = write_ebd_sample(Path(tmp) / "ebd_sample.txt.gz")
+        ebd = read_EBD(file)
+        ebd_compact = read_EBD(file, compact=True)
+
+        assert ebd_compact["SAMPLING EVENT IDENTIFIER"].dtype == "int64"
+        assert ebd_compact["OBSERVER ID"].dtype == "int64"
+        assert ebd_compact["PROTOCOL TYPE"].dtype == "category"
+        assert ebd_compact["LATITUDE"].dtype == "float32"
+        assert ebd_compact["ALL SPECIES REPORTED"].dtype == "bool"
+        assert (ebd_compact["OBSERVATION DATETIME"] == ebd["OBSERVATION DATETIME"]).all()
+        size = ebd.memory_usage(deep=True).sum()
+        size_compact = ebd_compact.memory_usage(deep=True).sum()
+        assert size_compact < size / 2
+        print(f"✓ Memory: {size / 1e6:.2f} MB -> {size_compact / 1e6:.2f} MB")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(file, Path(tmp) / "full.json")
+            ebird2abap(file, Path(tmp) / "compact.json", compact=True)
+            ebird2abap(file, Path(tmp) / "compact_chunked.json", compact=True, chunksize=250)
+
+        def load(name):
+            # Coordinates are compared separately, to float32 precision
+            cards = json.loads((Path(tmp) / name).read_text())
+            coords = []
+            for card in cards:
+                for r in card["records"]:
+                    coords.append((r.pop("Latitude"), r.pop("Longitude")))
+            return cards, np.array(coords)
+
+        cards, coords = load("full.json")
+        for name in ["compact.json", "compact_chunked.json"]:
+            cards_compact, coords_compact = load(name)
+            assert cards == cards_compact, f"{name} differs"
+            assert np.allclose(coords, coords_compact, atol=1e-5)
+        print("✓ Same cards with compact dtypes (in memory and in chunks)")
+
+    print("\n✓ All compact dtypes tests passed!")
+
+
+def test_observation_datetime():
+    """Test OBSERVATION DATETIME and MINUTE OF DAY, including missing start times."""
+
+    print("\n" + "=" * 70)
+    print("Testing add_observation_datetime")
+    print("=" * 70)
+
+    date = pd.to_datetime(["2023-01-01", "2023-06-30", "2024-02-29"])
+    expected = pd.to_datetime(["2023-01-01 06:30:00", "2023-06-30 00:00:00", "2024-02-29 23:59:59"])
+
+    for time in [["06:30:00", None, "23:59:59"], [390, None, 1439]]:
+        ebd = pd.DataFrame(
+            {
+                "OBSERVATION DATE": date,
+                "TIME OBSERVATIONS STARTED": pd.Series(
+                    time, dtype="Int16" if isinstance(time[0], int) else None
+                ),
+            }
+        )
+        ebd = add_observation_datetime(ebd)
+        assert ebd["MINUTE OF DAY"].tolist() == [390, pd.NA, 1439]
+        if isinstance(time[0], int):
+            # Minute of day only (compact=True)
+            expected = expected.floor("min")
+        assert (ebd["OBSERVATION DATETIME"] == expected).all(), ebd["OBSERVATION DATETIME"]
+        print(f"✓ {ebd['OBSERVATION DATETIME'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()}")
+
+    print("\n✓ All add_observation_datetime tests passed!")
+
+
+def test_read_tar():
+    """Test reading the EBD file directly from the .tar release."""
+
+    print("\n" + "=" * 70)
+    print("Testing .tar release")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        file = write_ebd_sample(tmp / "ebd_AFR_relJan-2024.txt.gz")
+        sampling = write_ebd_sample(tmp / "ebd_AFR_relJan-2024_sampling.txt.gz", seed=1)
+        (tmp / "terms_of_use.txt").write_text("Terms of use")
+
+        # Same layout as the prepackaged release, with the sampling file first
+        tar_file = tmp / "ebd_AFR_relJan-2024.tar"
+        with tarfile.open(tar_file, "w") as tar:
+            for f in [tmp / "terms_of_use.txt", sampling, file]:
+                tar.add(f, arcname=f"ebd_AFR_relJan-2024/{Path(f).name}")
+
+        pd.testing.assert_frame_equal(read_EBD(file), read_EBD(tar_file))
+        print("✓ read_EBD on .tar matches .txt.gz")
+
+        chunks = list(read_EBD_chunks(tar_file, chunksize=500))
+        assert sum(len(c) for c in chunks) == len(read_EBD(file))
+        print(f"✓ read_EBD_chunks on .tar: {len(chunks)} chunks")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(file, tmp / "txt.json")
+            ebird2abap(tar_file, tmp / "tar.json", chunksize=500)
+        assert (tmp / "txt.json").read_text() == (tmp / "tar.json").read_text()
+        print("✓ ebird2abap on .tar matches .txt.gz")
+
+    print("\n✓ All .tar release tests passed!")
+
+
+# Filters of the read-time filter tests, selecting part of the sample
+_FILTERS = dict(
+    bbox=(36, -2, 37, -1),
+    date_range=("2023-01-10", None),
+    protocols=["Traveling", "Stationary"],
+)
+_PENTADS = ["0115_3645", "0535b0010"]
+
+
+def _filtered_rows(df):
+    # Shared checklists are merged within the selection: compare the other columns
+    return _sort_ebd(df).drop(columns="SAMPLING EVENT IDENTIFIER")
+
+
+def test_filters():
+    """Test the bbox, pentads, date_range and protocols filters applied at read time."""
+
+    print("\n" + "=" * 70)
+    print("Testing read-time filters")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        file = write_ebd_sample(tmp / "ebd_sample.txt.gz")
+        ebd = read_EBD(file)
+
+        expected = ebd[
+            ebd["LATITUDE"].between(-2, -1)
+            & ebd["LONGITUDE"].between(36, 37)
+            & (ebd["OBSERVATION DATE"] >= "2023-01-10")
+            & ebd["PROTOCOL TYPE"].isin(["Traveling", "Stationary"])
+        ]
+        assert 0 < len(expected) < len(ebd)
+        pd.testing.assert_frame_equal(_filtered_rows(read_EBD(file, **_FILTERS)), _filtered_rows(expected))
+        chunks = pd.concat(read_EBD_chunks(file, chunksize=300, adu=False, **_FILTERS))
+        pd.testing.assert_frame_equal(_filtered_rows(chunks), _filtered_rows(expected), check_dtype=False)
+        print(f"✓ bbox, date_range and protocols: {len(expected)}/{len(ebd)} rows")
+
+        pentad = pd.Series(latlng2pentad(ebd["LATITUDE"], ebd["LONGITUDE"]), index=ebd.index)
+        expected = ebd[pentad.isin(_PENTADS)]
+        pd.testing.assert_frame_equal(_filtered_rows(read_EBD(file, pentads=_PENTADS)), _filtered_rows(expected))
+        print(f"✓ pentads: {len(expected)}/{len(ebd)} rows")
+
+        # Same cards in memory and in chunks
+        outputs = []
+        for i, kwargs in enumerate([{}, {"chunksize": 250}]):
+            with contextlib.redirect_stdout(io.StringIO()):
+                ebird2abap(file, tmp / f"{i}.json", **_FILTERS, **kwargs)
+            outputs.append((tmp / f"{i}.json").read_text())
+        assert all(o == outputs[0] for o in outputs), "Filtered JSON outputs differ"
+        print(f"✓ Identical filtered JSON output from {len(outputs)} sources")
+
+    print("\n✓ All read-time filters tests passed!")
+
+
+def test_filters_parquet():
+    """Test the read-time filters on the parquet dataset."""
+
+    print("\n" + "=" * 70)
+    print("Testing read-time filters on the parquet dataset")
+    print("=" * 70)
+
+    pytest.importorskip("pyarrow")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        file = write_ebd_sample(tmp / "ebd_sample.txt.gz")
+        ebd = read_EBD(file)
+        parquet_dir = convert_EBD_to_parquet(file, tmp / "ebd", chunksize=500)
+
+        pentad = pd.Series(latlng2pentad(ebd["LATITUDE"], ebd["LONGITUDE"]), index=ebd.index)
+        expected = ebd[pentad.isin(_PENTADS)]
+        pd.testing.assert_frame_equal(
+            _filtered_rows(read_EBD(parquet_dir, pentads=_PENTADS)),
+            _filtered_rows(expected),
+            check_dtype=False,
+            check_like=True,
+        )
+        print(f"✓ pentads: {len(expected)}/{len(ebd)} rows")
+
+        # Same cards from the text file and from the parquet dataset
+        outputs = []
+        for i, (source, kwargs) in enumerate([(file, {}), (parquet_dir, {"chunksize": 250})]):
+            with contextlib.redirect_stdout(io.StringIO()):
+                ebird2abap(source, tmp / f"{i}.json", **_FILTERS, **kwargs)
+            outputs.append((tmp / f"{i}.json").read_text())
+        assert outputs[1] == outputs[0], "Filtered JSON outputs differ"
+        print("✓ Identical filtered JSON output from the text file and the parquet dataset")
+
+    print("\n✓ All parquet read-time filters tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("EBD READER TESTS")
+    print("=" * 70)
+
+    try:
+        test_read_EBD_chunks()
+        test_ebird2abap_chunked()
+        try:
+            test_parquet_cache()
+        except pytest.skip.Exception as e:
+            print(f"- Skipped: {e.msg}")
+        test_compact()
+        test_observation_datetime()
+        test_read_tar()
+        test_filters()
+        try:
+            test_filters_parquet()
+        except pytest.skip.Exception as e:
+            print(f"- Skipped: {e.msg}")
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
@@ -0,0 +1,359 @@
+"""
+Test the export of the cards.
+
+Compares the files written by the card writers to the JSON of pandas:
+- write_cards_json: Same JSON as to_json, in batches, as NDJSON, compressed, to file handles
+- Columnar records: Same cards and JSON as the lists of records, serialized from the flat table
+- write_cards_tables: Typed Parquet and Arrow IPC tables of the cards and records, in row groups
+- write_cards_shards: Shards by year and degree square with the counts, sizes and checksums of the manifest
+- ebird2abap: JSON files written one card per line and compressed from their extension, the tables and CSV next to them, and shards
+"""
+
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Add package and test directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from eBird2ABAP.ebird2card import (
+    add_ADU,
+    chk2valid_card,
+    chk_card2card_chk,
+    chk_card2ebd_f_u,
+    ebd2chk,
+    ebd_f_u2card_exp,
+    ebird2abap,
+    read_EBD,
+    valid_card2chk_card,
+    write_cards_json,
+    write_cards_shards,
+    write_cards_tables,
+)
+from ebd_sample import write_ebd_sample
+
+
+def _card_exp(file, columnar=False):
+    # Export cards of an EBD file, computed step by step as in ebird2abap
+    ebd = add_ADU(read_EBD(file))
+    chk = ebd2chk(ebd)
+    card_valid = chk2valid_card(chk)
+    chk_card = valid_card2chk_card(chk, card_valid)
+    card_chk = chk_card2card_chk(chk_card, card_valid)
+    return ebd_f_u2card_exp(card_chk, chk_card2ebd_f_u(ebd, chk_card), columnar=columnar)
+
+
+def test_write_cards_json():
+    """Test that the cards written batch by batch are the JSON of to_json."""
+
+    print("=" * 70)
+    print("Testing write_cards_json")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        with contextlib.redirect_stdout(io.StringIO()):
+            card_exp = _card_exp(write_ebd_sample(tmp / "ebd_sample.txt.gz"))
+        expected = card_exp.to_json(orient="records", indent=2)
+        expected_lines = card_exp.to_json(orient="records", lines=True)
+
+        # Same bytes as to_json, whatever the batches
+        for batch_size in [1, 7, len(card_exp), 10_000]:
+            assert write_cards_json(card_exp, tmp / "cards.json", batch_size=batch_size) == len(card_exp)
+            assert (tmp / "cards.json").read_text() == expected, batch_size
+        write_cards_json((card_exp.iloc[k::5] for k in range(5)), tmp / "cards.json")
+        assert (tmp / "cards.json").read_text() != expected
+        assert json.loads((tmp / "cards.json").read_text()) == [
+            card for k in range(5) for card in json.loads(expected)[k::5]
+        ]
+        write_cards_json(card_exp.iloc[:0], tmp / "empty.json")
+        assert (tmp / "empty.json").read_text() == card_exp.iloc[:0].to_json(orient="records", indent=2)
+        print(f"✓ {len(card_exp)} cards: same JSON as to_json ({len(expected)} bytes)")
+
+        # One card per line, from the extension or the lines option
+        write_cards_json(card_exp, tmp / "cards.ndjson", batch_size=7)
+        assert (tmp / "cards.ndjson").read_text() == expected_lines
+        assert [json.loads(line) for line in expected_lines.splitlines()] == json.loads(expected)
+        handle = io.StringIO()
+        write_cards_json(card_exp, handle, lines=True)
+        assert handle.getvalue() == expected_lines
+        print("✓ NDJSON")
+
+        # Compression from the extension, with the same file for the same cards
+        write_cards_json(card_exp, tmp / "cards.json.gz", batch_size=7)
+        assert gzip.decompress((tmp / "cards.json.gz").read_bytes()).decode() == expected
+        first = (tmp / "cards.json.gz").read_bytes()
+        write_cards_json(card_exp, tmp / "cards.json.gz")
+        assert (tmp / "cards.json.gz").read_bytes() == first
+        write_cards_json(card_exp, tmp / "cards.jsonl.gz")
+        assert gzip.decompress((tmp / "cards.jsonl.gz").read_bytes()).decode() == expected_lines
+        handle = io.BytesIO()
+        write_cards_json(card_exp, handle, compression="gzip")
+        assert gzip.decompress(handle.getvalue()).decode() == expected
+        print("✓ gzip")
+
+        try:
+            import zstandard
+        except ImportError:
+            zstandard = None
+        if zstandard is None:
+            try:
+                write_cards_json(card_exp, tmp / "cards.json.zst")
+                raise AssertionError("zstd compression without zstandard should raise ImportError")
+            except ImportError:
+                print("- zstandard not installed, skipping zstd")
+        else:
+            write_cards_json(card_exp, tmp / "cards.json.zst")
+            with zstandard.ZstdDecompressor().stream_reader(open(tmp / "cards.json.zst", "rb")) as f:
+                assert f.read().decode() == expected
+            print("✓ zstd")
+
+        for kwargs in [{"compression": "bz2"}, {"compression": "gzip", "file": io.StringIO()}]:
+            try:
+                write_cards_json(card_exp, **{"file": tmp / "cards.json", **kwargs})
+                raise AssertionError(f"{kwargs} should raise ValueError")
+            except ValueError:
+                pass
+
+    print("\n✓ All write_cards_json tests passed!")
+
+
+def test_columnar_records():
+    """Test that the cards written from the columnar records are the JSON of the lists of records."""
+
+    print("\n" + "=" * 70)
+    print("Testing columnar records")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        with contextlib.redirect_stdout(io.StringIO()):
+            file = write_ebd_sample(tmp / "ebd_sample.txt.gz")
+            card_exp = _card_exp(file)
+            cards, records = _card_exp(file, columnar=True)
+        expected = card_exp.to_json(orient="records", indent=2)
+        expected_lines = card_exp.to_json(orient="records", lines=True)
+
+        # Same cards, records of each card in the rows with its CardNo
+        assert cards.equals(card_exp.drop(columns="records"))
+        assert records["CardNo"].is_monotonic_increasing
+        assert records.to_dict(orient="records") == [record for card in card_exp["records"] for record in card]
+        assert (records.groupby("CardNo").size().to_numpy() == card_exp["TotalSpp"].to_numpy()).all()
+        print(f"✓ {len(cards)} cards and {len(records)} records")
+
+        # Same JSON as the lists of records, whatever the batches
+        for batch_size in [1, 7, 10_000]:
+            write_cards_json(cards, tmp / "cards.json", records, batch_size=batch_size)
+            assert (tmp / "cards.json").read_text() == expected, batch_size
+            write_cards_json(cards, tmp / "cards.ndjson", records, batch_size=batch_size)
+            assert (tmp / "cards.ndjson").read_text() == expected_lines, batch_size
+        print("✓ Same JSON and NDJSON as the lists of records")
+
+        # Cards without records in the table written with an empty list
+        missing = records["CardNo"] == cards["CardNo"][1]
+        write_cards_json(cards, tmp / "cards.json", records[~missing])
+        card_exp.at[1, "records"] = []
+        assert (tmp / "cards.json").read_text() == card_exp.to_json(orient="records", indent=2)
+        print("✓ Cards without records")
+
+    print("\n✓ All columnar records tests passed!")
+
+
+def test_write_cards_tables():
+    """Test the Parquet and Arrow IPC tables of the cards and their records."""
+
+    print("\n" + "=" * 70)
+    print("Testing write_cards_tables")
+    print("=" * 70)
+
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        with contextlib.redirect_stdout(io.StringIO()):
+            file = write_ebd_sample(tmp / "ebd_sample.txt.gz")
+            card_exp = _card_exp(file)
+            cards, records = _card_exp(file, columnar=True)
+        expected = json.loads(card_exp.to_json(orient="records"))
+
+        files = write_cards_tables(cards, tmp / "out", records, row_group_size=50)
+        assert files == (f"{tmp / 'out'}_cards.parquet", f"{tmp / 'out'}_records.parquet")
+        assert pq.ParquetFile(files[1]).metadata.num_row_groups == -(-len(records) // 50)
+        card_table, record_table = pq.read_table(files[0]), pq.read_table(files[1])
+        schema = card_table.schema
+        assert schema.names == list(cards.columns)
+        assert schema.field("StartDate").type == pa.date32() and schema.field("Hour1").type == pa.int16()
+        assert pa.types.is_list(schema.field("Checklists").type)
+        assert record_table.schema.names == [
+            "CardNo", "Sequence", "Spp", "SourceSpp", "SightingTime", "Latitude", "Longitude", "Accuracy",
+        ]
+
+        # Same values as the JSON, typed
+        for card, row in zip(expected, card_table.to_pylist()):
+            assert row["CardNo"] == card["CardNo"] and row["Checklists"] == card["Checklists"]
+            assert row["StartDate"].isoformat() == card["StartDate"]
+            assert row["StartTime"].strftime("%H:%M") == card["StartTime"]
+            assert row["TotalSpp"] == card["TotalSpp"] and row["Hour1"] is None and row["InclNight"] == 0
+        json_records = [record for card in expected for record in card["records"]]
+        assert len(json_records) == record_table.num_rows
+        for record, row in zip(json_records, record_table.to_pylist()):
+            assert row["CardNo"] == record["CardNo"] and row["Spp"] == record["Spp"]
+            assert row["SightingTime"].strftime("%Y-%m-%dT%H:%M:%SZ") == record["SightingTime"]
+            assert row["Accuracy"] == (record["Accuracy"] if record["Accuracy"] != "" else None)
+        print(f"✓ Parquet: {card_table.num_rows} cards and {record_table.num_rows} records")
+
+        # Arrow IPC, from the lists of records, and the records of the given cards only
+        first = record_table.slice(0, card_exp["TotalSpp"][:5].sum()).to_pylist()
+        files = write_cards_tables(card_exp.iloc[:5], tmp / "out", format="arrow", row_group_size=10)
+        with pa.OSFile(files[1], "rb") as source:
+            reader = pa.ipc.open_file(source)
+            assert reader.num_record_batches > 1
+            assert reader.read_all().to_pylist() == first
+        with pa.OSFile(files[0], "rb") as source:
+            assert pa.ipc.open_file(source).read_all().to_pylist() == card_table.slice(0, 5).to_pylist()
+        write_cards_tables(cards.iloc[:5], tmp / "subset", records)
+        assert pq.read_table(tmp / "subset_records.parquet").to_pylist() == first
+        print("✓ Arrow IPC")
+
+        try:
+            write_cards_tables(cards, tmp / "out", records, format="csv")
+            raise AssertionError("An unknown format should raise ValueError")
+        except ValueError:
+            pass
+
+        # Tables of ebird2abap next to the JSON file
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(file, tmp / "tables.json.gz", exportTables="arrow")
+        assert (tmp / "tables_cards.arrow").exists() and (tmp / "tables_records.arrow").exists()
+        print("✓ ebird2abap tables named after the JSON file")
+
+    print("\n✓ All write_cards_tables tests passed!")
+
+
+def test_write_cards_shards():
+    """Test that the shards and their manifest cover each card once."""
+
+    print("\n" + "=" * 70)
+    print("Testing write_cards_shards")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        with contextlib.redirect_stdout(io.StringIO()):
+            file = write_ebd_sample(tmp / "ebd_sample.txt.gz")
+            card_exp = _card_exp(file)
+            cards, records = _card_exp(file, columnar=True)
+        expected = {card["CardNo"]: card for card in json.loads(card_exp.to_json(orient="records"))}
+
+        manifest = write_cards_shards(cards, tmp / "shards", records, max_cards=4)
+        assert json.loads((tmp / "shards" / "manifest.json").read_text()) == manifest
+        assert manifest["cards"] == len(card_exp) == sum(shard["cards"] for shard in manifest["shards"])
+        written = []
+        for shard in manifest["shards"]:
+            path = tmp / "shards" / shard["file"]
+            assert path.stat().st_size == shard["bytes"]
+            assert hashlib.sha256(path.read_bytes()).hexdigest() == shard["sha256"]
+            shard_cards = json.loads(path.read_text())
+            assert len(shard_cards) == shard["cards"] <= 4
+            for card in shard_cards:
+                pentad = card["Pentad"]
+                assert card["StartDate"][0:4] == str(shard["year"]) == shard["file"][0:4]
+                assert pentad[0:2] + pentad[4] + pentad[5:7] == shard["degree_square"]
+                assert card == expected[card["CardNo"]]
+            written += [card["CardNo"] for card in shard_cards]
+        assert sorted(written) == sorted(expected)
+        print(f"✓ {len(written)} cards in {len(manifest['shards'])} shards")
+
+        # Compressed NDJSON shards, from the lists of records
+        manifest = write_cards_shards(card_exp, tmp / "ndjson", extension=".ndjson.gz")
+        lines = [
+            line
+            for shard in manifest["shards"]
+            for line in gzip.decompress((tmp / "ndjson" / shard["file"]).read_bytes()).decode().splitlines()
+        ]
+        assert all(shard["file"].endswith(".ndjson.gz") for shard in manifest["shards"])
+        assert sorted(json.loads(line)["CardNo"] for line in lines) == sorted(expected)
+        assert write_cards_shards(card_exp.iloc[:0], tmp / "empty") == {"cards": 0, "shards": []}
+        print("✓ Compressed NDJSON shards")
+
+        # Degree squares of the longitudes of 100° or more
+        east = card_exp.iloc[:2].assign(Pentad=["1010_10005", "1010_10105"], StartDate="2023-01-01")
+        manifest = write_cards_shards(east, tmp / "east")
+        assert [shard["degree_square"] for shard in manifest["shards"]] == ["10_100", "10_101"]
+        print("✓ Separate shards east of 100°E")
+
+    print("\n✓ All write_cards_shards tests passed!")
+
+
+def test_ebird2abap_export():
+    """Test the JSON files of ebird2abap written from their extension."""
+
+    print("\n" + "=" * 70)
+    print("Testing ebird2abap export")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        file = write_ebd_sample(tmp / "ebd_sample.txt.gz")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(file, tmp / "cards.json")
+            ebird2abap(file, tmp / "cards.ndjson.gz")
+
+        cards = json.loads((tmp / "cards.json").read_text())
+        lines = gzip.decompress((tmp / "cards.ndjson.gz").read_bytes()).decode().splitlines()
+        assert [json.loads(line) for line in lines] == cards
+        print(f"✓ {len(cards)} cards written as gzipped NDJSON")
+
+        # CSV next to the JSON file
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(file, tmp / "tables.json.gz", exportCSV=True)
+        names = ["tables.json.gz", "tables_cards.csv", "tables_records.csv"]
+        assert all((tmp / name).exists() for name in names)
+        print("✓ CSV named after the JSON file")
+        # Shards with the extension of the JSON file
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(file, tmp / "cards.jsonl", shard_dir=tmp / "shards")
+        manifest = json.loads((tmp / "shards" / "manifest.json").read_text())
+        assert manifest["cards"] == len(cards) and not (tmp / "cards.jsonl").exists()
+        assert all(shard["file"].endswith(".jsonl") for shard in manifest["shards"])
+        print(f"✓ {len(manifest['shards'])} shards")
+
+        try:
+            ebird2abap(file, tmp / "tables.json", exportTables="csv")
+            raise AssertionError("An unknown table format should raise ValueError")
+        except ValueError:
+            pass
+
+    print("\n✓ All ebird2abap export tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("EXPORT TESTS")
+    print("=" * 70)
+
+    try:
+        test_write_cards_json()
+        test_columnar_records()
+        try:
+            test_write_cards_tables()
+        except pytest.skip.Exception as e:
+            print(f"- Skipped: {e.msg}")
+        test_write_cards_shards()
+        test_ebird2abap_export()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
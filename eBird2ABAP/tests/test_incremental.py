@@ -0,0 +1,175 @@
+"""
+Test the incremental processing of EBD releases.
+
+Runs ebird2abap with a state directory on two successive (synthetic) releases
+with new, edited and deleted checklists:
+- Only the new and changed cards are written
+- The deleted cards are listed
+- Nothing is written when the release did not change
+- A failed export is done again by the next run
+"""
+
+import contextlib
+import io
+import json
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+# Add package and test directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from eBird2ABAP import ebird2card
+from eBird2ABAP.ebird2card import ebird2abap
+from ebd_sample import make_ebd_sample
+
+
+def _releases(tmp):
+    # Second release: one checklist deleted, one edited and a few new ones
+    ebd1 = make_ebd_sample(800)
+    sei = ebd1["SAMPLING EVENT IDENTIFIER"]
+    ebd2 = ebd1[sei != "S10000005"].copy()
+    ebd2.loc[ebd2["SAMPLING EVENT IDENTIFIER"] == "S10000010", "DURATION MINUTES"] = 300
+    new = make_ebd_sample(30, seed=5)
+    new["SAMPLING EVENT IDENTIFIER"] = new["SAMPLING EVENT IDENTIFIER"].str.replace("S1", "S2")
+    new["GROUP IDENTIFIER"] = ""
+    ebd2 = pd.concat([ebd2, new])
+
+    files = []
+    for i, ebd in enumerate([ebd1, ebd2]):
+        file = tmp / f"ebd_rel{i}.txt.gz"
+        ebd.to_csv(file, sep="\t", index=False)
+        files.append(file)
+    return files
+
+
+def _cards(file):
+    return {card["CardNo"]: card for card in json.loads(Path(file).read_text())}
+
+
+def test_incremental():
+    """Test that an incremental run only writes the cards which changed since the previous release."""
+
+    print("=" * 70)
+    print("Testing incremental processing")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        release1, release2 = _releases(tmp)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(release1, tmp / "full1.json")
+            ebird2abap(release2, tmp / "full2.json")
+        full1 = _cards(tmp / "full1.json")
+        full2 = _cards(tmp / "full2.json")
+        changed = {k: v for k, v in full2.items() if full1.get(k) != v}
+        deleted = sorted(set(full1) - set(full2))
+        assert 0 < len(changed) < len(full2) and len(deleted) > 0
+
+        fingerprints = ebird2card._card_fingerprints
+        for kwargs in [{}, {"chunksize": 97}]:
+            state_dir = tmp / f"state{len(kwargs)}"
+
+            # First run: all the cards (fingerprints hashed in small batches, same as in one batch)
+            batches = mock.patch.object(
+                ebird2card,
+                "_card_fingerprints",
+                lambda card_exp, records_json=None: fingerprints(card_exp, records_json, batch_size=7),
+            )
+            with contextlib.redirect_stdout(io.StringIO()), batches if kwargs else contextlib.nullcontext():
+                ebird2abap(release1, tmp / "inc1.json", state_dir=state_dir, **kwargs)
+            assert _cards(tmp / "inc1.json") == full1
+
+            # Second run: only the new and changed cards, and the deleted ones
+            with contextlib.redirect_stdout(io.StringIO()):
+                ebird2abap(release2, tmp / "inc2.json", state_dir=state_dir, **kwargs)
+            assert _cards(tmp / "inc2.json") == changed
+            assert json.loads((tmp / "inc2_deleted.json").read_text()) == deleted
+            print(
+                f"✓ {kwargs}: {len(changed)} new or changed cards and "
+                f"{len(deleted)} deleted cards out of {len(full2)}"
+            )
+
+            # Same release again: nothing to write
+            with contextlib.redirect_stdout(io.StringIO()):
+                ebird2abap(release2, tmp / "inc3.json", state_dir=state_dir, **kwargs)
+            assert _cards(tmp / "inc3.json") == {}
+            print(f"✓ {kwargs}: No card written for an unchanged release")
+
+        # Different settings: the state is not used
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(release2, tmp / "inc4.json", state_dir=state_dir, compact=True)
+        assert _cards(tmp / "inc4.json").keys() == full2.keys()
+        print("✓ State not used with different settings")
+
+    print("\n✓ All incremental processing tests passed!")
+
+
+def test_failed_export():
+    """Test that the changes of a run which failed to write the cards are exported by the next run."""
+
+    print("\n" + "=" * 70)
+    print("Testing failed export")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        release1, release2 = _releases(tmp)
+        state_dir = tmp / "state"
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(release1, tmp / "full1.json")
+            ebird2abap(release2, tmp / "full2.json")
+        full1 = _cards(tmp / "full1.json")
+        full2 = _cards(tmp / "full2.json")
+        changed = {k: v for k, v in full2.items() if full1.get(k) != v}
+
+        # First run failing: no state saved, all the cards exported by the next run
+        failing = mock.patch.object(ebird2card, "_write_cards_json", side_effect=OSError("No space left on device"))
+        with contextlib.redirect_stdout(io.StringIO()), failing:
+            try:
+                ebird2abap(release1, tmp / "inc1.json", state_dir=state_dir)
+                raise AssertionError("The failed write should raise OSError")
+            except OSError:
+                pass
+        assert not (state_dir / "state.pkl").exists()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(release1, tmp / "inc1.json", state_dir=state_dir)
+        assert _cards(tmp / "inc1.json") == full1
+        print("✓ First run exported again after a failed write")
+
+        # Second run failing: previous state kept, changed and deleted cards exported by the next run
+        with contextlib.redirect_stdout(io.StringIO()), failing:
+            try:
+                ebird2abap(release2, tmp / "inc2.json", state_dir=state_dir)
+                raise AssertionError("The failed write should raise OSError")
+            except OSError:
+                pass
+        with contextlib.redirect_stdout(io.StringIO()):
+            ebird2abap(release2, tmp / "inc2.json", state_dir=state_dir)
+        assert _cards(tmp / "inc2.json") == changed
+        assert json.loads((tmp / "inc2_deleted.json").read_text()) == sorted(set(full1) - set(full2))
+        print(f"✓ {len(changed)} changed cards exported again after a failed write")
+
+    print("\n✓ All failed export tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("INCREMENTAL PROCESSING TESTS")
+    print("=" * 70)
+
+    try:
+        test_incremental()
+        test_failed_export()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
@@ -0,0 +1,213 @@
+"""
+Test the integer pentad codes.
+
+Tests the conversions between coordinates, pentad IDs and int32 pentad codes:
+- latlng2pentad_code / pentad_code2str: Same pentads as latlng2pentad
+- latlng2pentad / pentad_code2str: Same IDs as the per-row string formatting
+- pentad2latlng: Same centers as the per-row decoding, invalid IDs reported in bulk
+- str2pentad_code: Inverse of pentad_code2str, with input validation
+- pentad_code2latlng / pentad_code2bounds: Same cells as pentad2latlng / pentad2polygon
+"""
+
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pentad import (
+    latlng2pentad,
+    pentad2latlng,
+    pentad2polygon,
+    latlng2pentad_code,
+    pentad_code2str,
+    str2pentad_code,
+    pentad_code2latlng,
+    pentad_code2bounds,
+)
+
+
+def _coordinates(n=100000, seed=0):
+    # Random coordinates plus points on the equator, the prime meridian and the grid lines
+    rng = np.random.default_rng(seed)
+    grid = np.arange(-1, 1, 5 / 60)
+    lat = np.r_[rng.uniform(-90, 90, n), 0, 0, 0, 1e-9, -1e-9, 90, -90, grid, grid]
+    lng = np.r_[rng.uniform(-180, 180, n), 0, 1e-9, -1e-9, 0, 0, 180, -180, grid[::-1], grid]
+    return lat, lng
+
+
+def _reference_pentads(lat, lng):
+    # Pentad IDs formatted row by row, as latlng2pentad did before being vectorized
+    pentads = []
+    for la, ln in zip(lat, lng):
+        latDeg, latSec = int(abs(la)), int(abs(la) % 1 * 60 // 5 * 5)
+        lngDeg, lngSec = int(abs(ln)), int(abs(ln) % 1 * 60 // 5 * 5)
+        letter = "_" if la <= 0 and ln > 0 else "a" if la <= 0 else "b" if ln <= 0 else "c"
+        pentads.append(f"{latDeg:02d}{latSec:02d}{letter}{lngDeg:02d}{lngSec:02d}")
+    return pentads
+
+
+def test_latlng2pentad_formatting():
+    """Test that the vectorized formatting gives the same IDs as the per-row formatting."""
+
+    print("=" * 70)
+    print("Testing latlng2pentad formatting")
+    print("=" * 70)
+
+    lat, lng = _coordinates()
+    # Longitudes of 100° or more (three degree digits) and around the two-digit boundary
+    lat = np.r_[lat, 10, -10, 10, -10, 0.5, -0.5]
+    lng = np.r_[lng, 99.99, -99.99, 100, -100, 179.99, -179.99]
+    expected = _reference_pentads(lat, lng)
+
+    pentads = latlng2pentad(lat, lng)
+    assert isinstance(pentads, np.ndarray) and pentads.dtype.kind == "U"
+    assert pentads.tolist() == expected
+    assert {len(p) for p in pentads} == {9, 10}
+    assert latlng2pentad(-25.041667, 27.083333).tolist() == ["2500_2700"]
+    assert len(latlng2pentad([], [])) == 0
+    print(f"✓ {len(pentads)} IDs identical to the per-row formatting")
+
+    # Missing or infinite coordinates (missing pentads are handled by assign_pentads)
+    for bad_lat, bad_lng in [(np.nan, 27), (-25, np.nan), ([10, np.inf], [20, 30]), ([10, 20], [30, -np.inf])]:
+        for convert in [latlng2pentad, latlng2pentad_code]:
+            try:
+                convert(bad_lat, bad_lng)
+                raise AssertionError(f"{convert.__name__}({bad_lat}, {bad_lng}) should raise ValueError")
+            except ValueError as e:
+                assert "finite" in str(e), e
+    print("✓ NaN and inf coordinates rejected")
+
+    print("\n✓ All latlng2pentad formatting tests passed!")
+
+
+def _reference_centers(pentads):
+    # Centers decoded row by row, as pentad2latlng did before being vectorized
+    d = 5 / 60
+    lat_centers, lng_centers = [], []
+    for p in pentads:
+        lat_abs = int(p[0:2]) + int(p[2:4]) / 60
+        lng_abs = int(p[5:7]) + int(p[7:9]) / 60
+        lat_north = -lat_abs if p[4] in "_a" and lat_abs != 0 else (0.0 if p[4] in "_a" else lat_abs)
+        if p[4] in "ab":
+            lng_west = -lng_abs if lng_abs > 0 else -d
+        else:
+            lng_west = lng_abs
+        lat_centers.append(lat_north - d / 2)
+        lng_centers.append(lng_west + d / 2)
+    return lat_centers, lng_centers
+
+
+def test_pentad2latlng_decoding():
+    """Test that the vectorized decoding gives the same centers as the per-row decoding."""
+
+    print("\n" + "=" * 70)
+    print("Testing pentad2latlng decoding")
+    print("=" * 70)
+
+    lat, lng = _coordinates(n=20000)
+    pentads = [p for p in latlng2pentad(lat, lng) if len(p) == 9]
+    assert pentad2latlng(pentads) == _reference_centers(pentads)
+    assert pentad2latlng(np.array(pentads)) == _reference_centers(pentads)
+    assert pentad2latlng("0000a0000") == _reference_centers(["0000a0000"])
+    assert pentad2latlng([]) == ([], [])
+    print(f"✓ {len(pentads)} pentads decoded as by the per-row decoding")
+
+    # All the invalid elements are reported at once, with their indices
+    try:
+        pentad2latlng(["2530_2750", "2530x2750", "2530_2750", "2530x2750"])
+        raise AssertionError("Invalid quadrants should raise ValueError")
+    except ValueError as e:
+        assert "[1, 3]" in str(e), e
+    for pentads, error in [
+        (["2530_2750", None], TypeError),
+        (["2530_11750"], ValueError),
+        (["25a0_2750"], ValueError),
+    ]:
+        try:
+            pentad2latlng(pentads)
+            raise AssertionError(f"{pentads} should raise {error.__name__}")
+        except error:
+            pass
+    print("✓ Invalid pentad IDs reported in bulk")
+
+    print("\n✓ All pentad2latlng decoding tests passed!")
+
+
+def test_pentad_code_conversions():
+    """Test that pentad codes give the same pentads as the pentad IDs."""
+
+    print("=" * 70)
+    print("Testing pentad code conversions")
+    print("=" * 70)
+
+    lat, lng = _coordinates()
+    pentads = latlng2pentad(lat, lng)
+    codes = latlng2pentad_code(lat, lng)
+    assert codes.dtype == np.int32
+
+    # One code per pentad ID
+    assert np.array_equal(pentad_code2str(codes), pentads)
+    assert np.array_equal(str2pentad_code(pentads), codes)
+    assert len(np.unique(codes)) == len(set(pentads))
+    print(f"✓ {len(set(pentads))} pentads: latlng2pentad_code, pentad_code2str and str2pentad_code agree")
+
+    # Known codes: row and column on the 5' grid
+    for pentad, row, col in [
+        ("2530_2750", -307, 334),
+        ("0000_0000", -1, 0),
+        ("0000a0000", -1, -1),
+        ("0000b0000", 0, -1),
+        ("0000c0000", 0, 0),
+        ("0545b0010", 69, -3),
+    ]:
+        code = str2pentad_code(pentad)[0]
+        assert code >> 16 == row and ((code & 0xFFFF) ^ 0x8000) - 0x8000 == col, pentad
+    print("✓ Known codes")
+
+    # Same centers and bounds as the pentad IDs
+    pentads9 = [p for p in pentads if len(p) == 9]
+    codes9 = str2pentad_code(pentads9)
+    lat_center, lng_center = pentad2latlng(pentads9)
+    lat_code, lng_code = pentad_code2latlng(codes9)
+    assert np.array_equal(lat_center, lat_code) and np.array_equal(lng_center, lng_code)
+    bounds = np.column_stack(pentad_code2bounds(codes9[:1000]))
+    polygons = np.array([p.bounds for p in pentad2polygon(pentads9[:1000])])
+    assert np.array_equal(bounds, polygons)
+    print("✓ pentad_code2latlng and pentad_code2bounds match pentad2latlng and pentad2polygon")
+
+    # Invalid pentad IDs
+    for pentad, error in [
+        ("2530x2750", ValueError),
+        ("2530_275", ValueError),
+        ("2532_2750", ValueError),
+        ("25a0_2750", ValueError),
+        (2530, TypeError),
+    ]:
+        try:
+            str2pentad_code([pentad])
+            raise AssertionError(f"{pentad} should raise {error.__name__}")
+        except error:
+            pass
+    print("✓ Invalid pentad IDs rejected")
+
+    print("\n✓ All pentad code tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("PENTAD CODE TESTS")
+    print("=" * 70)
+
+    try:
+        test_latlng2pentad_formatting()
+        test_pentad2latlng_decoding()
+        test_pentad_code_conversions()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
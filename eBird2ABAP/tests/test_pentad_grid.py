@@ -0,0 +1,142 @@
+"""
+Test the pentad grid generation.
+
+Compares generate_pentad_grid to testing every cell of the bounding box
+against the geometry:
+- Same pentads, geometries and order for polygons with holes and islands
+- Any tile size, and tiles tested in several processes
+- Grids streamed to GeoJSON sequence, FlatGeobuf and GeoParquet files, read back whole or by bbox
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import Point, Polygon, box
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pentad import generate_pentad_grid, latlng2pentad, latlng2polygon, read_pentad_grid
+
+
+def _reference_grid(geometry):
+    # Every cell of the bounding box, kept if it intersects the geometry
+    d = 5 / 60
+    minx, miny, maxx, maxy = geometry.bounds
+    xs = np.arange(np.floor(minx / d) * d, np.ceil(maxx / d) * d + d / 2, d) + d / 2
+    ys = np.arange(np.floor(miny / d) * d, np.ceil(maxy / d) * d + d / 2, d) + d / 2
+    xx, yy = np.meshgrid(xs, ys)
+    gdf = gpd.GeoDataFrame(
+        {"pentad": latlng2pentad(yy.ravel(), xx.ravel()), "geometry": latlng2polygon(yy.ravel(), xx.ravel())},
+        crs="EPSG:4326",
+    )
+    return gdf[gdf.intersects(geometry)]
+
+
+def _geometry():
+    # Irregular polygon around the equator and the prime meridian, with a lake and an island
+    t = np.linspace(0, 2 * np.pi, 500, endpoint=False)
+    r = 2 + 0.4 * np.sin(5 * t) + 0.1 * np.sin(23 * t)
+    land = Polygon(np.c_[0.5 + 1.2 * r * np.cos(t), 0.2 + r * np.sin(t)])
+    lake = Point(0.3, -0.4).buffer(0.6)
+    island = box(4.0, -1.0, 4.3, -0.75)
+    return land.difference(lake).union(island)
+
+
+def test_generate_pentad_grid():
+    """Test that the tiled grid generation keeps the same cells as testing every cell."""
+
+    print("=" * 70)
+    print("Testing generate_pentad_grid")
+    print("=" * 70)
+
+    geometry = _geometry()
+    expected = _reference_grid(geometry)
+    for tile_size in [1, 4, 32, 1000]:
+        gdf = generate_pentad_grid(geometry, return_geojson=False, tile_size=tile_size)
+        assert gdf.index.equals(expected.index)
+        assert gdf["pentad"].tolist() == expected["pentad"].tolist()
+        assert gdf.geometry.geom_equals_exact(expected.geometry, tolerance=0).all()
+        print(f"✓ tile_size={tile_size}: {len(gdf)} pentads")
+
+    # GeoJSON output
+    geojson = json.loads(generate_pentad_grid(geometry))
+    assert [f["properties"]["pentad"] for f in geojson["features"]] == expected["pentad"].tolist()
+    print("✓ GeoJSON output")
+
+    # The geometry of the caller is not prepared as a side effect, and stays prepared if it was
+    assert not shapely.is_prepared(geometry)
+    shapely.prepare(geometry)
+    generate_pentad_grid(geometry, return_geojson=False)
+    assert shapely.is_prepared(geometry)
+    shapely.destroy_prepared(geometry)
+    print("✓ Prepared state of the geometry unchanged")
+
+    # Boundary cells tested in worker processes
+    geometry = Polygon([(10, -5), (19, -4), (18, 4), (11, 5)])
+    expected = _reference_grid(geometry)
+    gdf = generate_pentad_grid(geometry, return_geojson=False, tile_size=1000, n_jobs=2)
+    assert gdf.index.equals(expected.index)
+    assert gdf["pentad"].tolist() == expected["pentad"].tolist()
+    print(f"✓ n_jobs=2: {len(gdf)} pentads")
+
+    print("\n✓ All generate_pentad_grid tests passed!")
+
+
+def test_pentad_grid_files():
+    """Test that the grids written to files are read back as generated, also by bbox."""
+
+    print("\n" + "=" * 70)
+    print("Testing pentad grid files")
+    print("=" * 70)
+
+    geometry = _geometry()
+    expected = generate_pentad_grid(geometry, return_geojson=False).set_index("pentad")
+    bbox = (-0.5, -0.5, 0.5, 0.5)
+    expected_bbox = sorted(expected.index[expected.intersects(box(*bbox))])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # GeoJSON sequence coordinates are written as text, to 15 decimals
+        for extension, tolerance in [(".geojsonl", 1e-12), (".fgb", 0), (".parquet", 0)]:
+            file = Path(tmp) / f"grid{extension}"
+            assert generate_pentad_grid(geometry, file=file, chunksize=500) == file
+
+            gdf = read_pentad_grid(file)
+            assert gdf.crs == "EPSG:4326" and list(gdf.columns) == ["pentad", "geometry"]
+            gdf = gdf.set_index("pentad").loc[expected.index]
+            assert gdf.geometry.geom_equals_exact(expected.geometry, tolerance=tolerance).all()
+
+            gdf = read_pentad_grid(file, bbox=bbox)
+            assert sorted(gdf["pentad"]) == expected_bbox
+            print(f"✓ {extension}: {len(expected)} pentads, {len(gdf)} in bbox")
+
+        try:
+            generate_pentad_grid(geometry, file=Path(tmp) / "grid.shp")
+            raise AssertionError("An unsupported extension should raise ValueError")
+        except ValueError:
+            pass
+        print("✓ Unsupported extension rejected")
+
+    print("\n✓ All pentad grid file tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("PENTAD GRID TESTS")
+    print("=" * 70)
+
+    try:
+        test_generate_pentad_grid()
+        test_pentad_grid_files()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
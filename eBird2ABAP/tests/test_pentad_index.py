@@ -0,0 +1,118 @@
+"""
+Test the pentad index.
+
+Builds the pentad index of a few regions and compares its lookups to
+generate_pentad_grid:
+- pentads_in_region: Same pentads and bounds as the grid of the region
+- pentad_region: Region of pentads, shared pentads assigned to the largest part
+- pentad_index: Memory-mapped index reused for the same regions, rebuilt otherwise
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import Point, box
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import pentad
+from pentad import (
+    generate_pentad_grid,
+    pentad_code2str,
+    pentad_index,
+    pentad_region,
+    pentads_in_region,
+)
+
+
+def _regions():
+    # Two regions sharing a border within a pentad column, and a disjoint island
+    return gpd.GeoDataFrame(
+        {"name": ["West", "East", "Island"]},
+        geometry=[
+            box(-1.0, -1.0, 0.57, 1.0),
+            box(0.57, -1.0, 2.0, 1.0),
+            Point(3.0, 3.0).buffer(0.3),
+        ],
+        crs="EPSG:4326",
+    )
+
+
+def test_pentad_index():
+    """Test the lookups of the pentad index against generate_pentad_grid."""
+
+    print("=" * 70)
+    print("Testing pentad index")
+    print("=" * 70)
+
+    regions = _regions()
+    with tempfile.TemporaryDirectory() as tmp:
+        index = pentad_index(regions, tmp, region_column="name")
+        assert isinstance(index["pentads"], np.memmap) and isinstance(index["grid"], np.memmap)
+        assert index["regions"] == ["West", "East", "Island"]
+
+        # Pentads of each region: same as the grid of the region
+        for name, geometry in zip(regions["name"], regions.geometry):
+            expected = generate_pentad_grid(geometry, return_geojson=False).sort_values("pentad")
+            pentads = pentads_in_region(index, name)
+            ids = pentad_code2str(pentads["code"])
+            order = np.argsort(ids)
+            assert ids[order].tolist() == expected["pentad"].tolist()
+            bounds = np.column_stack([pentads[k] for k in ["minx", "miny", "maxx", "maxy"]])
+            assert np.array_equal(bounds[order], shapely.bounds(expected.geometry.values))
+            print(f"✓ {name}: {len(pentads)} pentads")
+
+        # Region of pentads: the pentad column cut at 0.57° belongs mostly to West
+        west = set(pentad_code2str(pentads_in_region(index, "West")["code"]))
+        east = set(pentad_code2str(pentads_in_region(index, "East")["code"]))
+        shared = sorted(west & east)
+        assert len(shared) > 0
+        assert (pentad_region(index, shared) == "West").all()
+        assert (pentad_region(index, sorted(east - west)) == "East").all()
+        assert pentad_region(index, "3000c3000").tolist() == [None]
+        codes = index["pentads"]["code"]
+        assert np.array_equal(pentad_region(index, codes), pentad_region(index, pentad_code2str(codes)))
+        print(f"✓ pentad_region: {len(shared)} shared pentads assigned to West")
+
+        try:
+            pentads_in_region(index, "Atlantis")
+            raise AssertionError("An unknown region should raise ValueError")
+        except ValueError:
+            pass
+
+        # Same regions: index loaded, not rebuilt
+        with mock.patch.object(pentad, "_build_pentad_index", side_effect=AssertionError("rebuilt")):
+            index = pentad_index(regions, tmp, region_column="name")
+        island = pentads_in_region(index, "Island")["code"]
+        print("✓ Index reused for the same regions")
+
+        # Different regions: index rebuilt
+        index = pentad_index(regions.geometry.iloc[2], tmp)
+        assert index["regions"] == [0]
+        assert np.array_equal(pentads_in_region(index, 0)["code"], island)
+        assert pentad_region(index, shared).tolist() == [None] * len(shared)
+        print("✓ Index rebuilt for other regions")
+
+    print("\n✓ All pentad index tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("PENTAD INDEX TESTS")
+    print("=" * 70)
+
+    try:
+        test_pentad_index()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
@@ -4,9 +4,12 @@ Test pentad polygon generation functions.
 Tests polygon creation from both pentad IDs and coordinates:
 - pentad2polygon: Create polygon from pentad ID
 - latlng2polygon: Create polygon from coordinates
+- output: Same polygons as GeoSeries, WKB or bounds arrays
 """
 
 import numpy as np
+import geopandas as gpd
+import shapely
 import sys
 from pathlib import Path
 from shapely.geometry import Point
@@ -235,6 +238,51 @@ def test_vectorization():
     return True
 
 
+def test_polygon_outputs():
+    """Test that all outputs give the same polygons."""
+    
+    print("\n" + "=" * 70)
+    print("Testing polygon outputs")
+    print("=" * 70)
+    
+    rng = np.random.default_rng(0)
+    lats = np.r_[rng.uniform(-90, 90, 1000), 0, 0, -25.0]
+    lngs = np.r_[rng.uniform(-180, 180, 1000), 0, -0.1, 27.0]
+    pentad_ids = [p for p in latlng2pentad(lats, lngs) if len(p) == 9]
+    
+    for name, polygon_function, args in [
+        ("pentad2polygon", pentad2polygon, (pentad_ids,)),
+        ("latlng2polygon", latlng2polygon, (lats, lngs)),
+    ]:
+        polygons = polygon_function(*args)
+        expected = shapely.to_wkb(np.array(polygons))
+        
+        geoseries = polygon_function(*args, output="geoseries")
+        assert isinstance(geoseries, gpd.GeoSeries) and geoseries.crs == "EPSG:4326"
+        assert (shapely.to_wkb(geoseries.values) == expected).all()
+        
+        wkb = polygon_function(*args, output="wkb")
+        assert wkb.tolist() == expected.tolist()
+        
+        bounds = polygon_function(*args, output="bounds")
+        assert np.array_equal(np.column_stack(bounds), shapely.bounds(np.array(polygons)))
+        print(f"✓ {name}: same {len(polygons)} polygons as GeoSeries, WKB and bounds")
+    
+    # Scalar inputs: single Polygon for the list output only
+    assert latlng2polygon(-25.0, 27.0).equals(latlng2polygon([-25.0], [27.0])[0])
+    assert pentad2polygon("2500_2700").equals(pentad2polygon(["2500_2700"])[0])
+    assert len(pentad2polygon("2500_2700", output="geoseries")) == 1
+    try:
+        latlng2polygon(lats, lngs, output="shapefile")
+        raise AssertionError("An unknown output should raise ValueError")
+    except ValueError:
+        pass
+    print("✓ Scalar inputs and unknown output")
+    
+    print("\n" + "=" * 70)
+    print("✓ All polygon output tests passed!")
+
+
 if __name__ == "__main__":
     print("\n" + "=" * 70)
     print("PENTAD POLYGON TESTS")
@@ -246,6 +294,7 @@ if __name__ == "__main__":
         test_polygon_size()
         test_polygon_coherence()
         test_vectorization()
+        test_polygon_outputs()
         
         print("\n" + "=" * 70)
         print("✓✓✓ ALL TESTS PASSED ✓✓✓")
@@ -0,0 +1,166 @@
+"""
+Test the pentad rasters.
+
+Compares the rasters accumulated from pentad codes to grouping the points by
+their 5' cell with pandas:
+- pentad_raster: Counts and sums of each cell, in chunks, within bounds
+- effort_raster: Checklists, duration, distance and cards of each pentad
+- write_pentad_raster: Multi-band GeoTIFF read back with its bands, transform and CRS
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from pentad import effort_raster, latlng2pentad, latlng2pentad_code, pentad_raster, write_pentad_raster
+
+
+def _checklists(n=50000, seed=0):
+    # Checklists around the equator and the prime meridian, with missing distances
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "LATITUDE": rng.uniform(-2, 1.5, n),
+            "LONGITUDE": rng.uniform(-1, 3, n),
+            "DURATION MINUTES": rng.integers(1, 300, n).astype(float),
+            "EFFORT DISTANCE KM": np.where(rng.random(n) < 0.3, np.nan, rng.uniform(0, 5, n)),
+        }
+    )
+
+
+def _reference_raster(chk, value, transform, shape):
+    # Sum of value by 5' cell of the points (row from the north edge), as the rasters of heatmap.ipynb
+    d = 5 / 60
+    row = np.floor((transform[3] - chk["LATITUDE"].to_numpy()) / d).astype(int)
+    col = np.floor((chk["LONGITUDE"].to_numpy() - transform[0]) / d).astype(int)
+    sums = pd.Series(np.asarray(value)).groupby([row, col]).sum()
+    raster = np.zeros(shape)
+    raster[sums.index.get_level_values(0), sums.index.get_level_values(1)] = sums.to_numpy()
+    return raster
+
+
+def test_pentad_raster():
+    """Test that the rasters accumulate the values of each 5' cell."""
+
+    print("=" * 70)
+    print("Testing pentad_raster")
+    print("=" * 70)
+
+    chk = _checklists()
+    codes = latlng2pentad_code(chk["LATITUDE"], chk["LONGITUDE"])
+    raster = pentad_raster(codes, {"count": None, "duration": chk["DURATION MINUTES"]}, chunksize=7000)
+    assert raster["bands"] == ["count", "duration"] and raster["crs"] == "EPSG:4326"
+    assert np.allclose(raster["transform"], (-1, 5 / 60, 0, 1.5, 0, -5 / 60))
+    assert raster["data"].shape == (2, 42, 48)
+
+    count = _reference_raster(chk, np.ones(len(chk)), raster["transform"], (42, 48))
+    duration = _reference_raster(chk, chk["DURATION MINUTES"], raster["transform"], (42, 48))
+    assert np.array_equal(raster["data"][0], count)
+    assert np.allclose(raster["data"][1], duration)
+    assert np.array_equal(pentad_raster(codes)["data"][0], count)
+    print(f"✓ {len(chk)} points: same counts and sums as grouping by cell")
+
+    # Bounds extended to the 5' grid, points outside ignored
+    raster = pentad_raster(codes, bounds=(-0.5, -0.51, 0.5, 0.5))
+    assert np.allclose(raster["transform"], (-0.5, 5 / 60, 0, 0.5, 0, -5 / 60))
+    assert raster["data"].shape == (1, 13, 12)
+    assert np.array_equal(raster["data"][0], count[12:25, 6:18])
+    print("✓ Bounds")
+
+    assert pentad_raster([])["data"].shape == (1, 0, 0)
+    try:
+        pentad_raster(codes, {"duration": chk["DURATION MINUTES"][:10]})
+        raise AssertionError("Values of another length should raise ValueError")
+    except ValueError:
+        pass
+
+    print("\n✓ All pentad_raster tests passed!")
+
+
+def test_effort_raster():
+    """Test the effort raster of checklists and cards."""
+
+    print("\n" + "=" * 70)
+    print("Testing effort_raster")
+    print("=" * 70)
+
+    chk = _checklists()
+    card = pd.DataFrame({"PENTAD": latlng2pentad(chk["LATITUDE"][::50], chk["LONGITUDE"][::50])})
+    raster = effort_raster(chk, card=card)
+    assert raster["bands"] == ["checklists", "duration", "distance", "cards"]
+    shape = raster["data"].shape[1:]
+    assert np.array_equal(raster["data"][0], _reference_raster(chk, np.ones(len(chk)), raster["transform"], shape))
+    for k, column in [(1, "DURATION MINUTES"), (2, "EFFORT DISTANCE KM")]:
+        assert np.allclose(raster["data"][k], _reference_raster(chk, chk[column], raster["transform"], shape))
+    cards = _reference_raster(chk[::50], np.ones(len(card)), raster["transform"], shape)
+    assert np.array_equal(raster["data"][3], cards)
+    print(f"✓ {len(chk)} checklists and {len(card)} cards")
+
+    print("\n✓ All effort_raster tests passed!")
+
+
+def test_write_pentad_raster():
+    """Test the GeoTIFF files of the rasters, read back with rasterio."""
+
+    print("\n" + "=" * 70)
+    print("Testing write_pentad_raster")
+    print("=" * 70)
+
+    rasterio = pytest.importorskip("rasterio")
+
+    chk = _checklists()
+    codes = latlng2pentad_code(chk["LATITUDE"], chk["LONGITUDE"])
+    card = pd.DataFrame({"PENTAD": latlng2pentad(chk["LATITUDE"][::50], chk["LONGITUDE"][::50])})
+    with tempfile.TemporaryDirectory() as tmp:
+        # Bands, transform and CRS of the raster, in the data type of the file
+        raster = pentad_raster(codes, {"count": None, "duration": chk["DURATION MINUTES"]})
+        file = Path(tmp) / "pentads.tif"
+        assert write_pentad_raster(raster, file, dtype="int32") == file
+        with rasterio.open(file) as src:
+            assert src.count == 2 and src.descriptions == ("count", "duration")
+            assert src.dtypes == ("int32", "int32")
+            assert src.crs.to_epsg() == 4326
+            assert np.allclose(src.transform.to_gdal(), raster["transform"])
+            assert np.array_equal(src.read(), raster["data"].astype("int32"))
+        print("✓ pentad_raster written as int32")
+
+        # File of effort_raster
+        raster = effort_raster(chk, card=card)
+        file = Path(tmp) / "effort.tif"
+        effort_raster(chk, card=card, file=file)
+        with rasterio.open(file) as src:
+            assert src.count == 4 and src.descriptions == tuple(raster["bands"])
+            assert src.crs.to_epsg() == 4326
+            assert np.allclose(src.transform.to_gdal(), raster["transform"])
+            assert np.allclose(src.read(), raster["data"].astype("float32"))
+        print("✓ effort_raster GeoTIFF file")
+
+    print("\n✓ All write_pentad_raster tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("PENTAD RASTER TESTS")
+    print("=" * 70)
+
+    try:
+        test_pentad_raster()
+        test_effort_raster()
+        try:
+            test_write_pentad_raster()
+        except pytest.skip.Exception as e:
+            print(f"- Skipped: {e.msg}")
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)
@@ -0,0 +1,178 @@
+"""
+Test the card uploader.
+
+Uploads cards to a local HTTP server standing in for the ABAP API:
+- Batches of cards with the JSON of write_cards_json, over a few keep-alive connections
+- Bounded concurrency, backoff on rate limits (Retry-After) and server errors
+- Journal: resumed uploads only send the new, changed and failed cards
+"""
+
+import contextlib
+import email.utils
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add package and test directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from eBird2ABAP.ebird2card import _retry_after, upload_cards
+from test_export import _card_exp
+from ebd_sample import write_ebd_sample
+
+
+class _ABAPHandler(BaseHTTPRequestHandler):
+    """Store the posted cards, answering the first `responses` requests with the given (status, headers)."""
+
+    protocol_version = "HTTP/1.1"
+    responses = []
+    reject = None
+    cards = []
+    requests = []
+    connections = set()
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = _ABAPHandler
+        with cls.lock:
+            cls.requests.append(len(body))
+            cls.connections.add(self.client_address)
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            status, headers = cls.responses.pop(0) if cls.responses else (200, {})
+        time.sleep(0.01)
+        if status == 200 and any(card["CardNo"] == cls.reject for card in body):
+            status = 400
+        with cls.lock:
+            if status == 200:
+                cls.cards.extend(body)
+            cls.active -= 1
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def _server(responses=(), reject=None):
+    _ABAPHandler.responses = list(responses)
+    _ABAPHandler.reject = reject
+    _ABAPHandler.cards = []
+    _ABAPHandler.requests = []
+    _ABAPHandler.connections = set()
+    _ABAPHandler.max_active = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ABAPHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/cards"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_upload_cards():
+    """Test the upload of the cards in concurrent batches, resumed from the journal."""
+
+    print("=" * 70)
+    print("Testing upload_cards")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        with contextlib.redirect_stdout(io.StringIO()):
+            file = write_ebd_sample(tmp / "ebd_sample.txt.gz")
+            card_exp = _card_exp(file)
+            cards, records = _card_exp(file, columnar=True)
+        expected = json.loads(card_exp.to_json(orient="records"))
+        journal = tmp / "journal.tsv"
+
+        # All the cards, with the JSON of write_cards_json, in batches over pooled connections
+        with _server() as url, contextlib.redirect_stdout(io.StringIO()):
+            report = upload_cards(cards, url, records, batch_size=4, max_workers=3, journal=journal)
+        assert report["uploaded"] == len(expected) and report["skipped"] == 0 and report["failed"] == []
+        assert report["cards_per_second"] > 0
+        assert sorted(_ABAPHandler.cards, key=lambda card: card["CardNo"]) == expected
+        assert sorted(_ABAPHandler.requests) == sorted([4] * (len(expected) // 4) + [len(expected) % 4])
+        assert 1 < _ABAPHandler.max_active <= 3
+        assert len(_ABAPHandler.connections) <= 3
+        print(f"✓ {len(expected)} cards in {len(_ABAPHandler.requests)} requests, {report['cards_per_second']:.0f} cards/s")
+        print(f"✓ {_ABAPHandler.max_active} concurrent requests over {len(_ABAPHandler.connections)} connections")
+
+        # Resumed from the journal: only the changed cards are sent again
+        assert len(journal.read_text().splitlines()) == len(expected)
+        changed = card_exp.copy()
+        changed.loc[[0, 5], "TotalHours"] += 1
+        with _server() as url, contextlib.redirect_stdout(io.StringIO()):
+            report = upload_cards(changed, url, batch_size=4, journal=journal)
+        assert report["uploaded"] == 2 and report["skipped"] == len(expected) - 2
+        assert [card["CardNo"] for card in _ABAPHandler.cards] == changed["CardNo"][[0, 5]].tolist()
+        print("✓ Resumed from the journal: 2 changed cards sent again")
+
+        # Rate limits and server errors retried after a backoff
+        responses = [(429, {"Retry-After": "0.3"}), (503, {}), (500, {})]
+        with _server(responses) as url, contextlib.redirect_stdout(io.StringIO()):
+            start = time.monotonic()
+            report = upload_cards(card_exp, url, batch_size=10, max_workers=2)
+        assert time.monotonic() - start >= 0.3
+        assert report["uploaded"] == len(expected)
+        assert len(_ABAPHandler.requests) == -(-len(expected) // 10) + 3
+        assert sorted(_ABAPHandler.cards, key=lambda card: card["CardNo"]) == expected
+        print("✓ Backoff on 429 (Retry-After) and 5xx responses")
+
+        # Invalid Retry-After headers: exponential backoff instead
+        assert _retry_after("soon") is None and _retry_after("nan") is None
+        assert _retry_after("-3") == 0 and _retry_after("2.5") == 2.5
+        naive = email.utils.formatdate(time.time() + 60, usegmt=True).replace(" GMT", "")
+        assert 55 < _retry_after(naive) <= 60, _retry_after(naive)
+        responses = [(429, {"Retry-After": "soon"}), (503, {"Retry-After": "Mon, 99 Foo 2024 25:61:00 GMT"})]
+        with _server(responses) as url, contextlib.redirect_stdout(io.StringIO()):
+            report = upload_cards(card_exp, url, batch_size=10, max_workers=2)
+        assert report["uploaded"] == len(expected) and report["failed"] == []
+        print("✓ Invalid Retry-After headers ignored, naive HTTP dates read as UTC")
+
+        # Rejected batch reported as failed and not journaled, sent by the next run
+        reject = card_exp["CardNo"][7]
+        journal = tmp / "rejected.tsv"
+        with _server(reject=reject) as url, contextlib.redirect_stdout(io.StringIO()):
+            report = upload_cards(card_exp, url, batch_size=4, journal=journal)
+        assert report["failed"] == card_exp["CardNo"][4:8].tolist()
+        assert report["uploaded"] == len(expected) - 4
+        with _server([(503, {})] * 3) as url, contextlib.redirect_stdout(io.StringIO()):
+            report = upload_cards(card_exp, url, batch_size=4, journal=journal, max_retries=2)
+        assert report["failed"] == card_exp["CardNo"][4:8].tolist() and len(_ABAPHandler.requests) == 3
+        with _server() as url, contextlib.redirect_stdout(io.StringIO()):
+            report = upload_cards(card_exp, url, batch_size=4, journal=journal)
+        assert report["uploaded"] == 4 and report["skipped"] == len(expected) - 4
+        print("✓ Failed batches sent by the next run")
+
+    print("\n✓ All upload_cards tests passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print("UPLOAD TESTS")
+    print("=" * 70)
+
+    try:
+        test_upload_cards()
+
+        print("\n" + "=" * 70)
+        print("✓✓✓ ALL TESTS PASSED ✓✓✓")
+        print("=" * 70 + "\n")
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}\n")
+        sys.exit(1)